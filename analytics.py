@@ -0,0 +1,265 @@
+import os
+import sqlite3
+import pandas as pd
+
+# DuckDB is optional; without it the reports are computed with pandas
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Per-transaction columns the reports are built from, as SQL over transactions t
+# joined to the three party tables. The same SQL runs on DuckDB and SQLite.
+BASE_COLUMNS = {
+    'apnaar_party': 'ap.name',
+    'lenaar_party': 'lp.name',
+    'kapine_party': "COALESCE(klp.name, '')",
+    'start_date': 't.start_date',
+    'received': 'CASE WHEN t.received = 1 THEN 1 ELSE 0 END',
+    'total_amount': 't.total_amount',
+    'interest_amount': 't.interest_amount',
+    'dalali_amount': 't.dalali_amount',
+    'net_interest_amount': 't.interest_received_by_apnar',
+    'lenaar_return_amount': 't.lenaar_return_amount',
+    'outstanding_amount': 'CASE WHEN t.received = 1 THEN 0 ELSE COALESCE(t.remaining_amount, t.total_amount) END',
+    'dalali_earned': 'CASE WHEN t.received = 1 THEN t.dalali_amount ELSE 0 END',
+    'dalali_pending': 'CASE WHEN t.received = 1 THEN 0 ELSE t.dalali_amount END'
+}
+
+# Columns a report can be grouped by: name -> (label, base column it is derived from)
+DIMENSIONS = {
+    'apnaar_party': ('Apnaar Party', 'apnaar_party'),
+    'lenaar_party': ('Lenaar Party', 'lenaar_party'),
+    'kapine_party': ('Kapine Lenaar Party', 'kapine_party'),
+    'year': ('Year', 'start_date'),
+    'month': ('Month', 'start_date'),
+    'month_key': ('Month/Year', 'start_date'),
+    'status': ('Status', 'received')
+}
+
+# Values a report can total: name -> (label, aggregate)
+MEASURES = {
+    'transaction_count': ('Transaction Count', 'count'),
+    'total_amount': ('Total Amount (₹)', 'sum'),
+    'interest_amount': ('Interest Amount (₹)', 'sum'),
+    'dalali_amount': ('Dalali Amount (₹)', 'sum'),
+    'net_interest_amount': ('Net Interest (₹)', 'sum'),
+    'lenaar_return_amount': ('Return Amount (₹)', 'sum'),
+    'outstanding_amount': ('Outstanding (₹)', 'sum'),
+    'dalali_earned': ('Dalali Earned (₹)', 'sum'),
+    'dalali_pending': ('Dalali Pending (₹)', 'sum')
+}
+
+# DuckDB expressions for the dimensions that are not plain base columns
+DUCKDB_DIMENSIONS = {
+    'year': 'year(CAST(start_date AS DATE))',
+    'month': 'month(CAST(start_date AS DATE))',
+    'month_key': "strftime(CAST(start_date AS DATE), '%Y-%m')",
+    'status': "CASE WHEN received = 1 THEN 'Received' ELSE 'Pending' END"
+}
+
+def base_query(columns, schema=""):
+    """SELECT producing the requested base columns, one row per transaction"""
+    prefix = f"{schema}." if schema else ""
+    select_sql = ",\n        ".join(f"{BASE_COLUMNS[column]} as {column}" for column in columns)
+    return f'''
+    SELECT
+        {select_sql}
+    FROM {prefix}transactions t
+    JOIN {prefix}apnaar_parties ap ON t.apnaar_party_id = ap.id
+    JOIN {prefix}lenaar_parties lp ON t.lenaar_party_id = lp.id
+    LEFT JOIN {prefix}kapine_lenaar_parties klp ON t.kapine_lenaar_party_id = klp.id
+    '''
+
+def find_sqlite_extension():
+    """
+    Path of the DuckDB sqlite extension shipped by the duckdb-extension-sqlite-scanner
+    package, so the pendrive build can load it without downloading anything
+    """
+    try:
+        import duckdb_extension_sqlite_scanner
+    except ImportError:
+        return None
+
+    path = os.path.join(
+        os.path.dirname(duckdb_extension_sqlite_scanner.__file__),
+        "extensions", f"v{duckdb.__version__}", "sqlite_scanner.duckdb_extension"
+    )
+    return path if os.path.exists(path) else None
+
+class Analytics:
+    """
+    Read-only report queries over the HISAABSETU SQLite file.
+    Uses DuckDB's sqlite scanner when DuckDB is installed and falls back to
+    pandas groupbys over the columns each report needs otherwise.
+    """
+
+    def __init__(self, db_path="data/hisaabsetu.db", backend="auto"):
+        """backend: 'auto', 'duckdb' or 'pandas'"""
+        self.db_path = db_path
+        self.connection = None
+        self.backend = "pandas"
+
+        if backend in ("auto", "duckdb"):
+            self.connect_duckdb()
+
+        if backend == "duckdb" and self.backend != "duckdb":
+            print("DuckDB is not available, using pandas for reports")
+
+    def connect_duckdb(self):
+        """Attach the SQLite file to an in-memory DuckDB database"""
+        if duckdb is None:
+            return
+
+        try:
+            connection = duckdb.connect()
+            extension_path = find_sqlite_extension()
+            if extension_path:
+                connection.execute(f"LOAD '{extension_path}'")
+            else:
+                connection.execute("LOAD sqlite")
+
+            db_path = os.path.abspath(self.db_path).replace("'", "''")
+            connection.execute(f"ATTACH '{db_path}' AS ledger (TYPE sqlite, READ_ONLY)")
+
+            self.connection = connection
+            self.backend = "duckdb"
+        except duckdb.Error as e:
+            print(f"DuckDB analytics unavailable: {e}")
+
+    def aggregate(self, dimensions, measures, filters=None):
+        """
+        Total measures grouped by dimensions, sorted by the dimensions.
+        dimensions: list of DIMENSIONS keys
+        measures: list of MEASURES keys
+        filters: optional dict of dimension -> value to keep
+        Returns a DataFrame with one column per dimension and measure.
+        """
+        filters = filters or {}
+        for name in list(dimensions) + list(filters):
+            if name not in DIMENSIONS:
+                raise ValueError(f"Unknown report dimension: {name}")
+        for name in measures:
+            if name not in MEASURES:
+                raise ValueError(f"Unknown report measure: {name}")
+
+        try:
+            if self.backend == "duckdb":
+                return self._aggregate_duckdb(dimensions, measures, filters)
+            return self._aggregate_pandas(dimensions, measures, filters)
+        except (sqlite3.Error, getattr(duckdb, "Error", sqlite3.Error)) as e:
+            print(f"Error building report: {e}")
+            return pd.DataFrame(columns=list(dimensions) + list(measures))
+
+    def _base_columns(self, dimensions, measures, filters):
+        """Base columns needed for a report, in BASE_COLUMNS order"""
+        needed = {DIMENSIONS[name][1] for name in list(dimensions) + list(filters)}
+        needed.update(name for name in measures if name != 'transaction_count')
+        if not needed:
+            needed.add('received')
+        return [column for column in BASE_COLUMNS if column in needed]
+
+    def _aggregate_duckdb(self, dimensions, measures, filters):
+        """Run the report as one grouped query in DuckDB"""
+        base_sql = base_query(self._base_columns(dimensions, measures, filters), schema="ledger")
+
+        select_parts = [f"{DUCKDB_DIMENSIONS.get(name, name)} as {name}" for name in dimensions]
+        for name in measures:
+            aggregate = "COUNT(*)" if MEASURES[name][1] == 'count' else f"COALESCE(SUM({name}), 0)"
+            select_parts.append(f"{aggregate} as {name}")
+
+        conditions = []
+        params = []
+        for name, value in filters.items():
+            conditions.append(f"{DUCKDB_DIMENSIONS.get(name, name)} = ?")
+            params.append(value)
+
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        group_sql = f"GROUP BY {', '.join(str(i + 1) for i in range(len(dimensions)))}" if dimensions else ""
+        order_sql = f"ORDER BY {', '.join(str(i + 1) for i in range(len(dimensions)))}" if dimensions else ""
+
+        return self.connection.execute(f'''
+        SELECT {', '.join(select_parts)}
+        FROM ({base_sql}) base
+        {where_sql}
+        {group_sql}
+        {order_sql}
+        ''', params).df()
+
+    def _aggregate_pandas(self, dimensions, measures, filters):
+        """Load the needed columns from SQLite and group them with pandas"""
+        connection = sqlite3.connect(self.db_path)
+        try:
+            df = pd.read_sql_query(base_query(self._base_columns(dimensions, measures, filters)), connection)
+        finally:
+            connection.close()
+
+        if 'start_date' in df:
+            # Lenient like the DuckDB cast and the rollup's strftime: legacy
+            # values with a time part parse, unreadable ones become NaT
+            dates = pd.to_datetime(df['start_date'], format='ISO8601', errors='coerce')
+            derived = {
+                'year': dates.dt.year.astype('Int64'),
+                'month': dates.dt.month.astype('Int64'),
+                'month_key': dates.dt.strftime('%Y-%m')
+            }
+        else:
+            derived = {}
+        if 'received' in df:
+            derived['status'] = df['received'].map({1: 'Received', 0: 'Pending'})
+
+        for name in set(dimensions) | set(filters):
+            if name in derived:
+                df[name] = derived[name]
+
+        for name, value in filters.items():
+            df = df[df[name] == value]
+
+        aggregations = {}
+        for name in measures:
+            if MEASURES[name][1] == 'count':
+                aggregations[name] = pd.NamedAgg(column=df.columns[0], aggfunc='size')
+            else:
+                aggregations[name] = pd.NamedAgg(column=name, aggfunc='sum')
+
+        if not dimensions:
+            return pd.DataFrame([{
+                name: len(df) if MEASURES[name][1] == 'count' else df[name].sum()
+                for name in measures
+            }])
+
+        return df.groupby(list(dimensions), sort=True).agg(**aggregations).reset_index()
+
+    def party_report(self, role):
+        """Totals per party; role: 'apnaar', 'lenaar' or 'kapine'"""
+        return self.aggregate([f"{role}_party"], [
+            'transaction_count', 'total_amount', 'interest_amount', 'dalali_amount',
+            'net_interest_amount', 'lenaar_return_amount', 'outstanding_amount'
+        ])
+
+    def monthly_report(self, filters=None):
+        """Totals per start_date month, optionally for one party (e.g. {'apnaar_party': name})"""
+        return self.aggregate(['year', 'month', 'month_key'], [
+            'transaction_count', 'total_amount', 'interest_amount',
+            'dalali_amount', 'net_interest_amount'
+        ], filters)
+
+    def dalali_report(self):
+        """Dalali earned and pending per Kapine Lenaar Party and month"""
+        return self.aggregate(['kapine_party', 'month_key'], [
+            'transaction_count', 'dalali_amount', 'dalali_earned', 'dalali_pending'
+        ])
+
+    def pivot(self, index, columns, measure):
+        """
+        Cross-tab one measure with index dimension rows and columns dimension columns.
+        Cells without transactions are 0.
+        """
+        grouped = self.aggregate([index, columns], [measure])
+        return grouped.pivot(index=index, columns=columns, values=measure).fillna(0)
+
+    def close(self):
+        """Close the DuckDB connection if one is open"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
@@ -1,19 +1,57 @@
+import time
+
+# Startup timing marks for the launcher (see record_startup_timing)
+APP_STARTED = time.time()
+
 import streamlit as st
 import pandas as pd
 import sqlite3
 from datetime import datetime, timedelta
+import math
 import os
+import json
 
 from database import Database
 from calculations import calculate_all
 from utils import (
     format_currency, parse_date, format_date, 
-    export_data, validate_transaction_input,
-    backup_database, restore_database, get_available_backups
+    export_buffer, prune_exports, EXPORT_RETENTION_DAYS, EXPORT_RETENTION_COUNT,
+    validate_transaction_input,
+    restore_database, get_available_backups
 )
+from display import (show_dataframe, prepare_export_frame, whole_rupees, CURRENCY_FORMAT,
+                     TRANSACTION_GRID_COLUMNS)
+from exporter import frame_sheets
+from backup import (
+    start_backup, current_backup, refresh_catalog, start_scheduler, available_codecs, configured_codec,
+    configured_replicas,
+    BACKUP_DIR, AUTO_BACKUP_DIR, SCHEDULE_DEFAULTS, BACKUP_CODECS
+)
+from pendrive import runtime_db_path, current_working_copy
+
+APP_IMPORTED = time.time()
 
-# Initialize the database
-db = Database()
+def record_startup_timing():
+    """
+    Write this run's import and render times to the file the launcher named in
+    HISAABSETU_TIMING_FILE. Only the first run of a session writes it.
+    """
+    timing_file = os.environ.get("HISAABSETU_TIMING_FILE")
+    if not timing_file or os.path.exists(timing_file):
+        return
+    marks = {"app_started": APP_STARTED, "app_imported": APP_IMPORTED, "app_rendered": time.time()}
+    try:
+        with open(f"{timing_file}.tmp", "w", encoding="utf-8") as file:
+            json.dump(marks, file)
+        os.replace(f"{timing_file}.tmp", timing_file)
+    except OSError:
+        pass
+
+# Initialize the database (in pendrive mode, the local working copy of it)
+db = Database(runtime_db_path())
+
+# Automatic backups run on a background thread for as long as the app runs
+start_scheduler(db.db_path)
 
 # Page configuration
 st.set_page_config(
@@ -64,6 +102,153 @@ def styled_subheader(text):
     """Display subheader with Aclonica font styling"""
     st.markdown(f'<h3 class="hisaabsetu-subheader-page">{text}</h3>', unsafe_allow_html=True)
 
+# Sortable columns offered by the paged transaction grids
+GRID_SORT_OPTIONS = {
+    'created_at': 'Date Added',
+    'id': 'ID',
+    'apnaar_party_name': 'Apnaar Party',
+    'lenaar_party_name': 'Lenaar Party',
+    'total_amount': 'Total Amount',
+    'remaining_amount': 'Remaining Amount',
+    'start_date': 'Start Date',
+    'end_date': 'End Date',
+    'interest_amount': 'Interest Amount',
+    'dalali_amount': 'Dalali Amount',
+    'received': 'Status'
+}
+
+# Columns shown by the payment history grids
+PAYMENT_GRID_COLUMNS = {
+    'payment_id': ('Payment ID', 'number'),
+    'transaction_id': ('Transaction ID', 'number'),
+    'apnaar_party_name': ('Apnaar Party', 'text'),
+    'lenaar_party_name': ('Lenaar Party', 'text'),
+    'payment_date': ('Payment Date', 'date'),
+    'payment_amount': ('Payment Amount (₹)', 'currency'),
+    'total_amount': ('Total Amount (₹)', 'currency'),
+    'remaining_amount': ('Remaining Amount (₹)', 'currency'),
+    'notes': ('Notes', 'text')
+}
+
+def paging_controls(key, total_count):
+    """
+    Display page size, page number and sort controls for a paged grid.
+    Returns (limit, offset, sort_by, descending) to pass to db.get_transactions.
+    """
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        page_size = st.selectbox("Rows per Page", [25, 50, 100, 250], index=1, key=f"{key}_page_size")
+    
+    total_pages = max(1, math.ceil(total_count / page_size))
+    
+    # Keep the page number in range when filters or page size shrink the result
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > total_pages:
+        st.session_state[page_key] = total_pages
+    
+    with col2:
+        page_number = st.number_input(
+            f"Page (of {total_pages})",
+            min_value=1,
+            max_value=total_pages,
+            step=1,
+            key=page_key
+        )
+    
+    with col3:
+        sort_by = st.selectbox(
+            "Sort By",
+            options=list(GRID_SORT_OPTIONS.keys()),
+            format_func=lambda x: GRID_SORT_OPTIONS[x],
+            key=f"{key}_sort_by"
+        )
+    
+    with col4:
+        sort_order = st.selectbox("Order", ["Descending", "Ascending"], key=f"{key}_sort_order")
+    
+    offset = (int(page_number) - 1) * page_size
+    if total_count:
+        st.caption(f"Showing rows {offset + 1}-{min(offset + page_size, total_count)} of {total_count}")
+    
+    return page_size, offset, sort_by, sort_order == "Descending"
+
+@st.cache_data(show_spinner=False)
+def load_dalali_report(_db, db_path, data_version, as_of):
+    """
+    Dalali report rows for as_of, cached until data_version changes.
+    _db is not hashed; db_path and data_version identify the data.
+    """
+    return _db.get_dalali_report(as_of)
+
+# Columns shown by the Dalali Reports tables
+DALALI_REPORT_COLUMNS = {
+    'earned_count': ('Received Count', 'number'),
+    'pending_count': ('Pending Count', 'number'),
+    'earned_amount': ('Dalali Earned (₹)', 'currency'),
+    'accrued_amount': ('Pending Accrued to Date (₹)', 'currency'),
+    'pending_amount': ('Pending at Maturity (₹)', 'currency'),
+    'expected_amount': ('Total Expected (₹)', 'currency')
+}
+
+def export_download(sheets, file_format, filename_prefix, label, key):
+    """
+    Render an export in memory and hand it straight to st.download_button.
+    A copy is also saved under data/exports when that is turned on in Settings.
+    """
+    try:
+        export = export_buffer(
+            sheets, file_format, filename_prefix,
+            keep_copy=db.get_setting("export_keep_copies", False),
+            keep_days=db.get_setting("export_retention_days", EXPORT_RETENTION_DAYS),
+            keep_count=db.get_setting("export_retention_count", EXPORT_RETENTION_COUNT)
+        )
+    except Exception as e:
+        st.error(f"Error exporting data: {e}")
+        return None
+    
+    st.download_button(
+        label,
+        data=export['data'],
+        file_name=export['file_name'],
+        mime=export['mime'],
+        key=key
+    )
+    if export['path']:
+        st.caption(f"A copy was saved to {export['path']}")
+    return export
+
+def show_backup_progress():
+    """
+    Show the state of the latest background backup. While it runs, the status
+    is redrawn every second as a fragment without rerunning the whole page.
+    """
+    job = current_backup()
+    if job is None:
+        return
+    
+    @st.fragment(run_every=1.0 if job.is_alive() else None)
+    def backup_status():
+        if job.is_alive():
+            st.progress(job.progress, text=job.message)
+        elif st.session_state.get('backup_job_shown') != id(job):
+            # Rerun the page once so the list of backups includes the new one
+            st.session_state.backup_job_shown = id(job)
+            st.rerun()
+        elif job.error:
+            st.error(f"Failed to create backup: {job.error}")
+        elif job.result is None:
+            st.info("No changes since the last backup.")
+        else:
+            st.success(f"Backup created successfully: {os.path.basename(job.result)} ({job.duration:.1f} s)")
+            if job.replicas:
+                copied = len(job.replicas) - len(job.replica_errors)
+                st.caption(f"Copied and verified in {copied} of {len(job.replicas)} backup folders")
+            for target, error in job.replica_errors.items():
+                st.warning(f"Could not copy the backup to {target}: {error}")
+    
+    backup_status()
+
 # Initialize session state for storing form data and UI state
 if 'show_add_party_form' not in st.session_state:
     st.session_state.show_add_party_form = False
@@ -113,6 +298,16 @@ page = st.sidebar.radio(
     ["Today", "Dashboard", "Manage Parties", "Transactions", "All Entries", "Payments", "Reports", "Settings"]
 )
 
+# Pendrive mode: changes are saved back to the pendrive in the background
+working_copy = current_working_copy()
+if working_copy:
+    st.sidebar.caption(f"💾 {working_copy.status()}")
+    if working_copy.recovered:
+        st.sidebar.warning(working_copy.recovered)
+    if working_copy.pending and st.sidebar.button("Save to Pendrive Now", key="pendrive_sync"):
+        working_copy.sync()
+        st.rerun()
+
 # Today Page - Transactions ending today
 if page == "Today":
     styled_header("Today's Transactions")
@@ -122,39 +317,26 @@ if page == "Today":
     today_transactions = db.get_transactions_ending_today()
     
     if today_transactions:
-        # Calculate the total dalali amount
-        total_dalali = sum(t['dalali_amount'] for t in today_transactions)
-        
         # Create a DataFrame for display
         df = pd.DataFrame(today_transactions)
         
         # Display a summary card with total dalali amount
-        st.metric("Total Dalali Amount Today", format_currency(total_dalali))
-        
-        # Format the DataFrame for display
-        display_df = df[[
-            'id', 'apnaar_party_name', 'lenaar_party_name', 'kapine_lenaar_party_name',
-            'total_amount', 'condition', 'start_date', 'end_date', 
-            'dalali_amount', 'interest_amount', 'received'
-        ]].copy()
-        
-        # Rename columns for better display
-        display_df.columns = [
-            'ID', 'Apnaar Party', 'Lenaar Party', 'Kapine Lenaar Party',
-            'Total Amount (₹)', 'Condition', 'Start Date', 'End Date', 
-            'Dalali Amount (₹)', 'Interest Amount (₹)', 'Received'
-        ]
-        
-        # Format numeric and date columns
-        display_df['Total Amount (₹)'] = display_df['Total Amount (₹)'].apply(lambda x: format_currency(x))
-        display_df['Dalali Amount (₹)'] = display_df['Dalali Amount (₹)'].apply(lambda x: format_currency(x))
-        display_df['Interest Amount (₹)'] = display_df['Interest Amount (₹)'].apply(lambda x: format_currency(x))
-        display_df['Start Date'] = display_df['Start Date'].apply(format_date)
-        display_df['End Date'] = display_df['End Date'].apply(format_date)
-        display_df['Received'] = display_df['Received'].map({0: '❌', 1: '✅'})
-        
-        # Display the dataframe
-        st.dataframe(display_df, use_container_width=True)
+        st.metric("Total Dalali Amount Today", format_currency(df['dalali_amount'].sum()))
+        
+        # Display the dataframe; amounts and dates are formatted by column_config
+        show_dataframe(df, {
+            'id': ('ID', 'number'),
+            'apnaar_party_name': ('Apnaar Party', 'text'),
+            'lenaar_party_name': ('Lenaar Party', 'text'),
+            'kapine_lenaar_party_name': ('Kapine Lenaar Party', 'text'),
+            'total_amount': ('Total Amount (₹)', 'currency'),
+            'condition': ('Condition', 'text'),
+            'start_date': ('Start Date', 'date'),
+            'end_date': ('End Date', 'date'),
+            'dalali_amount': ('Dalali Amount (₹)', 'currency'),
+            'interest_amount': ('Interest Amount (₹)', 'currency'),
+            'received': ('Received', 'received')
+        })
         
         # Add action buttons for the selected transaction
         if today_transactions:
@@ -217,65 +399,48 @@ if page == "Today":
 elif page == "Dashboard":
     styled_header("Dashboard")
     
-    # Get transaction data for summary
-    transactions = db.get_transactions()
+    # Get summary numbers from one aggregate query instead of loading the ledger
+    kpis = db.get_kpis()
+    total_transactions = kpis['total_transactions']
     
     # Display summary metrics with Dalali amount highlighted prominently
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        total_transactions = len(transactions)
         st.metric("Total Transactions", total_transactions)
     
     with col2:
-        total_amount = sum(t['total_amount'] for t in transactions) if transactions else 0
-        st.metric("Total Amount", format_currency(total_amount))
+        st.metric("Total Amount", format_currency(kpis['total_amount']))
         
     with col3:
         # Highlighting Dalali amount as the main focus
-        total_dalali = sum(t['dalali_amount'] for t in transactions) if transactions else 0
-        st.metric("Total Dalali Amount", format_currency(total_dalali), 
+        st.metric("Total Dalali Amount", format_currency(kpis['total_dalali']), 
                  delta_color="normal", help="Total commission earned from all transactions")
     
     with col4:
-        total_interest = sum(t['interest_amount'] for t in transactions) if transactions else 0
-        st.metric("Total Interest", format_currency(total_interest))
+        st.metric("Total Interest", format_currency(kpis['total_interest']))
     
     with col5:
-        completed_transactions = sum(1 for t in transactions if t['received']) if transactions else 0
-        st.metric("Completed Transactions", f"{completed_transactions}/{total_transactions}")
+        st.metric("Completed Transactions", f"{kpis['completed_transactions']}/{total_transactions}")
     
     # Recent transactions
     st.subheader("Recent Transactions")
-    if transactions:
+    if total_transactions:
         # Get only the 5 most recent transactions
-        recent_transactions = transactions[:5]
-        
-        # Create a DataFrame with selected columns - highlighting dalali amount
-        df = pd.DataFrame(recent_transactions)
-        df = df[[
-            'id', 'apnaar_party_name', 'lenaar_party_name', 
-            'total_amount', 'dalali_amount', 'interest_amount',
-            'start_date', 'end_date', 'received'
-        ]]
-        
-        # Rename columns for better display
-        df.columns = [
-            'ID', 'Apnaar Party', 'Lenaar Party', 
-            'Amount (₹)', 'Dalali (₹)', 'Interest (₹)',
-            'Start Date', 'End Date', 'Received'
-        ]
-        
-        # Format data for display
-        df['Amount (₹)'] = df['Amount (₹)'].apply(lambda x: format_currency(x))
-        df['Dalali (₹)'] = df['Dalali (₹)'].apply(lambda x: format_currency(x))
-        df['Interest (₹)'] = df['Interest (₹)'].apply(lambda x: format_currency(x))
-        df['Start Date'] = df['Start Date'].apply(format_date)
-        df['End Date'] = df['End Date'].apply(format_date)
-        df['Received'] = df['Received'].map({0: '❌', 1: '✅'})
-        
-        # Display the dataframe
-        st.dataframe(df, use_container_width=True)
+        recent_transactions = db.get_transactions(limit=5)
+        
+        # Display selected columns - highlighting dalali amount
+        show_dataframe(recent_transactions, {
+            'id': ('ID', 'number'),
+            'apnaar_party_name': ('Apnaar Party', 'text'),
+            'lenaar_party_name': ('Lenaar Party', 'text'),
+            'total_amount': ('Amount (₹)', 'currency'),
+            'dalali_amount': ('Dalali (₹)', 'currency'),
+            'interest_amount': ('Interest (₹)', 'currency'),
+            'start_date': ('Start Date', 'date'),
+            'end_date': ('End Date', 'date'),
+            'received': ('Received', 'received')
+        })
         
         # Button to view all transactions
         if st.button("View All Transactions"):
@@ -487,24 +652,28 @@ elif page == "Transactions":
         
         with filter_col1:
             # Get party lists for filtering
-            apnaar_parties = db.get_all_apnaar_parties()
-            apnaar_options = ["All"] + [party[1] for party in apnaar_parties]
-            filter_apnaar = st.selectbox("Apnaar Party", apnaar_options)
+            apnaar_names = dict(db.get_all_apnaar_parties())
+            filter_apnaar = st.selectbox(
+                "Apnaar Party", [None] + list(apnaar_names),
+                format_func=lambda party_id: apnaar_names.get(party_id, "All")
+            )
             
-            if filter_apnaar and filter_apnaar != "All":
-                st.session_state.filters['apnaar_party_name'] = filter_apnaar
-            elif 'apnaar_party_name' in st.session_state.filters:
-                del st.session_state.filters['apnaar_party_name']
+            if filter_apnaar is not None:
+                st.session_state.filters['apnaar_party_id'] = filter_apnaar
+            elif 'apnaar_party_id' in st.session_state.filters:
+                del st.session_state.filters['apnaar_party_id']
         
         with filter_col2:
-            lenaar_parties = db.get_all_lenaar_parties()
-            lenaar_options = ["All"] + [party[1] for party in lenaar_parties]
-            filter_lenaar = st.selectbox("Lenaar Party", lenaar_options)
+            lenaar_names = dict(db.get_all_lenaar_parties())
+            filter_lenaar = st.selectbox(
+                "Lenaar Party", [None] + list(lenaar_names),
+                format_func=lambda party_id: lenaar_names.get(party_id, "All")
+            )
             
-            if filter_lenaar and filter_lenaar != "All":
-                st.session_state.filters['lenaar_party_name'] = filter_lenaar
-            elif 'lenaar_party_name' in st.session_state.filters:
-                del st.session_state.filters['lenaar_party_name']
+            if filter_lenaar is not None:
+                st.session_state.filters['lenaar_party_id'] = filter_lenaar
+            elif 'lenaar_party_id' in st.session_state.filters:
+                del st.session_state.filters['lenaar_party_id']
         
         with filter_col3:
             filter_received = st.selectbox(
@@ -894,19 +1063,12 @@ elif page == "Transactions":
             
             if payments:
                 payment_df = pd.DataFrame(payments)
-                display_df = payment_df[[
-                    'id', 'payment_date', 'payment_amount', 'notes'
-                ]].copy()
-                
-                display_df.columns = [
-                    'Payment ID', 'Payment Date', 'Amount (₹)', 'Notes'
-                ]
-                
-                # Format columns
-                display_df['Amount (₹)'] = display_df['Amount (₹)'].apply(lambda x: format_currency(x))
-                display_df['Payment Date'] = display_df['Payment Date'].apply(format_date)
-                
-                st.dataframe(display_df, use_container_width=True)
+                show_dataframe(payment_df, {
+                    'id': ('Payment ID', 'number'),
+                    'payment_date': ('Payment Date', 'date'),
+                    'payment_amount': ('Amount (₹)', 'currency'),
+                    'notes': ('Notes', 'text')
+                })
                 
                 # Delete payment functionality
                 st.markdown("### Delete Payment")
@@ -942,65 +1104,41 @@ elif page == "Transactions":
     # Display transactions table
     st.subheader("All Transactions")
     
-    # Get transactions with applied filters
-    transactions = db.get_transactions(st.session_state.filters)
+    # Summary totals and row count come from one aggregate query over the filtered ledger
+    totals = db.get_transaction_totals(st.session_state.filters)
     
     # Calculate summary totals
-    if transactions:
-        total_amount = sum(t['total_amount'] for t in transactions)
-        total_dalali = sum(t['dalali_amount'] for t in transactions)
-        total_interest = sum(t['interest_amount'] for t in transactions)
-        
+    if totals['count']:
         # Display summary metrics in columns
         total_col1, total_col2, total_col3 = st.columns(3)
         
         with total_col1:
-            st.metric("Total Amount", format_currency(total_amount))
+            st.metric("Total Amount", format_currency(totals['total_amount']))
         
         with total_col2:
-            st.metric("Total Dalali Amount", format_currency(total_dalali))
+            st.metric("Total Dalali Amount", format_currency(totals['dalali_amount']))
         
         with total_col3:
-            st.metric("Total Interest Amount", format_currency(total_interest))
+            st.metric("Total Interest Amount", format_currency(totals['interest_amount']))
+        
+        # Only the current page of transactions is loaded and rendered
+        limit, offset, sort_by, descending = paging_controls("transactions_grid", totals['count'])
+        transactions = db.get_transactions(
+            st.session_state.filters,
+            sort_by=sort_by,
+            descending=descending,
+            limit=limit,
+            offset=offset
+        )
+    else:
+        transactions = []
     
     if transactions:
         # Create a DataFrame for display
         df = pd.DataFrame(transactions)
         
-        # Format the DataFrame for display
-        display_df = df[[
-            'id', 'apnaar_party_name', 'lenaar_party_name', 'kapine_lenaar_party_name',
-            'total_amount', 'remaining_amount', 'condition', 'start_date', 'end_date', 'number_of_days',
-            'number_of_months', 'interest_rate', 'dalali_rate', 'interest_amount',
-            'dalali_amount', 'lenaar_return_amount', 'apnaar_received_amount',
-            'interest_received_by_apnar', 'received'
-        ]].copy()
-        
-        # Rename columns for better display
-        display_df.columns = [
-            'ID', 'Apnaar Party', 'Lenaar Party', 'Kapine Lenaar Party',
-            'Total Amount (₹)', 'Remaining (₹)', 'Condition', 'Start Date', 'End Date', 'Days',
-            'Months', 'Interest Rate (%)', 'Dalali Rate (%)', 'Interest Amount (₹)',
-            'Dalali Amount (₹)', 'Lenaar Return (₹)', 'Apnaar Received (₹)',
-            'Interest Received (₹)', 'Received'
-        ]
-        
-        # Format numeric and date columns
-        display_df['Total Amount (₹)'] = display_df['Total Amount (₹)'].apply(lambda x: format_currency(x))
-        display_df['Remaining (₹)'] = display_df['Remaining (₹)'].apply(lambda x: format_currency(x) if pd.notnull(x) else format_currency(0))
-        display_df['Interest Amount (₹)'] = display_df['Interest Amount (₹)'].apply(lambda x: format_currency(x))
-        display_df['Dalali Amount (₹)'] = display_df['Dalali Amount (₹)'].apply(lambda x: format_currency(x))
-        display_df['Lenaar Return (₹)'] = display_df['Lenaar Return (₹)'].apply(lambda x: format_currency(x))
-        display_df['Apnaar Received (₹)'] = display_df['Apnaar Received (₹)'].apply(lambda x: format_currency(x))
-        display_df['Interest Received (₹)'] = display_df['Interest Received (₹)'].apply(lambda x: format_currency(x))
-        display_df['Interest Rate (%)'] = display_df['Interest Rate (%)'].apply(lambda x: f"{x*100:.2f}%")
-        display_df['Dalali Rate (%)'] = display_df['Dalali Rate (%)'].apply(lambda x: f"{x*100:.2f}%")
-        display_df['Start Date'] = display_df['Start Date'].apply(format_date)
-        display_df['End Date'] = display_df['End Date'].apply(format_date)
-        display_df['Received'] = display_df['Received'].map({0: '❌', 1: '✅'})
-        
-        # Display the styled dataframe
-        st.dataframe(display_df, use_container_width=True)
+        # Display the dataframe; amounts, rates and dates are formatted by column_config
+        show_dataframe(df, TRANSACTION_GRID_COLUMNS)
         
         # Add action buttons for the selected transaction
         selected_transaction = st.selectbox(
@@ -1056,23 +1194,22 @@ elif page == "Transactions":
                         st.warning("Click the delete button again to confirm deletion.")
             
             with col5:
-                if st.button("📊 Export Data"):
+                with st.popover("📊 Export Data"):
                     export_format = st.radio(
                         "Export Format",
-                        ["CSV", "Excel"],
-                        horizontal=True
+                        ["CSV", "CSV (gzip)", "Excel"],
+                        horizontal=True,
+                        key="transactions_export_format"
                     )
                     
-                    if st.button(f"Export as {export_format}"):
-                        filename = export_data(
-                            df, 
-                            export_format.lower(), 
-                            "transactions"
+                    if st.button(f"Prepare {export_format} File", key="transactions_export_button"):
+                        export_download(
+                            db.export_sheets(st.session_state.filters),
+                            export_format,
+                            "transactions",
+                            f"Download {export_format} File",
+                            "transactions_export_download"
                         )
-                        if filename:
-                            st.success(f"Data exported to {filename}")
-                        else:
-                            st.error("Failed to export data")
     else:
         st.info("No transactions found. Add your first transaction to get started.")
 
@@ -1081,90 +1218,14 @@ elif page == "All Entries":
     styled_header("All Entries")
     st.subheader("Excel-like View with Filters")
     
-    # Get all transactions
-    all_transactions = db.get_transactions()
-    
     # Initialize column filters in session state if not already present
     if 'all_entries_filters' not in st.session_state:
         st.session_state.all_entries_filters = {}
     
-    if not all_transactions:
+    # Count the whole ledger once to decide whether there is anything to show
+    if not db.get_transaction_totals()['count']:
         st.info("No transactions found. Add your first transaction to get started.")
     else:
-        # Create a DataFrame for display
-        df = pd.DataFrame(all_transactions)
-        
-        # Convert necessary columns to appropriate types
-        if 'start_date' in df.columns:
-            df['start_date'] = pd.to_datetime(df['start_date'])
-        if 'end_date' in df.columns:
-            df['end_date'] = pd.to_datetime(df['end_date'])
-        
-        # Calculate additional fields for each transaction
-        calculated_data = []
-        
-        for _, row in df.iterrows():
-            # Use the calculate_all function from calculations.py
-            calc_results = calculate_all(
-                row['total_amount'],
-                row['interest_rate'] * 100,  # Convert to percentage
-                row['dalali_rate'] * 100,    # Convert to percentage
-                row['start_date'],
-                row['end_date']
-            )
-            
-            # Add calculated values
-            row_data = {
-                'id': row['id'],
-                'apnaar_party_name': row['apnaar_party_name'],
-                'lenaar_party_name': row['lenaar_party_name'],
-                'kapine_lenaar_party_name': row['kapine_lenaar_party_name'],
-                'total_amount': row['total_amount'],
-                'condition': row['condition'],
-                'start_date': row['start_date'],
-                'end_date': row['end_date'],
-                'number_of_days': calc_results['number_of_days'],
-                'number_of_months': round(calc_results['number_of_months'], 2),
-                'interest_rate': row['interest_rate'] * 100,  # Convert to percentage
-                'dalali_rate': row['dalali_rate'] * 100,      # Convert to percentage
-                'interest_amount': calc_results['interest_amount'],
-                'dalali_amount': calc_results['dalali_amount'],
-                'lenaar_return_amount': calc_results['lenaar_return_amount'],
-                'apnaar_received_amount': calc_results['apnaar_received_amount'],
-                'interest_received_by_apnar': calc_results['interest_received_by_apnar'],
-                'received': row['received'],
-                'remaining_amount': row.get('remaining_amount', row['total_amount'])
-            }
-            
-            # If there's a remaining amount, calculate pending interest and dalali
-            if row.get('remaining_amount', 0) > 0 and row['remaining_amount'] != row['total_amount']:
-                # Get partial payments to find the last payment date
-                partial_payments = db.get_partial_payments(row['id'])
-                
-                if partial_payments:
-                    # Get the latest payment date from the list of payment dates
-                    payment_dates = [parse_date(payment['payment_date']) for payment in partial_payments if payment['payment_date']]
-                    if payment_dates and all(date is not None for date in payment_dates):
-                        latest_payment_date = max(date for date in payment_dates if date is not None)
-                    
-                    # Calculate pending interest and dalali from last payment date until today
-                    pending_calcs = db.calculate_pending_interest_dalali(row['id'])
-                    
-                    # Add pending interest and dalali to the row data
-                    if pending_calcs:
-                        row_data['pending_interest'] = pending_calcs['pending_interest']
-                        row_data['pending_dalali'] = pending_calcs['pending_dalali']
-                        # Use the imported function from calculations.py
-                        from calculations import calculate_remaining_lenaar_return_amount
-                        row_data['remaining_lenaar_return'] = calculate_remaining_lenaar_return_amount(
-                            row['remaining_amount'], pending_calcs['pending_interest']
-                        )
-            
-            calculated_data.append(row_data)
-        
-        # Create a DataFrame with all calculated data
-        calculated_df = pd.DataFrame(calculated_data)
-        
         # Get all unique values for each column for filters
         st.write("### Filters")
         st.write("Use the following filters to narrow down your view:")
@@ -1174,23 +1235,29 @@ elif page == "All Entries":
         
         # Filter for Apnaar Party Name
         with filter_cols[0]:
-            apnaar_party_options = ["All"] + sorted(calculated_df['apnaar_party_name'].unique().tolist())
-            selected_apnaar = st.selectbox("Apnaar Party", apnaar_party_options, key="filter_apnaar_all")
+            apnaar_names = dict(db.get_all_apnaar_parties())
+            selected_apnaar = st.selectbox(
+                "Apnaar Party", [None] + list(apnaar_names),
+                format_func=lambda party_id: apnaar_names.get(party_id, "All"), key="filter_apnaar_all"
+            )
             
-            if selected_apnaar != "All":
-                st.session_state.all_entries_filters['apnaar_party_name'] = selected_apnaar
-            elif 'apnaar_party_name' in st.session_state.all_entries_filters:
-                del st.session_state.all_entries_filters['apnaar_party_name']
+            if selected_apnaar is not None:
+                st.session_state.all_entries_filters['apnaar_party_id'] = selected_apnaar
+            elif 'apnaar_party_id' in st.session_state.all_entries_filters:
+                del st.session_state.all_entries_filters['apnaar_party_id']
         
         # Filter for Lenaar Party Name
         with filter_cols[1]:
-            lenaar_party_options = ["All"] + sorted(calculated_df['lenaar_party_name'].unique().tolist())
-            selected_lenaar = st.selectbox("Lenaar Party", lenaar_party_options, key="filter_lenaar_all")
+            lenaar_names = dict(db.get_all_lenaar_parties())
+            selected_lenaar = st.selectbox(
+                "Lenaar Party", [None] + list(lenaar_names),
+                format_func=lambda party_id: lenaar_names.get(party_id, "All"), key="filter_lenaar_all"
+            )
             
-            if selected_lenaar != "All":
-                st.session_state.all_entries_filters['lenaar_party_name'] = selected_lenaar
-            elif 'lenaar_party_name' in st.session_state.all_entries_filters:
-                del st.session_state.all_entries_filters['lenaar_party_name']
+            if selected_lenaar is not None:
+                st.session_state.all_entries_filters['lenaar_party_id'] = selected_lenaar
+            elif 'lenaar_party_id' in st.session_state.all_entries_filters:
+                del st.session_state.all_entries_filters['lenaar_party_id']
         
         # Filter for Status (Received)
         with filter_cols[2]:
@@ -1216,13 +1283,8 @@ elif page == "All Entries":
         filter_row2 = st.columns(4)
         filter_row3 = st.columns(4)
         
-        # Initialize filtered dataframe
-        filtered_df = calculated_df.copy()
-        
-        # Apply base filters from session state
-        for column, value in st.session_state.all_entries_filters.items():
-            if column in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df[column] == value]
+        # Start from the base filters in session state; date filters are added per rerun
+        entry_filters = dict(st.session_state.all_entries_filters)
         
         # Apply different date filters based on selection
         if date_filter_type == "Month & Year":
@@ -1238,15 +1300,11 @@ elif page == "All Entries":
                 years = ["All"] + [str(current_year - i) for i in range(6)]
                 filter_year = st.selectbox("End Date Year", years, key="filter_year_all")
             
-            # Apply month filter
-            if filter_month != "All":
-                month_num = months.index(filter_month)
-                filtered_df = filtered_df[filtered_df['end_date'].dt.month == month_num]
-            
-            # Apply year filter
-            if filter_year != "All":
-                year_num = int(filter_year)
-                filtered_df = filtered_df[filtered_df['end_date'].dt.year == year_num]
+            # Apply month and year filter
+            if filter_month != "All" or filter_year != "All":
+                month_num = months.index(filter_month) if filter_month != "All" else None
+                year_num = int(filter_year) if filter_year != "All" else None
+                entry_filters['end_date_month_year'] = (month_num, year_num)
                 
         elif date_filter_type == "Custom Date Range":
             with filter_row2[0]:
@@ -1273,17 +1331,12 @@ elif page == "All Entries":
                     key="to_date_custom"
                 )
             
-            # Convert dates to datetime for comparison
-            from_datetime = pd.to_datetime(from_date)
-            to_datetime = pd.to_datetime(to_date) + timedelta(days=1)  # Include the end date
-            
-            # Apply date range filter
+            # Apply date range filter (both ends inclusive)
+            date_range = (from_date.strftime("%Y-%m-%d"), to_date.strftime("%Y-%m-%d"))
             if date_field == "End Date":
-                filtered_df = filtered_df[(filtered_df['end_date'] >= from_datetime) & 
-                                         (filtered_df['end_date'] < to_datetime)]
+                entry_filters['end_date_between'] = date_range
             else:
-                filtered_df = filtered_df[(filtered_df['start_date'] >= from_datetime) & 
-                                         (filtered_df['start_date'] < to_datetime)]
+                entry_filters['start_date_between'] = date_range
             
             # Add a button to clear date filters
             with filter_row3[0]:
@@ -1291,82 +1344,45 @@ elif page == "All Entries":
                     # This will cause a rerun with the default filter
                     st.rerun()
         
+        # Summary metrics and the grid's row count come from one aggregate query
+        totals = db.get_transaction_totals(entry_filters)
+        
         # Display summary metrics for filtered data
         st.write("### Summary of Filtered Data")
         summary_cols = st.columns(5)
         
         with summary_cols[0]:
-            st.metric("Total Transactions", len(filtered_df))
+            st.metric("Total Transactions", totals['count'])
         
         with summary_cols[1]:
-            total_amount = filtered_df['total_amount'].sum()
-            st.metric("Total Amount", format_currency(total_amount))
+            st.metric("Total Amount", format_currency(totals['total_amount']))
         
         with summary_cols[2]:
-            total_dalali = filtered_df['dalali_amount'].sum()
-            st.metric("Total Dalali", format_currency(total_dalali))
+            st.metric("Total Dalali", format_currency(totals['dalali_amount']))
         
         with summary_cols[3]:
-            total_interest = filtered_df['interest_amount'].sum()
-            st.metric("Total Interest", format_currency(total_interest))
+            st.metric("Total Interest", format_currency(totals['interest_amount']))
         
         with summary_cols[4]:
-            total_lenaar_return = filtered_df['lenaar_return_amount'].sum()
-            st.metric("Total Lenaar Return", format_currency(total_lenaar_return))
-        
-        # Format the DataFrame for display
-        display_df = filtered_df.copy()
-        
-        # Rename columns for better display
-        display_columns = {
-            'id': 'ID',
-            'apnaar_party_name': 'Apnaar Party',
-            'lenaar_party_name': 'Lenaar Party',
-            'kapine_lenaar_party_name': 'Kapine Lenaar Party',
-            'total_amount': 'Total Amount (₹)',
-            'condition': 'Condition',
-            'start_date': 'Start Date',
-            'end_date': 'End Date',
-            'number_of_days': 'Days',
-            'number_of_months': 'Months',
-            'interest_rate': 'Interest Rate (%)',
-            'dalali_rate': 'Dalali Rate (%)',
-            'interest_amount': 'Interest Amount (₹)',
-            'dalali_amount': 'Dalali Amount (₹)',
-            'lenaar_return_amount': 'Lenaar Return (₹)',
-            'apnaar_received_amount': 'Apnaar Received (₹)',
-            'interest_received_by_apnar': 'Interest Received (₹)',
-            'received': 'Status',
-            'remaining_amount': 'Remaining Amount (₹)'
-        }
-        
-        # Rename the columns
-        display_df = display_df.rename(columns=display_columns)
-        
-        # Format numeric columns
-        numeric_columns = [
-            'Total Amount (₹)', 'Interest Amount (₹)', 'Dalali Amount (₹)',
-            'Lenaar Return (₹)', 'Apnaar Received (₹)', 'Interest Received (₹)',
-            'Remaining Amount (₹)'
-        ]
+            st.metric("Total Lenaar Return", format_currency(totals['lenaar_return_amount']))
         
-        for col in numeric_columns:
-            if col in display_df.columns:
-                display_df[col] = display_df[col].apply(lambda x: format_currency(x) if pd.notna(x) else "")
-        
-        # Format date columns
-        date_columns = ['Start Date', 'End Date']
-        for col in date_columns:
-            if col in display_df.columns:
-                display_df[col] = display_df[col].apply(lambda x: format_date(x) if pd.notna(x) else "")
+        # Display the current page of entries
+        st.write("### All Entries")
+        limit, offset, sort_by, descending = paging_controls("all_entries_grid", totals['count'])
+        page_transactions = db.get_transactions(
+            entry_filters,
+            sort_by=sort_by,
+            descending=descending,
+            limit=limit,
+            offset=offset
+        )
         
-        # Format status column
-        if 'Status' in display_df.columns:
-            display_df['Status'] = display_df['Status'].map({True: '✅ Received', False: '❌ Pending'})
+        filtered_df = pd.DataFrame(page_transactions)
+        if filtered_df.empty:
+            filtered_df = pd.DataFrame(columns=['id', 'apnaar_party_name', 'lenaar_party_name', 'total_amount'])
         
-        # Display the dataframe with all entries
-        st.write("### All Entries")
-        st.dataframe(display_df, use_container_width=True)
+        # Display the dataframe with the current page of entries
+        show_dataframe(filtered_df, TRANSACTION_GRID_COLUMNS)
         
         # Add options for transaction actions
         st.write("### Transaction Actions")
@@ -1404,39 +1420,24 @@ elif page == "All Entries":
         
         with export_col1:
             if st.button("Export to Excel", key="export_excel_all"):
-                try:
-                    # Export the filtered DataFrame to Excel
-                    filename = export_data(filtered_df.copy(), "excel", "all_entries")
-                    st.success(f"Data exported to {filename}")
-                    # Provide download link
-                    if filename:
-                        with open(filename, "rb") as file:
-                            st.download_button(
-                                label="Download Excel File",
-                                data=file,
-                                file_name=os.path.basename(filename),
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                except Exception as e:
-                    st.error(f"Error exporting data: {e}")
+                # Transactions and their payments stream from the database into the workbook
+                export_download(
+                    db.export_sheets(entry_filters),
+                    "excel",
+                    "all_entries",
+                    "Download Excel File",
+                    "export_excel_all_download"
+                )
         
         with export_col2:
             if st.button("Export to CSV", key="export_csv_all"):
-                try:
-                    # Export the filtered DataFrame to CSV
-                    filename = export_data(filtered_df.copy(), "csv", "all_entries")
-                    st.success(f"Data exported to {filename}")
-                    # Provide download link
-                    if filename:
-                        with open(filename, "rb") as file:
-                            st.download_button(
-                                label="Download CSV File",
-                                data=file,
-                                file_name=os.path.basename(filename),
-                                mime="text/csv"
-                            )
-                except Exception as e:
-                    st.error(f"Error exporting data: {e}")
+                export_download(
+                    db.export_sheets(entry_filters),
+                    "csv",
+                    "all_entries",
+                    "Download CSV File",
+                    "export_csv_all_download"
+                )
 
 # Payments Page
 elif page == "Payments":
@@ -1588,31 +1589,8 @@ elif page == "Payments":
                 payments.append(dict(zip(columns, row)))
                 
             if payments:
-                # Convert to DataFrame for display
-                df = pd.DataFrame(payments)
-                
-                # Format columns for display
-                display_df = df[[
-                    'payment_id', 'transaction_id', 'apnaar_party_name', 
-                    'lenaar_party_name', 'payment_date', 'payment_amount', 
-                    'total_amount', 'remaining_amount', 'notes'
-                ]].copy()
-                
-                # Rename columns for better display
-                display_df.columns = [
-                    'Payment ID', 'Transaction ID', 'Apnaar Party', 
-                    'Lenaar Party', 'Payment Date', 'Payment Amount (₹)', 
-                    'Total Amount (₹)', 'Remaining Amount (₹)', 'Notes'
-                ]
-                
-                # Format numeric and date columns
-                display_df['Payment Amount (₹)'] = display_df['Payment Amount (₹)'].apply(lambda x: format_currency(x))
-                display_df['Total Amount (₹)'] = display_df['Total Amount (₹)'].apply(lambda x: format_currency(x))
-                display_df['Remaining Amount (₹)'] = display_df['Remaining Amount (₹)'].apply(lambda x: format_currency(x))
-                display_df['Payment Date'] = display_df['Payment Date'].apply(format_date)
-                
-                # Display the dataframe
-                st.dataframe(display_df, use_container_width=True)
+                # Display the dataframe; amounts and dates are formatted by column_config
+                show_dataframe(payments, PAYMENT_GRID_COLUMNS)
             else:
                 st.info("No payment history found.")
         except Exception as e:
@@ -1681,31 +1659,8 @@ elif page == "Payments":
                     search_results.append(dict(zip(columns, row)))
                 
                 if search_results:
-                    # Convert to DataFrame for display
-                    df = pd.DataFrame(search_results)
-                    
-                    # Format columns for display
-                    display_df = df[[
-                        'payment_id', 'transaction_id', 'apnaar_party_name', 
-                        'lenaar_party_name', 'payment_date', 'payment_amount', 
-                        'total_amount', 'remaining_amount', 'notes'
-                    ]].copy()
-                    
-                    # Rename columns for better display
-                    display_df.columns = [
-                        'Payment ID', 'Transaction ID', 'Apnaar Party', 
-                        'Lenaar Party', 'Payment Date', 'Payment Amount (₹)', 
-                        'Total Amount (₹)', 'Remaining Amount (₹)', 'Notes'
-                    ]
-                    
-                    # Format numeric and date columns
-                    display_df['Payment Amount (₹)'] = display_df['Payment Amount (₹)'].apply(lambda x: format_currency(x))
-                    display_df['Total Amount (₹)'] = display_df['Total Amount (₹)'].apply(lambda x: format_currency(x))
-                    display_df['Remaining Amount (₹)'] = display_df['Remaining Amount (₹)'].apply(lambda x: format_currency(x))
-                    display_df['Payment Date'] = display_df['Payment Date'].apply(format_date)
-                    
-                    # Display the dataframe
-                    st.dataframe(display_df, use_container_width=True)
+                    # Display the dataframe; amounts and dates are formatted by column_config
+                    show_dataframe(search_results, PAYMENT_GRID_COLUMNS)
                     
                     # Summary metrics
                     total_payments = len(search_results)
@@ -1720,6 +1675,13 @@ elif page == "Payments":
 
 # Reports Page
 elif page == "Reports":
+    # Only this page needs these (analytics loads DuckDB), so they are imported
+    # on its first visit instead of at startup
+    from analytics import Analytics, DIMENSIONS as REPORT_DIMENSIONS, MEASURES as REPORT_MEASURES
+    from importer import import_transactions, error_report_csv
+    from snapshot import export_snapshot, SNAPSHOT_DIR
+    from utils import scrape_website_data
+    
     styled_header("Reports")
     
     # Create tabs for different report types
@@ -1728,8 +1690,147 @@ elif page == "Reports":
     with tab1:
         st.subheader("Transaction Summary")
         
-        # Get transaction data
-        transactions = db.get_transactions()
+        # Reports run on DuckDB over the SQLite file when it is installed, pandas otherwise
+        analytics = Analytics(db.db_path)
+        status_totals = analytics.aggregate(['status'], [
+            'transaction_count', 'total_amount', 'interest_amount',
+            'dalali_amount', 'net_interest_amount'
+        ]).set_index('status')
+    
+    # Dalali (brokerage) report per Kapine Lenaar Party and maturity month
+    with tab2:
+        st.subheader("Dalali Report")
+        
+        dalali_as_of = st.date_input("Accrued As Of", value=datetime.now().date(), key="dalali_as_of")
+        dalali_report = pd.DataFrame(load_dalali_report(
+            db, db.db_path, db.get_data_version(), dalali_as_of.strftime('%Y-%m-%d')
+        ))
+        
+        if dalali_report.empty:
+            st.info("No transactions found. Add transactions to see dalali reports.")
+        else:
+            dalali_col1, dalali_col2, dalali_col3 = st.columns(3)
+            
+            with dalali_col1:
+                st.metric("Dalali Earned", format_currency(dalali_report['earned_amount'].sum()))
+            
+            with dalali_col2:
+                st.metric("Pending Accrued to Date", format_currency(dalali_report['accrued_amount'].sum()))
+            
+            with dalali_col3:
+                st.metric("Pending at Maturity", format_currency(dalali_report['pending_amount'].sum()))
+            
+            summed_columns = list(DALALI_REPORT_COLUMNS.keys())
+            
+            st.write("##### By Kapine Lenaar Party")
+            by_party = dalali_report.groupby('kapine_party_name', as_index=False)[summed_columns].sum()
+            show_dataframe(by_party, {'kapine_party_name': ('Kapine Lenaar Party', 'text'), **DALALI_REPORT_COLUMNS})
+            
+            st.write("##### By Maturity Month")
+            by_month = dalali_report.groupby('month_key', as_index=False)[summed_columns].sum()
+            st.bar_chart(
+                data=by_month.set_index('month_key')[['earned_amount', 'accrued_amount', 'pending_amount']].rename(columns={
+                    'earned_amount': 'Earned',
+                    'accrued_amount': 'Pending Accrued',
+                    'pending_amount': 'Pending at Maturity'
+                }),
+                use_container_width=True
+            )
+            show_dataframe(by_month, {'month_key': ('Maturity Month', 'text'), **DALALI_REPORT_COLUMNS})
+    
+    # Bulk import of historical transactions from CSV or Excel
+    with tab3:
+        st.subheader("Import Transactions")
+        
+        st.write("""
+        Upload a CSV or Excel (.xlsx) file with one transaction per row. Required columns:
+        **Apnaar Party, Lenaar Party, Total Amount, Interest Rate (%), Start Date, End Date**.
+        Optional columns: **Kapine Lenaar Party, Dalali Rate (%), Condition, Received**.
+        Rates are percentages as on the transaction form; dates may be YYYY-MM-DD or DD/MM/YYYY.
+        """)
+        
+        st.download_button(
+            "Download Template",
+            data=",".join([
+                "Apnaar Party", "Lenaar Party", "Kapine Lenaar Party", "Total Amount",
+                "Interest Rate (%)", "Dalali Rate (%)", "Start Date", "End Date", "Condition", "Received"
+            ]) + "\n",
+            file_name="hisaabsetu_import_template.csv",
+            mime="text/csv"
+        )
+        
+        import_file = st.file_uploader("Transactions File", type=["csv", "xlsx"], key="import_file")
+        create_missing_parties = st.checkbox(
+            "Create parties that don't exist yet", value=True, key="import_create_parties"
+        )
+        
+        if import_file is not None and st.button("Import Transactions", key="import_button"):
+            progress_bar = st.progress(0.0, text="Reading file...")
+            
+            def show_import_progress(rows_done, rows_total):
+                progress_bar.progress(
+                    min(1.0, rows_done / max(rows_total, 1)),
+                    text=f"Imported {rows_done:,} of about {rows_total:,} rows"
+                )
+            
+            try:
+                import_result = import_transactions(
+                    db,
+                    import_file,
+                    os.path.splitext(import_file.name)[1].lstrip(".").lower(),
+                    create_parties=create_missing_parties,
+                    progress=show_import_progress
+                )
+            except ValueError as e:
+                progress_bar.empty()
+                st.error(f"Could not import file: {e}")
+            else:
+                progress_bar.progress(1.0, text="Import finished")
+                st.success(
+                    f"Imported {import_result['imported']:,} of {import_result['total_rows']:,} rows"
+                    f" and created {import_result['parties_created']:,} new parties."
+                )
+                
+                if import_result['failed']:
+                    st.warning(f"{import_result['failed']:,} rows were not imported.")
+                    st.dataframe(import_result['errors'].head(100), use_container_width=True)
+                    st.download_button(
+                        "Download Error Report",
+                        data=error_report_csv(import_result['errors']),
+                        file_name="hisaabsetu_import_errors.csv",
+                        mime="text/csv",
+                        key="import_errors_download"
+                    )
+        
+        # Typed columnar extracts for analysis in other tools
+        st.subheader("Snapshot for Analysis")
+        st.write(f"""
+        Writes transactions, partial payments and remaining balance calculations as typed
+        Parquet or Arrow files under **{SNAPSHOT_DIR}**. Each run adds only what changed since
+        the last one; a full snapshot replaces the earlier files.
+        """)
+        
+        snapshot_col1, snapshot_col2 = st.columns(2)
+        with snapshot_col1:
+            snapshot_format = st.radio(
+                "Snapshot Format", ["Parquet", "Arrow"], horizontal=True, key="snapshot_format"
+            )
+        with snapshot_col2:
+            snapshot_full = st.checkbox("Full snapshot", value=False, key="snapshot_full")
+        
+        if st.button("Write Snapshot", key="snapshot_button"):
+            try:
+                with st.spinner("Writing snapshot..."):
+                    snapshot_result = export_snapshot(
+                        db, file_format=snapshot_format.lower(), incremental=not snapshot_full
+                    )
+            except Exception as e:
+                st.error(f"Error writing snapshot: {e}")
+            else:
+                st.success(", ".join(
+                    f"{dataset.replace('_', ' ').title()}: {row_count:,} rows"
+                    for dataset, row_count in snapshot_result.items()
+                ))
         
     # Web Data tab for web scraping
     with tab4:
@@ -1770,20 +1871,13 @@ elif page == "Reports":
                         st.dataframe(df, use_container_width=True)
                         
                         # Option to export the scraped data
-                        if st.button("Export Scraped Data to Excel"):
-                            try:
-                                filename = export_data(df, "excel", "scraped_data")
-                                st.success(f"Data exported to {filename}")
-                                # Provide download link
-                                with open(filename, "rb") as file:
-                                    st.download_button(
-                                        label="Download Excel File",
-                                        data=file,
-                                        file_name=os.path.basename(filename),
-                                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                                    )
-                            except Exception as e:
-                                st.error(f"Error exporting data: {e}")
+                        export_download(
+                            frame_sheets(df, "Scraped Data"),
+                            "excel",
+                            "scraped_data",
+                            "Export Scraped Data to Excel",
+                            "scraped_data_download"
+                        )
                     else:
                         st.error(message)
         
@@ -1830,29 +1924,26 @@ elif page == "Reports":
             # Placeholder for future functionality
             st.info("Advanced data cleaning features coming soon!")
     
-    if not transactions:
+    if status_totals.empty:
         st.info("No transactions found. Add transactions to generate reports.")
     else:
-        # Convert to DataFrame for analysis
-        df = pd.DataFrame(transactions)
-        
         # Summary statistics
         st.subheader("Summary Statistics")
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Total Transactions", len(df))
-            st.metric("Total Amount", format_currency(df['total_amount'].sum()))
+            st.metric("Total Transactions", int(status_totals['transaction_count'].sum()))
+            st.metric("Total Amount", format_currency(status_totals['total_amount'].sum()))
         
         with col2:
-            st.metric("Total Interest", format_currency(df['interest_amount'].sum()))
-            st.metric("Total Dalali", format_currency(df['dalali_amount'].sum()))
+            st.metric("Total Interest", format_currency(status_totals['interest_amount'].sum()))
+            st.metric("Total Dalali", format_currency(status_totals['dalali_amount'].sum()))
         
         with col3:
-            st.metric("Net Interest Received", format_currency(df['interest_received_by_apnar'].sum()))
-            received_count = (df['received'] == 1).sum()
-            pending_count = (df['received'] == 0).sum()
+            st.metric("Net Interest Received", format_currency(status_totals['net_interest_amount'].sum()))
+            received_count = int(status_totals['transaction_count'].get('Received', 0))
+            pending_count = int(status_totals['transaction_count'].get('Pending', 0))
             st.metric("Received/Pending", f"{received_count}/{pending_count}")
         
         # Party-wise summary
@@ -1861,77 +1952,120 @@ elif page == "Reports":
         tab1, tab2 = st.tabs(["Apnaar Parties", "Lenaar Parties"])
         
         with tab1:
-            # Apnaar party summary
-            apnaar_summary = df.groupby('apnaar_party_name').agg({
-                'total_amount': 'sum',
-                'interest_amount': 'sum',
-                'dalali_amount': 'sum',
-                'interest_received_by_apnar': 'sum',
-                'id': 'count'
-            }).reset_index()
-            
-            apnaar_summary.columns = [
-                'Party Name', 'Total Amount (₹)', 'Interest Amount (₹)',
-                'Dalali Amount (₹)', 'Net Interest (₹)', 'Transaction Count'
-            ]
-            
-            # Format currency columns
-            for col in ['Total Amount (₹)', 'Interest Amount (₹)', 'Dalali Amount (₹)', 'Net Interest (₹)']:
-                apnaar_summary[col] = apnaar_summary[col].apply(lambda x: format_currency(x))
-            
-            st.dataframe(apnaar_summary, use_container_width=True)
+            # Apnaar party summary, read from the materialised party_summary table
+            show_dataframe(db.get_party_summary('apnaar'), {
+                'party_name': ('Party Name', 'text'),
+                'total_amount': ('Total Amount (₹)', 'currency'),
+                'interest_amount': ('Interest Amount (₹)', 'currency'),
+                'dalali_amount': ('Dalali Amount (₹)', 'currency'),
+                'net_interest_amount': ('Net Interest (₹)', 'currency'),
+                'outstanding_amount': ('Outstanding (₹)', 'currency'),
+                'transaction_count': ('Transaction Count', 'number')
+            })
         
         with tab2:
-            # Lenaar party summary
-            lenaar_summary = df.groupby('lenaar_party_name').agg({
-                'total_amount': 'sum',
-                'interest_amount': 'sum',
-                'lenaar_return_amount': 'sum',
-                'id': 'count'
-            }).reset_index()
-            
-            lenaar_summary.columns = [
-                'Party Name', 'Total Amount (₹)', 'Interest Amount (₹)',
-                'Return Amount (₹)', 'Transaction Count'
-            ]
-            
-            # Format currency columns
-            for col in ['Total Amount (₹)', 'Interest Amount (₹)', 'Return Amount (₹)']:
-                lenaar_summary[col] = lenaar_summary[col].apply(lambda x: format_currency(x))
-            
-            st.dataframe(lenaar_summary, use_container_width=True)
+            # Lenaar party summary, read from the materialised party_summary table
+            show_dataframe(db.get_party_summary('lenaar'), {
+                'party_name': ('Party Name', 'text'),
+                'total_amount': ('Total Amount (₹)', 'currency'),
+                'interest_amount': ('Interest Amount (₹)', 'currency'),
+                'lenaar_return_amount': ('Return Amount (₹)', 'currency'),
+                'outstanding_amount': ('Outstanding (₹)', 'currency'),
+                'transaction_count': ('Transaction Count', 'number')
+            })
         
         # Monthly analysis
         st.subheader("Monthly Analysis")
         
-        # Add month and year columns to dataframe
-        df['month'] = pd.to_datetime(df['start_date']).dt.month
-        df['year'] = pd.to_datetime(df['start_date']).dt.year
-        df['month_year'] = pd.to_datetime(df['start_date']).dt.strftime('%b %Y')
-        
-        monthly_data = df.groupby(['year', 'month', 'month_year']).agg({
-            'total_amount': 'sum',
-            'interest_amount': 'sum',
-            'dalali_amount': 'sum',
-            'interest_received_by_apnar': 'sum',
-            'id': 'count'
-        }).reset_index().sort_values(['year', 'month'])
-        
-        # Create a chart using Streamlit
-        st.bar_chart(
-            data=monthly_data.set_index('month_year')['total_amount'],
-            use_container_width=True
-        )
+        # Narrow the monthly figures to one party if wanted
+        slice_col1, slice_col2 = st.columns(2)
+        
+        with slice_col1:
+            apnaar_options = {"All": None}
+            apnaar_options.update({name: party_id for party_id, name in db.get_all_apnaar_parties()})
+            monthly_apnaar = st.selectbox("Apnaar Party", list(apnaar_options.keys()), key="monthly_apnaar")
+        
+        with slice_col2:
+            lenaar_options = {"All": None}
+            lenaar_options.update({name: party_id for party_id, name in db.get_all_lenaar_parties()})
+            monthly_lenaar = st.selectbox("Lenaar Party", list(lenaar_options.keys()), key="monthly_lenaar")
+        
+        # Month-by-month totals come from the materialised monthly_rollup cube
+        monthly_data = pd.DataFrame(db.get_monthly_rollup(
+            apnaar_party_id=apnaar_options[monthly_apnaar],
+            lenaar_party_id=lenaar_options[monthly_lenaar]
+        ))
+        
+        if monthly_data.empty:
+            st.info("No transactions found for the selected parties.")
+            monthly_data = pd.DataFrame(columns=[
+                'year', 'month', 'month_key', 'transaction_count', 'received_count',
+                'total_amount', 'interest_amount', 'dalali_amount', 'net_interest_amount'
+            ])
+        else:
+            # Chart on the sortable YYYY-MM key so months stay in calendar order
+            st.bar_chart(
+                data=monthly_data.set_index('month_key')['total_amount'],
+                use_container_width=True
+            )
+        
+        monthly_data['month_year'] = pd.to_datetime(
+            monthly_data['month_key'], format='%Y-%m'
+        ).dt.strftime('%b %Y')
         
         # Display monthly data in a table
-        monthly_data = monthly_data[['month_year', 'total_amount', 'interest_amount', 'dalali_amount', 'interest_received_by_apnar', 'id']]
-        monthly_data.columns = ['Month/Year', 'Total Amount (₹)', 'Interest Amount (₹)', 'Dalali Amount (₹)', 'Net Interest (₹)', 'Transaction Count']
+        monthly_columns = {
+            'month_year': ('Month/Year', 'text'),
+            'total_amount': ('Total Amount (₹)', 'currency'),
+            'interest_amount': ('Interest Amount (₹)', 'currency'),
+            'dalali_amount': ('Dalali Amount (₹)', 'currency'),
+            'net_interest_amount': ('Net Interest (₹)', 'currency'),
+            'transaction_count': ('Transaction Count', 'number')
+        }
+        show_dataframe(monthly_data, monthly_columns)
+        
+        # Ad-hoc pivot over any two report dimensions
+        st.subheader("Custom Pivot")
         
-        # Format currency columns
-        for col in ['Total Amount (₹)', 'Interest Amount (₹)', 'Dalali Amount (₹)', 'Net Interest (₹)']:
-            monthly_data[col] = monthly_data[col].apply(lambda x: format_currency(x))
+        dimension_names = list(REPORT_DIMENSIONS.keys())
+        measure_names = list(REPORT_MEASURES.keys())
         
-        st.dataframe(monthly_data, use_container_width=True)
+        pivot_col1, pivot_col2, pivot_col3 = st.columns(3)
+        
+        with pivot_col1:
+            pivot_index = st.selectbox(
+                "Rows", dimension_names, index=dimension_names.index('apnaar_party'),
+                format_func=lambda name: REPORT_DIMENSIONS[name][0], key="pivot_index"
+            )
+        
+        with pivot_col2:
+            pivot_columns = st.selectbox(
+                "Columns", [name for name in dimension_names if name != pivot_index],
+                format_func=lambda name: REPORT_DIMENSIONS[name][0], key="pivot_columns"
+            )
+        
+        with pivot_col3:
+            pivot_measure = st.selectbox(
+                "Value", measure_names, index=measure_names.index('total_amount'),
+                format_func=lambda name: REPORT_MEASURES[name][0], key="pivot_measure"
+            )
+        
+        pivot_data = analytics.pivot(pivot_index, pivot_columns, pivot_measure)
+        pivot_data.index.name = REPORT_DIMENSIONS[pivot_index][0]
+        pivot_data.columns = [str(column) for column in pivot_data.columns]
+        
+        pivot_format = "%d" if pivot_measure == 'transaction_count' else CURRENCY_FORMAT
+        if pivot_measure != 'transaction_count':
+            pivot_data = whole_rupees(pivot_data)
+        st.dataframe(
+            pivot_data,
+            column_config={
+                column: st.column_config.NumberColumn(column, format=pivot_format)
+                for column in pivot_data.columns
+            },
+            use_container_width=True
+        )
+        st.caption(f"Computed with {analytics.backend}")
         
         # Export options
         st.subheader("Export Reports")
@@ -1939,27 +2073,25 @@ elif page == "Reports":
         export_col1, export_col2 = st.columns(2)
         
         with export_col1:
-            if st.button("Export All Transactions"):
+            with st.popover("Export All Transactions"):
                 export_format = st.radio(
                     "Export Format",
-                    ["CSV", "Excel"],
+                    ["CSV", "CSV (gzip)", "Excel"],
                     horizontal=True,
                     key="export_all_format"
                 )
                 
-                if st.button(f"Export as {export_format}", key="export_all_button"):
-                    filename = export_data(
-                        df, 
-                        export_format.lower(), 
-                        "all_transactions"
+                if st.button(f"Prepare {export_format} File", key="export_all_button"):
+                    export_download(
+                        db.export_sheets(),
+                        export_format,
+                        "all_transactions",
+                        f"Download {export_format} File",
+                        "export_all_download"
                     )
-                    if filename:
-                        st.success(f"Data exported to {filename}")
-                    else:
-                        st.error("Failed to export data")
         
         with export_col2:
-            if st.button("Export Monthly Summary"):
+            with st.popover("Export Monthly Summary"):
                 export_format = st.radio(
                     "Export Format",
                     ["CSV", "Excel"],
@@ -1967,16 +2099,16 @@ elif page == "Reports":
                     key="export_monthly_format"
                 )
                 
-                if st.button(f"Export as {export_format}", key="export_monthly_button"):
-                    filename = export_data(
-                        monthly_data, 
-                        export_format.lower(), 
-                        "monthly_summary"
+                if st.button(f"Prepare {export_format} File", key="export_monthly_button"):
+                    export_download(
+                        frame_sheets(prepare_export_frame(monthly_data, monthly_columns), "Monthly Summary"),
+                        export_format,
+                        "monthly_summary",
+                        f"Download {export_format} File",
+                        "export_monthly_download"
                     )
-                    if filename:
-                        st.success(f"Data exported to {filename}")
-                    else:
-                        st.error("Failed to export data")
+    
+    analytics.close()
 
 # Settings Page
 elif page == "Settings":
@@ -1985,6 +2117,9 @@ elif page == "Settings":
     # Database backup and restore
     st.subheader("Database Management")
     
+    # Read from the backup catalogs, so this stays instant with thousands of backups
+    backups = get_available_backups()
+    
     tab1, tab2 = st.tabs(["Backup", "Restore"])
     
     with tab1:
@@ -1996,75 +2131,287 @@ elif page == "Settings":
             backup_name = st.text_input("Backup Name (Optional)", 
                 placeholder="Leave empty for automatic timestamp")
             
+            backup_kind = st.radio(
+                "Backup Type",
+                ["Full", "Incremental"],
+                horizontal=True,
+                help="Incremental backups only store the changes since the last backup",
+                key="backup_kind"
+            )
+            
+            codecs = available_codecs()
+            saved_codec = configured_codec(db)
+            backup_codec = st.selectbox(
+                "Compression",
+                codecs,
+                index=codecs.index(saved_codec),
+                format_func=lambda codec: BACKUP_CODECS[codec][2],
+                help="Also used by automatic backups. Fast codecs suit pendrives; small ones suit archives.",
+                key="backup_codec"
+            )
+            if backup_codec != saved_codec:
+                db.set_setting("backup_codec", backup_codec)
+            
             if st.button("Create Backup", key="create_backup"):
-                with st.spinner("Creating backup..."):
-                    # Close the database connection before backup
-                    db.close()
-                    
-                    # Create backup
-                    backup_file = backup_database()
-                    
-                    # Reconnect to the database
-                    db.connect()
-                    
-                    if backup_file:
-                        st.success(f"Backup created successfully: {os.path.basename(backup_file)}")
-                    else:
-                        st.error("Failed to create backup.")
+                # Runs on a background thread; the app stays usable during the copy
+                start_backup(
+                    incremental=backup_kind == "Incremental",
+                    db_path=db.db_path, backup_type="manual", name=backup_name, codec=backup_codec,
+                    replicas=configured_replicas(db)
+                )
+            
+            show_backup_progress()
         
         with col2:
             st.write("Existing backups:")
-            backups = get_available_backups()
             
             if backups:
                 backup_df = pd.DataFrame({
-                    "Date": [b["formatted_date"] for b in backups],
-                    "Filename": [b["filename"] for b in backups]
+                    "Date": pd.to_datetime([b["created_at"] for b in backups]),
+                    "Type": [b["kind"].title() for b in backups],
+                    "Source": [b["backup_type"].title() for b in backups],
+                    "Name": [b["name"] or "" for b in backups],
+                    "Size (KB)": [b["size"] / 1024 for b in backups],
+                    "Transactions": [(b["row_counts"] or {}).get("transactions") for b in backups],
+                    "Payments": [(b["row_counts"] or {}).get("partial_payments") for b in backups],
+                    "Schema": [b["schema_version"] for b in backups],
+                    "Codec": [b["codec"] or "" for b in backups],
+                    "Filename": [b["filename"] for b in backups],
+                    "SHA-256": [b["sha256"][:12] for b in backups]
                 })
                 
-                st.dataframe(backup_df, use_container_width=True)
+                # Typed columns, so clicking a header sorts by date, size or count
+                st.dataframe(
+                    backup_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "Date": st.column_config.DatetimeColumn("Date", format="DD/MM/YYYY HH:mm:ss"),
+                        "Size (KB)": st.column_config.NumberColumn("Size (KB)", format="%.1f"),
+                        "Transactions": st.column_config.NumberColumn("Transactions", format="%d"),
+                        "Payments": st.column_config.NumberColumn("Payments", format="%d")
+                    }
+                )
             else:
                 st.info("No backups found. Create your first backup to protect your data.")
+            
+            if st.button("Rescan Backup Folders", key="rescan_backups",
+                         help="Pick up backup files copied into or deleted from the backup folders by hand"):
+                added = removed = 0
+                for backup_dir in (BACKUP_DIR, AUTO_BACKUP_DIR):
+                    if os.path.isdir(backup_dir):
+                        dir_added, dir_removed = refresh_catalog(backup_dir)
+                        added += dir_added
+                        removed += dir_removed
+                st.toast(f"Backup catalog updated: {added} added, {removed} removed")
+                st.rerun()
     
     with tab2:
         st.write("Restore your database from a previous backup.")
         st.warning("⚠️ Restoring will replace your current data with the backup data. This cannot be undone!")
         
-        backups = get_available_backups()
-        
         if backups:
             selected_backup = st.selectbox(
                 "Select a backup to restore",
                 options=range(len(backups)),
-                format_func=lambda i: f"{backups[i]['formatted_date']} - {backups[i]['filename']}"
+                format_func=lambda i: f"{backups[i]['formatted_date']} - {backups[i]['kind'].title()} - {backups[i]['filename']}"
             )
             
+            # Ask for confirmation
+            confirm_restore = st.checkbox("I understand this will replace my current data", key="confirm_restore")
+            
             if st.button("Restore Selected Backup", key="restore_backup"):
-                with st.spinner("Restoring database..."):
-                    # Ask for confirmation
-                    if st.checkbox("I understand this will replace my current data", key="confirm_restore"):
+                if confirm_restore:
+                    with st.spinner("Restoring database..."):
                         # Close the database connection before restore
                         db.close()
                         
-                        # Restore from backup
-                        success = restore_database(backups[selected_backup]["path"])
+                        # Verify and swap in the backup; the current data goes to the auto backups first
+                        success = restore_database(backups[selected_backup]["path"], db.db_path)
                         
-                        # Reconnect to the database
-                        db.connect()
+                        # Reconnect to the (restored) database file
+                        db.reconnect()
+                    
+                    if success:
+                        st.success("Database restored successfully!")
+                        st.info("The application will now reload with the restored data.")
                         
-                        if success:
-                            st.success("Database restored successfully!")
-                            st.info("The application will now reload with the restored data.")
-                            
-                            # Trigger a rerun to reload the application with the restored data
-                            st.rerun()
-                        else:
-                            st.error("Failed to restore database.")
+                        # Trigger a rerun to reload the application with the restored data
+                        st.rerun()
                     else:
-                        st.error("Please confirm that you understand the implications of restoring a backup.")
+                        st.error("Failed to restore database.")
+                else:
+                    st.error("Please confirm that you understand the implications of restoring a backup.")
         else:
             st.info("No backups found. Create a backup first before attempting to restore.")
     
+    # Scheduled backups are taken by a background thread (see backup.BackupScheduler)
+    st.subheader("Automatic Backups")
+    st.write("Backups are taken automatically while the app is running, whenever data has changed.")
+    
+    schedule = {key: db.get_setting(key, default) for key, default in SCHEDULE_DEFAULTS.items()}
+    
+    schedule_col1, schedule_col2, schedule_col3 = st.columns(3)
+    
+    with schedule_col1:
+        schedule_enabled = st.checkbox(
+            "Take automatic backups",
+            value=schedule['backup_schedule_enabled'],
+            key="backup_schedule_enabled"
+        )
+    
+    with schedule_col2:
+        backup_interval = st.number_input(
+            "Every (minutes, 0 = off)",
+            min_value=0,
+            value=schedule['backup_interval_minutes'],
+            step=15,
+            key="backup_interval_minutes"
+        )
+    
+    with schedule_col3:
+        backup_after_changes = st.number_input(
+            "Or after this many changes (0 = off)",
+            min_value=0,
+            value=schedule['backup_after_changes'],
+            step=50,
+            key="backup_after_changes"
+        )
+    
+    st.write("Automatic backups to keep (the newest backup of each period):")
+    keep_columns = st.columns(4)
+    keep_counts = {}
+    for keep_column, period in zip(keep_columns, ["hourly", "daily", "weekly", "monthly"]):
+        with keep_column:
+            keep_counts[period] = st.number_input(
+                period.title(),
+                min_value=0,
+                value=schedule[f'backup_keep_{period}'],
+                step=1,
+                key=f"backup_keep_{period}"
+            )
+    
+    if st.button("Save Backup Schedule", key="save_backup_schedule"):
+        saved = all([
+            db.set_setting("backup_schedule_enabled", schedule_enabled),
+            db.set_setting("backup_interval_minutes", int(backup_interval)),
+            db.set_setting("backup_after_changes", int(backup_after_changes))
+        ] + [
+            db.set_setting(f"backup_keep_{period}", int(count)) for period, count in keep_counts.items()
+        ])
+        if saved:
+            st.success("Backup schedule saved.")
+        else:
+            st.error("Failed to save the backup schedule.")
+    
+    last_run = db.get_setting("backup_last_run_at", "")
+    if last_run:
+        last_file = db.get_setting("backup_last_file", "")
+        st.caption(
+            f"Last automatic backup: {datetime.strptime(last_run, '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M:%S')} - "
+            f"{db.get_setting('backup_last_status', '')} in {db.get_setting('backup_last_duration', 0.0):.1f} s"
+            + (f" ({last_file})" if last_file else "")
+        )
+    else:
+        st.caption("No automatic backup has run yet.")
+    
+    # Every backup is also copied to these folders (see backup.replicate_backup)
+    st.subheader("Backup Copies")
+    st.write("Copy every backup to other drives as well, e.g. the laptop disk and a second USB drive. "
+             "Each copy is checked against the backup's checksum as it is written.")
+    
+    replica_dirs = st.text_area(
+        "Backup folders (one per line)",
+        value="\n".join(configured_replicas(db)),
+        placeholder="D:\\HisaabSetu Backups\nE:\\Backups",
+        key="backup_replica_dirs"
+    )
+    
+    if st.button("Save Backup Folders", key="save_backup_replicas"):
+        folders = [line.strip() for line in replica_dirs.splitlines() if line.strip()]
+        if db.set_setting("backup_replica_dirs", "\n".join(folders)):
+            st.success(f"{len(folders)} backup folders saved.")
+        else:
+            st.error("Failed to save the backup folders.")
+    
+    # Downloads are built in memory; saved copies in data/exports are optional
+    st.subheader("Exports")
+    st.write("Exports are downloaded straight from the browser. Copies can also be kept in the data/exports folder.")
+    
+    export_col1, export_col2, export_col3 = st.columns(3)
+    
+    with export_col1:
+        keep_export_copies = st.checkbox(
+            "Keep a copy of every export",
+            value=db.get_setting("export_keep_copies", False),
+            key="export_keep_copies"
+        )
+    
+    with export_col2:
+        export_retention_days = st.number_input(
+            "Delete copies older than (days, 0 = never)",
+            min_value=0,
+            value=db.get_setting("export_retention_days", EXPORT_RETENTION_DAYS),
+            step=1,
+            key="export_retention_days"
+        )
+    
+    with export_col3:
+        export_retention_count = st.number_input(
+            "Keep at most (files, 0 = no limit)",
+            min_value=0,
+            value=db.get_setting("export_retention_count", EXPORT_RETENTION_COUNT),
+            step=1,
+            key="export_retention_count"
+        )
+    
+    save_col, prune_col = st.columns(2)
+    
+    with save_col:
+        if st.button("Save Export Settings", key="save_export_settings"):
+            saved = all([
+                db.set_setting("export_keep_copies", keep_export_copies),
+                db.set_setting("export_retention_days", int(export_retention_days)),
+                db.set_setting("export_retention_count", int(export_retention_count))
+            ])
+            if saved:
+                st.success("Export settings saved.")
+            else:
+                st.error("Failed to save export settings.")
+    
+    with prune_col:
+        if st.button("Clean Up Saved Exports", key="prune_exports"):
+            removed = prune_exports(
+                keep_days=int(export_retention_days),
+                keep_count=int(export_retention_count)
+            )
+            st.success(f"Deleted {len(removed)} old export files.")
+    
+    # Materialised summary tables used by the Reports page
+    st.subheader("Summary Tables")
+    st.write("Party-wise and monthly reports are read from summary tables that are updated on every change.")
+    
+    summary_col1, summary_col2 = st.columns(2)
+    
+    with summary_col1:
+        if st.button("Check Summary Tables", key="check_summaries"):
+            results = db.check_summary_tables()
+            if any(mismatches is None for mismatches in results.values()):
+                st.error("Failed to check summary tables.")
+            elif any(results.values()):
+                mismatch_count = sum(len(mismatches) for mismatches in results.values())
+                st.warning(f"Found {mismatch_count} mismatches. Rebuild the summary tables to fix them.")
+            else:
+                st.success("Summary tables are consistent with the transactions.")
+    
+    with summary_col2:
+        if st.button("Rebuild Summary Tables", key="rebuild_summaries"):
+            with st.spinner("Rebuilding summary tables..."):
+                if db.rebuild_summary_tables():
+                    st.success("Summary tables rebuilt successfully.")
+                else:
+                    st.error("Failed to rebuild summary tables.")
+    
     # Application information
     st.subheader("About HISAABSETU")
     
@@ -2114,3 +2461,5 @@ elif page == "Settings":
 # Close the database connection when the app is done
 # (In a real Streamlit app, this isn't strictly necessary as the connection will be reopened on next run)
 db.close()
+
+record_startup_timing()
@@ -0,0 +1,1307 @@
+import os
+import sys
+import json
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+DB_PATH = "data/hisaabsetu.db"
+BACKUP_DIR = "data/backups"
+AUTO_BACKUP_DIR = "data/auto_backups"
+
+# Pages copied per step of the online backup; the app's own writes can go
+# through between steps
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+BACKUP_MAX_RESTARTS = 3
+
+# Bytes read per write into the compressed archive
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Compression codecs for backup archives: name -> (zip compression, level, label).
+# zstd is not a zip method before Python 3.14, so a zstd backup stores the
+# database member as a zstd stream (written with pyarrow, which ships with
+# Streamlit) named *.db.zst; restores recognise it by that name.
+BACKUP_CODECS = {
+    'stored': (zipfile.ZIP_STORED, None, "None (fastest, largest)"),
+    'deflate-1': (zipfile.ZIP_DEFLATED, 1, "Deflate level 1 (fast)"),
+    'deflate-6': (zipfile.ZIP_DEFLATED, 6, "Deflate level 6 (balanced)"),
+    'deflate-9': (zipfile.ZIP_DEFLATED, 9, "Deflate level 9"),
+    'bzip2': (zipfile.ZIP_BZIP2, 9, "bzip2"),
+    'lzma': (zipfile.ZIP_LZMA, None, "LZMA (smallest, slowest)"),
+    'zstd': (zipfile.ZIP_STORED, None, "Zstandard (fast and small)")
+}
+DEFAULT_CODEC = "deflate-6"
+ZSTD_SUFFIX = ".zst"
+
+# Index of the archives in a backup directory, including incremental chains.
+# CATALOG_VERSION is kept in the catalog's user_version; opening an older
+# catalog adds the new columns and catalogues archives it does not list yet.
+CATALOG_NAME = "catalog.db"
+CATALOG_VERSION = 3
+
+# Columns added to the catalog after its first version
+CATALOG_COLUMNS = {
+    'name': "TEXT",
+    'schema_version': "INTEGER",
+    'database_size': "INTEGER",
+    'row_counts': "TEXT",
+    'codec': "TEXT"
+}
+
+BACKUP_PREFIXES = ("hisaabsetu_backup_", "hisaabsetu_incremental_")
+
+# Incremental backups per chain before the next backup is a full one again,
+# which bounds how many changesets a restore has to replay
+MAX_CHAIN_LENGTH = 48
+
+# Row ids per IN (...) query when reading changed rows
+CHANGESET_BATCH_SIZE = 500
+
+# Folders whose chains are extended with incremental backups. A full backup
+# written anywhere else (e.g. the restore safety copy) never trims the change
+# log past what the newest backup in these folders still needs.
+CHAIN_DIRS = (BACKUP_DIR,)
+
+# Automatic backups: Settings page preferences (app_settings keys) and their defaults.
+# An interval or change count of 0 turns that trigger off.
+SCHEDULE_DEFAULTS = {
+    'backup_schedule_enabled': True,
+    'backup_interval_minutes': 60,
+    'backup_after_changes': 200,
+    'backup_keep_hourly': 24,
+    'backup_keep_daily': 7,
+    'backup_keep_weekly': 4,
+    'backup_keep_monthly': 12
+}
+
+# Seconds between the scheduler's checks, and before its first one so it
+# stays out of the way while the app starts
+SCHEDULER_POLL_SECONDS = 30
+SCHEDULER_START_DELAY = 60
+
+# Grandfather-father-son retention periods, as strftime patterns of their buckets
+RETENTION_PERIODS = {
+    'hourly': "%Y-%m-%d %H",
+    'daily': "%Y-%m-%d",
+    'weekly': "%G-W%V",
+    'monthly': "%Y-%m"
+}
+
+CHANGESET_MEMBER = "changeset.json"
+METADATA_MEMBER = "backup_metadata.json"
+
+# Tables a file must have to be restored as the ledger
+REQUIRED_TABLES = ('apnaar_parties', 'lenaar_parties', 'transactions')
+
+class BackupRestarted(Exception):
+    """Raised from the backup progress callback when another connection wrote mid-copy"""
+
+class RestoreError(Exception):
+    """Raised when a backup cannot be restored; the live database is left untouched"""
+
+class ReplicationError(Exception):
+    """Raised when a backup copy does not match the checksum in the catalog"""
+
+def snapshot_database(db_path, snapshot_path, progress=None):
+    """
+    Copy a live database to snapshot_path with the SQLite online backup API.
+    The copy is consistent even while the app keeps writing; progress is called
+    with the fraction of pages copied.
+    SQLite restarts a stepped backup whenever another connection writes, so after
+    BACKUP_MAX_RESTARTS the rest is copied in a single step, which only holds
+    the read lock for as long as one local file copy takes.
+    """
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(snapshot_path)
+    try:
+        restarts = 0
+        last_remaining = None
+
+        def report(status, remaining, total):
+            nonlocal last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                raise BackupRestarted()
+            last_remaining = remaining
+            if progress and total:
+                progress((total - remaining) / total)
+
+        while True:
+            pages = BACKUP_PAGES_PER_STEP if restarts < BACKUP_MAX_RESTARTS else -1
+            try:
+                source.backup(target, pages=pages, progress=report, sleep=BACKUP_STEP_SLEEP)
+                break
+            except BackupRestarted:
+                restarts += 1
+                last_remaining = None
+    finally:
+        target.close()
+        source.close()
+
+def zstd_available():
+    """True when the zstd codec can be used (pyarrow with zstd support)"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return False
+    return pa.Codec.is_available("zstd")
+
+def available_codecs():
+    """BACKUP_CODECS names usable on this install"""
+    return [codec for codec in BACKUP_CODECS if codec != 'zstd' or zstd_available()]
+
+def configured_codec(db):
+    """The backup codec chosen on the Settings page, or the default if this install cannot use it"""
+    codec = db.get_setting('backup_codec', DEFAULT_CODEC)
+    return codec if codec in available_codecs() else DEFAULT_CODEC
+
+def codec_archive_options(codec):
+    """zipfile compression and compresslevel arguments for a codec"""
+    if codec not in BACKUP_CODECS:
+        raise ValueError(f"Unknown backup codec: {codec}")
+    compression, level, _ = BACKUP_CODECS[codec]
+    return {'compression': compression, 'compresslevel': level}
+
+def compress_snapshot(snapshot_path, archive_path, member_name, metadata, progress=None, codec=DEFAULT_CODEC):
+    """
+    Stream a snapshot file into a zip archive chunk by chunk with a
+    BACKUP_CODECS codec, with the metadata alongside it. The archive is written
+    under a temporary name and renamed when complete, so a failed backup never
+    leaves a truncated zip behind.
+    """
+    total = os.path.getsize(snapshot_path)
+    temp_path = f"{archive_path}.tmp"
+    options = codec_archive_options(codec)
+    if codec == 'zstd':
+        import pyarrow as pa
+        member_name += ZSTD_SUFFIX
+
+    try:
+        with zipfile.ZipFile(temp_path, 'w', **options) as zipf:
+            with open(snapshot_path, 'rb') as source, zipf.open(member_name, 'w', force_zip64=True) as member:
+                target = pa.CompressedOutputStream(member, "zstd") if codec == 'zstd' else member
+                copied = 0
+                while True:
+                    chunk = source.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    copied += len(chunk)
+                    if progress and total:
+                        progress(copied / total)
+                if target is not member:
+                    target.close()
+
+            zipf.writestr(METADATA_MEMBER, json.dumps(metadata, indent=4))
+
+        os.replace(temp_path, archive_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def open_catalog(backup_dir=BACKUP_DIR):
+    """Open (and create or upgrade if needed) the catalog of the archives in backup_dir"""
+    os.makedirs(backup_dir, exist_ok=True)
+    catalog = sqlite3.connect(os.path.join(backup_dir, CATALOG_NAME), timeout=30)
+    catalog.execute('''
+    CREATE TABLE IF NOT EXISTS backups (
+        file TEXT PRIMARY KEY,
+        backup_type TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        chain_id TEXT NOT NULL,
+        parent TEXT,
+        database_id TEXT,
+        change_seq INTEGER NOT NULL DEFAULT 0,
+        size INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        name TEXT,
+        schema_version INTEGER,
+        database_size INTEGER,
+        row_counts TEXT,
+        codec TEXT
+    )
+    ''')
+    catalog.execute("CREATE INDEX IF NOT EXISTS idx_backups_created_at ON backups (created_at)")
+
+    if catalog.execute("PRAGMA user_version").fetchone()[0] < CATALOG_VERSION:
+        # Another thread may be upgrading the same catalog; take the write lock and check again
+        catalog.execute("BEGIN IMMEDIATE")
+        if catalog.execute("PRAGMA user_version").fetchone()[0] < CATALOG_VERSION:
+            columns = [row[1] for row in catalog.execute("PRAGMA table_info(backups)")]
+            for column, column_type in CATALOG_COLUMNS.items():
+                if column not in columns:
+                    catalog.execute(f"ALTER TABLE backups ADD COLUMN {column} {column_type}")
+            sync_catalog(catalog, backup_dir)
+            catalog.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        catalog.commit()
+
+    return catalog
+
+def catalog_rows(cursor):
+    """Rows of a catalog query as dicts, with row_counts decoded"""
+    columns = [column[0] for column in cursor.description]
+    rows = []
+    for row in cursor.fetchall():
+        entry = dict(zip(columns, row))
+        if entry.get('row_counts'):
+            entry['row_counts'] = json.loads(entry['row_counts'])
+        rows.append(entry)
+    return rows
+
+def catalog_entry(backup_dir, file):
+    """Catalog row for one archive as a dict, or None"""
+    catalog = open_catalog(backup_dir)
+    try:
+        rows = catalog_rows(catalog.execute("SELECT * FROM backups WHERE file = ?", (file,)))
+        return rows[0] if rows else None
+    finally:
+        catalog.close()
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """Catalog rows of every archive in backup_dir, newest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    catalog = open_catalog(backup_dir)
+    try:
+        return catalog_rows(catalog.execute("SELECT * FROM backups ORDER BY created_at DESC, rowid DESC"))
+    finally:
+        catalog.close()
+
+def file_sha256(path):
+    """SHA-256 of a file, read in COPY_CHUNK_SIZE chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def insert_catalog_entry(catalog, archive_path, metadata):
+    """Write one archive's catalog row on an open catalog connection"""
+    row_counts = metadata.get('row_counts')
+    catalog.execute('''
+    INSERT OR REPLACE INTO backups (
+        file, backup_type, kind, chain_id, parent, database_id, change_seq,
+        size, sha256, created_at, name, schema_version, database_size, row_counts, codec
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        os.path.basename(archive_path), metadata.get('backup_type', "manual"), metadata['kind'],
+        metadata['chain_id'], metadata.get('parent'), metadata.get('database_id'),
+        metadata.get('change_seq', 0), os.path.getsize(archive_path),
+        file_sha256(archive_path), metadata['backup_date'], metadata.get('backup_name') or None,
+        metadata.get('schema_version'), metadata.get('database_size'),
+        json.dumps(row_counts) if row_counts is not None else None, metadata.get('codec')
+    ))
+
+def copy_catalog_entry(backup_dir, entry):
+    """Add a catalog row from another backup folder's catalog, e.g. for a replicated archive"""
+    entry = dict(entry)
+    if entry.get('row_counts') is not None:
+        entry['row_counts'] = json.dumps(entry['row_counts'])
+    catalog = open_catalog(backup_dir)
+    try:
+        catalog.execute(
+            f"INSERT OR REPLACE INTO backups ({', '.join(entry)}) VALUES ({', '.join('?' * len(entry))})",
+            list(entry.values())
+        )
+        catalog.commit()
+    finally:
+        catalog.close()
+
+def register_backup(backup_dir, archive_path, metadata):
+    """Add a finished archive to the catalog"""
+    catalog = open_catalog(backup_dir)
+    try:
+        insert_catalog_entry(catalog, archive_path, metadata)
+        catalog.commit()
+    finally:
+        catalog.close()
+
+def archive_metadata(archive_path):
+    """
+    Catalog metadata for an archive the catalog does not list yet, e.g. one made
+    before the catalog existed or copied into the folder by hand. Uses the
+    archive's metadata member when it has one, the file name and modification
+    time otherwise.
+    """
+    with zipfile.ZipFile(archive_path, 'r') as zipf:
+        members = zipf.namelist()
+        metadata = json.loads(zipf.read(METADATA_MEMBER)) if METADATA_MEMBER in members else {}
+        member = database_member(members)
+        database_info = zipf.getinfo(member) if member else None
+
+    file = os.path.basename(archive_path)
+    if 'backup_date' not in metadata:
+        modified = datetime.fromtimestamp(os.path.getmtime(archive_path))
+        metadata['backup_date'] = modified.strftime("%Y-%m-%d %H:%M:%S")
+    if 'kind' not in metadata:
+        metadata['kind'] = "incremental" if CHANGESET_MEMBER in members else "full"
+    if 'chain_id' not in metadata:
+        metadata['chain_id'] = file
+    if 'codec' not in metadata and database_info:
+        if member.endswith(ZSTD_SUFFIX):
+            metadata['codec'] = "zstd"
+        else:
+            # The level is not recorded in the zip; older backups used the default one
+            metadata['codec'] = {
+                zipfile.ZIP_STORED: "stored",
+                zipfile.ZIP_DEFLATED: DEFAULT_CODEC,
+                zipfile.ZIP_BZIP2: "bzip2",
+                zipfile.ZIP_LZMA: "lzma"
+            }.get(database_info.compress_type)
+    if 'database_size' not in metadata and database_info and not member.endswith(ZSTD_SUFFIX):
+        metadata['database_size'] = database_info.file_size
+    return metadata
+
+def sync_catalog(catalog, backup_dir):
+    """
+    Bring the catalog in line with the archives actually in backup_dir: add
+    archives it does not list and drop rows whose file is gone. This is the
+    only place the directory is scanned.
+    Returns (added, removed).
+    """
+    listed = {row[0] for row in catalog.execute("SELECT file FROM backups")}
+    present = {
+        file for file in os.listdir(backup_dir)
+        if file.startswith(BACKUP_PREFIXES) and file.endswith(".zip")
+    }
+
+    added = 0
+    for file in sorted(present - listed):
+        archive_path = os.path.join(backup_dir, file)
+        try:
+            insert_catalog_entry(catalog, archive_path, archive_metadata(archive_path))
+            added += 1
+        except (zipfile.BadZipFile, KeyError, ValueError, OSError) as e:
+            print(f"Skipping unreadable backup {file}: {e}")
+
+    removed = listed - present
+    catalog.executemany("DELETE FROM backups WHERE file = ?", [(file,) for file in removed])
+    return added, len(removed)
+
+def refresh_catalog(backup_dir=BACKUP_DIR):
+    """Rescan backup_dir for archives added or deleted outside the app. Returns (added, removed)."""
+    catalog = open_catalog(backup_dir)
+    try:
+        result = sync_catalog(catalog, backup_dir)
+        catalog.commit()
+        return result
+    finally:
+        catalog.close()
+
+def read_row_counts(connection):
+    """Row count of each CHANGE_LOG_TABLES table that exists in the database"""
+    from database import Database
+
+    existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {
+        table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in Database.CHANGE_LOG_TABLES if table in existing
+    }
+
+def change_log_seq(connection):
+    """
+    Highest change_log seq ever issued. AUTOINCREMENT keeps it in
+    sqlite_sequence, so it is still right after the log has been trimmed empty.
+    """
+    try:
+        row = connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    except sqlite3.OperationalError:
+        # No AUTOINCREMENT row has ever been written
+        return 0
+    return row[0] if row else 0
+
+def read_database_info(db_path):
+    """
+    Catalog details of a database file: database_id, last change_log seq,
+    schema version and row counts. Old schemas give None and 0 for the first two.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        info = {
+            'schema_version': connection.execute("PRAGMA user_version").fetchone()[0],
+            'row_counts': read_row_counts(connection)
+        }
+        try:
+            row = connection.execute("SELECT value FROM app_settings WHERE key = 'database_id'").fetchone()
+            info['database_id'] = row[0] if row else None
+            info['change_seq'] = change_log_seq(connection)
+        except sqlite3.Error:
+            info['database_id'] = None
+            info['change_seq'] = 0
+        return info
+    finally:
+        connection.close()
+
+def reset_database_id(db_path):
+    """Give a restored database file a new id so it starts a new backup chain"""
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute("DELETE FROM app_settings WHERE key = 'database_id'")
+        connection.commit()
+    except sqlite3.Error:
+        # Backups from before app_settings existed have no id to reset
+        pass
+    finally:
+        connection.close()
+
+def ensure_database_id(db_path):
+    """Give the database an id for backup chains if it has none yet"""
+    from database import Database
+
+    db = Database(db_path)
+    try:
+        return db.get_database_id()
+    finally:
+        db.close()
+
+def backup_path(backup_dir, prefix="hisaabsetu_backup"):
+    """Timestamped archive path in backup_dir that is not taken yet"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = f"{backup_dir}/{prefix}_{timestamp}.zip"
+    suffix = 1
+    while os.path.exists(path):
+        path = f"{backup_dir}/{prefix}_{timestamp}_{suffix}.zip"
+        suffix += 1
+    return path
+
+def create_backup(db_path=DB_PATH, backup_dir=BACKUP_DIR, backup_type="manual", name="", progress=None, codec=DEFAULT_CODEC):
+    """
+    Take an online full backup of db_path into a timestamped zip in backup_dir.
+    The snapshot goes to a local temp file first so the live database is only
+    read once, then it is compressed into the archive and catalogued as the
+    start of a new incremental chain.
+    progress: optional callback(fraction, message)
+    codec: a BACKUP_CODECS name
+    Returns the archive path.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    ensure_database_id(db_path)
+    archive_path = backup_path(backup_dir)
+
+    def report(start, end, message):
+        if progress:
+            return lambda fraction: progress(start + (end - start) * fraction, message)
+        return None
+
+    handle, snapshot_path = tempfile.mkstemp(prefix="hisaabsetu_snapshot_", suffix=".db")
+    os.close(handle)
+    try:
+        snapshot_database(db_path, snapshot_path, report(0.0, 0.5, "Copying database..."))
+
+        # The snapshot itself says how far the change log had got when it was taken
+        info = read_database_info(snapshot_path)
+        change_seq = info['change_seq']
+        metadata = {
+            "backup_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "original_path": db_path,
+            "backup_type": backup_type,
+            "backup_name": name,
+            "method": "sqlite_online_backup",
+            "codec": codec,
+            "kind": "full",
+            "chain_id": os.path.basename(archive_path),
+            "database_id": info['database_id'],
+            "change_seq": change_seq,
+            "schema_version": info['schema_version'],
+            "database_size": os.path.getsize(snapshot_path),
+            "row_counts": info['row_counts']
+        }
+        compress_snapshot(
+            snapshot_path, archive_path, os.path.basename(db_path), metadata,
+            report(0.5, 1.0, "Compressing backup..."), codec
+        )
+    finally:
+        os.remove(snapshot_path)
+
+    register_backup(backup_dir, archive_path, metadata)
+    trim_change_log(db_path, change_seq, info['database_id'], backup_dir)
+
+    if progress:
+        progress(1.0, "Backup complete")
+    return archive_path
+
+def trim_change_log(db_path, change_seq, database_id=None, backup_dir=BACKUP_DIR):
+    """
+    Drop change_log entries already covered by a full backup in backup_dir,
+    keeping those that the newest backup of this database in another of
+    CHAIN_DIRS still needs for its next incremental backup
+    """
+    for chain_dir in CHAIN_DIRS:
+        if os.path.abspath(chain_dir) == os.path.abspath(backup_dir) or not os.path.isdir(chain_dir):
+            continue
+        latest = latest_backup(chain_dir)
+        if latest is not None and latest['database_id'] == database_id and latest['change_seq'] is not None:
+            change_seq = min(change_seq, latest['change_seq'])
+
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute("DELETE FROM change_log WHERE seq <= ?", (change_seq,))
+        connection.commit()
+    except sqlite3.Error as e:
+        print(f"Error trimming change log: {e}")
+    finally:
+        connection.close()
+
+def latest_backup(backup_dir):
+    """Newest catalog entry in backup_dir as a dict, or None"""
+    catalog = open_catalog(backup_dir)
+    try:
+        rows = catalog_rows(catalog.execute("SELECT * FROM backups ORDER BY created_at DESC, rowid DESC LIMIT 1"))
+        return rows[0] if rows else None
+    finally:
+        catalog.close()
+
+def chain_length(backup_dir, chain_id):
+    """Number of incremental backups in a chain"""
+    catalog = open_catalog(backup_dir)
+    try:
+        return catalog.execute(
+            "SELECT COUNT(*) FROM backups WHERE chain_id = ? AND kind = 'incremental'", (chain_id,)
+        ).fetchone()[0]
+    finally:
+        catalog.close()
+
+def read_changeset(connection, since_seq):
+    """
+    Collect the current state of every row changed after since_seq.
+    Must run inside one read transaction so the rows match the change log.
+    Returns (changeset, last seq), or (None, seq) when a '*' entry means
+    only a full backup can capture the changes.
+    """
+    from database import Database
+
+    change_seq = change_log_seq(connection)
+    changeset = {}
+
+    changed = {}
+    for table_name, row_id in connection.execute(
+        "SELECT DISTINCT table_name, row_id FROM change_log WHERE seq > ? AND seq <= ?",
+        (since_seq, change_seq)
+    ):
+        if table_name == '*':
+            return None, change_seq
+        changed.setdefault(table_name, []).append(row_id)
+
+    for table in Database.CHANGE_LOG_TABLES:
+        row_ids = changed.get(table)
+        if not row_ids:
+            continue
+
+        columns = None
+        rows = []
+        for start in range(0, len(row_ids), CHANGESET_BATCH_SIZE):
+            batch = row_ids[start:start + CHANGESET_BATCH_SIZE]
+            cursor = connection.execute(
+                f"SELECT * FROM {table} WHERE id IN ({', '.join('?' * len(batch))})", batch
+            )
+            columns = [column[0] for column in cursor.description]
+            rows.extend(cursor.fetchall())
+
+        found = {row[columns.index('id')] for row in rows}
+        changeset[table] = {
+            'columns': columns,
+            'rows': rows,
+            'deleted': [row_id for row_id in row_ids if row_id not in found]
+        }
+
+    return changeset, change_seq
+
+def create_incremental_backup(db_path=DB_PATH, backup_dir=BACKUP_DIR, backup_type="manual", name="", progress=None, codec=DEFAULT_CODEC):
+    """
+    Back up only the rows changed since the newest backup in backup_dir.
+    Falls back to create_backup when there is no chain to extend: no earlier
+    backup, a different or restored database, a trimmed change log, a bulk
+    import, or a chain already MAX_CHAIN_LENGTH long.
+    Returns the archive path, or None when nothing changed.
+    """
+    database_id = ensure_database_id(db_path)
+    parent = latest_backup(backup_dir)
+
+    if (
+        parent is None
+        or parent['database_id'] != database_id
+        or not os.path.exists(os.path.join(backup_dir, parent['file']))
+        or chain_length(backup_dir, parent['chain_id']) >= MAX_CHAIN_LENGTH
+    ):
+        return create_backup(db_path, backup_dir, backup_type, name, progress, codec)
+
+    if progress:
+        progress(0.1, "Collecting changes...")
+
+    connection = sqlite3.connect(db_path)
+    try:
+        # One read transaction, so the rows and the change log agree
+        connection.execute("BEGIN")
+        # Entries up to trimmed_seq are gone; if the parent needs any of them
+        # (a full backup elsewhere trimmed the log), only a full backup will do
+        oldest_seq = connection.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+        trimmed_seq = change_log_seq(connection) if oldest_seq is None else oldest_seq - 1
+        if trimmed_seq > parent['change_seq']:
+            changeset = None
+        else:
+            changeset, change_seq = read_changeset(connection, parent['change_seq'])
+            schema_version = connection.execute("PRAGMA user_version").fetchone()[0]
+            row_counts = read_row_counts(connection)
+        connection.rollback()
+    finally:
+        connection.close()
+
+    if changeset is None:
+        return create_backup(db_path, backup_dir, backup_type, name, progress, codec)
+
+    if not changeset:
+        if progress:
+            progress(1.0, "No changes since the last backup")
+        return None
+
+    # Changesets are small zip members; zstd ones fall back to the default codec
+    if codec == 'zstd':
+        codec = DEFAULT_CODEC
+
+    archive_path = backup_path(backup_dir, "hisaabsetu_incremental")
+    metadata = {
+        "backup_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "original_path": db_path,
+        "backup_type": backup_type,
+        "backup_name": name,
+        "method": "change_log",
+        "codec": codec,
+        "kind": "incremental",
+        "chain_id": parent['chain_id'],
+        "parent": parent['file'],
+        "database_id": database_id,
+        "since_seq": parent['change_seq'],
+        "change_seq": change_seq,
+        "schema_version": schema_version,
+        "row_counts": row_counts,
+        "changed_rows": sum(len(table['rows']) + len(table['deleted']) for table in changeset.values())
+    }
+
+    if progress:
+        progress(0.5, "Writing changes...")
+
+    temp_path = f"{archive_path}.tmp"
+    try:
+        with zipfile.ZipFile(temp_path, 'w', **codec_archive_options(codec)) as zipf:
+            zipf.writestr(CHANGESET_MEMBER, json.dumps(changeset))
+            zipf.writestr(METADATA_MEMBER, json.dumps(metadata, indent=4))
+        os.replace(temp_path, archive_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    register_backup(backup_dir, archive_path, metadata)
+
+    if progress:
+        progress(1.0, "Backup complete")
+    return archive_path
+
+def backup_chain(backup_path):
+    """
+    Archives needed to rebuild the database as of backup_path, oldest first:
+    the chain's full backup followed by its changesets. Archives missing from
+    the catalog (older backups) are treated as full backups.
+    """
+    backup_dir = os.path.dirname(backup_path) or "."
+    chain = []
+    file = os.path.basename(backup_path)
+
+    while file:
+        entry = catalog_entry(backup_dir, file)
+        path = os.path.join(backup_dir, file)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Backup chain is missing {file}")
+        chain.append(path)
+        if entry is None or entry['kind'] == 'full':
+            break
+        file = entry['parent']
+
+    chain.reverse()
+    return chain
+
+def database_member(names):
+    """Name of the database member among an archive's member names, or None"""
+    return next((name for name in names if name.endswith((".db", ".db" + ZSTD_SUFFIX))), None)
+
+def extract_database(archive_path, output_path):
+    """
+    Stream the database member of a full backup archive into output_path.
+    zip codecs are decompressed by zipfile; a *.db.zst member is a zstd stream.
+    """
+    with zipfile.ZipFile(archive_path, 'r') as zipf:
+        member = database_member(zipf.namelist())
+        if member is None:
+            raise ValueError(f"{os.path.basename(archive_path)} does not contain a database")
+        if member.endswith(ZSTD_SUFFIX) and not zstd_available():
+            raise ValueError(f"{os.path.basename(archive_path)} is zstd-compressed, which this install cannot read")
+
+        with zipf.open(member) as stored, open(output_path, 'wb') as target:
+            if member.endswith(ZSTD_SUFFIX):
+                import pyarrow as pa
+                source = pa.CompressedInputStream(stored, "zstd")
+            else:
+                source = stored
+            while True:
+                chunk = source.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+
+def unique_columns(connection, table):
+    """Columns of table that have a single-column UNIQUE constraint, other than id"""
+    columns = []
+    for index in connection.execute(f"PRAGMA index_list({table})").fetchall():
+        # (seq, name, unique, origin, partial); origin 'pk' is the primary key
+        if not index[2] or index[3] == 'pk':
+            continue
+        indexed = connection.execute(f"PRAGMA index_info({index[1]})").fetchall()
+        if len(indexed) == 1 and indexed[0][2] != 'id':
+            columns.append(indexed[0][2])
+    return columns
+
+def apply_changeset(connection, changeset):
+    """
+    Replay one changeset: delete the removed rows, then upsert the changed ones.
+    Deleting first frees the names of deleted parties for rows that re-use
+    them, and unique columns of changed rows are parked on placeholder values
+    before the upserts so two rows can swap names. Upserts fire the update
+    triggers, so the summary tables stay correct.
+    """
+    from database import Database
+
+    # Children first, so payments go before their transactions
+    for table in reversed(Database.CHANGE_LOG_TABLES):
+        if table in changeset and changeset[table]['deleted']:
+            connection.executemany(
+                f"DELETE FROM {table} WHERE id = ?",
+                [(row_id,) for row_id in changeset[table]['deleted']]
+            )
+
+    for table in Database.CHANGE_LOG_TABLES:
+        if table not in changeset:
+            continue
+        columns = changeset[table]['columns']
+        id_index = columns.index('id')
+
+        for column in unique_columns(connection, table):
+            if column in columns:
+                connection.executemany(
+                    f"UPDATE {table} SET {column} = 'restoring ' || id WHERE id = ?",
+                    [(row[id_index],) for row in changeset[table]['rows']]
+                )
+
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != 'id')
+        connection.executemany(f'''
+        INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+        ON CONFLICT (id) DO UPDATE SET {updates}
+        ''', changeset[table]['rows'])
+
+def materialise_backup(backup_path, output_path):
+    """
+    Write the database as of backup_path to output_path: the chain's full
+    backup with each changeset replayed in order
+    """
+    chain = backup_chain(backup_path)
+    extract_database(chain[0], output_path)
+
+    if len(chain) > 1:
+        connection = sqlite3.connect(output_path)
+        try:
+            for archive_path in chain[1:]:
+                with zipfile.ZipFile(archive_path, 'r') as zipf:
+                    apply_changeset(connection, json.loads(zipf.read(CHANGESET_MEMBER)))
+            connection.commit()
+        finally:
+            connection.close()
+
+    return output_path
+
+def verify_archive(archive_path):
+    """Check an archive against the SHA-256 recorded in its catalog when it was written"""
+    entry = catalog_entry(os.path.dirname(archive_path) or ".", os.path.basename(archive_path))
+    if entry and file_sha256(archive_path) != entry['sha256']:
+        raise RestoreError(f"{os.path.basename(archive_path)} does not match its checksum; the file is damaged")
+
+def verify_database(db_path):
+    """
+    Check that a restored file is a sound HisaabSetu database this version can
+    open: PRAGMA quick_check passes, the ledger tables exist and the schema is
+    not newer than Database.SCHEMA_VERSION. Returns the schema version.
+    """
+    from database import Database
+
+    connection = sqlite3.connect(db_path)
+    try:
+        try:
+            problems = [row[0] for row in connection.execute("PRAGMA quick_check")]
+        except sqlite3.DatabaseError as e:
+            raise RestoreError(f"The backup is not a valid database: {e}")
+        if problems != ["ok"]:
+            raise RestoreError(f"The backup failed its integrity check: {'; '.join(problems[:5])}")
+
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [table for table in REQUIRED_TABLES if table not in tables]
+        if missing:
+            raise RestoreError(f"The backup is not a HisaabSetu database (missing {', '.join(missing)})")
+
+        schema_version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if schema_version > Database.SCHEMA_VERSION:
+            raise RestoreError(
+                f"The backup was made by a newer version of HisaabSetu "
+                f"(schema {schema_version}, this version reads up to {Database.SCHEMA_VERSION})"
+            )
+        return schema_version
+    finally:
+        connection.close()
+
+def prepare_restored_database(restored_path, db_path):
+    """
+    Get a verified restore ready to go live: upgrade it to the current schema,
+    give it a new database id (so it starts a new backup chain) and move its
+    data_version past the live database's, so reports cached for the live
+    data are not reused for the restored data.
+    """
+    from database import Database
+
+    live_version = 0
+    if os.path.exists(db_path):
+        connection = sqlite3.connect(db_path)
+        try:
+            row = connection.execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+            live_version = row[0] if row else 0
+        except sqlite3.Error:
+            pass
+        finally:
+            connection.close()
+
+    reset_database_id(restored_path)
+    db = Database(restored_path)
+    try:
+        db.cursor.execute(
+            "UPDATE data_version SET version = MAX(version, ?) + 1 WHERE id = 1", (live_version,)
+        )
+        db.connection.commit()
+    finally:
+        db.close()
+
+def swap_database(restored_path, db_path):
+    """
+    Put a restored file in place of the live database in one step.
+    Waiting for an exclusive lock first lets other writers finish and rolls
+    back any interrupted transaction, so no stale journal is left to be
+    replayed onto the new file. Windows will not replace a file another
+    connection still has open; then the pages are copied in with the SQLite
+    backup API instead, which is atomic and seen by every open connection.
+    """
+    connection = sqlite3.connect(db_path, timeout=30)
+    try:
+        connection.execute("BEGIN EXCLUSIVE")
+        connection.rollback()
+    finally:
+        connection.close()
+
+    try:
+        os.replace(restored_path, db_path)
+    except PermissionError:
+        source = sqlite3.connect(restored_path)
+        target = sqlite3.connect(db_path, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        os.remove(restored_path)
+
+def restore_backup(backup_path, db_path=DB_PATH, safety_dir=AUTO_BACKUP_DIR, progress=None):
+    """
+    Restore db_path from a backup archive (full or incremental).
+    The database is streamed out of the archive into a temporary file next to
+    db_path, with any changesets replayed, then verified and swapped in with
+    os.replace, so it is written to the disk once and the live file is never
+    half-restored. The current database is backed up to safety_dir first
+    (None skips that). Connections opened before the restore must reconnect.
+    progress: optional callback(fraction, message)
+    Raises RestoreError when the backup is damaged or not a usable database.
+    """
+    def report(fraction, message):
+        if progress:
+            progress(fraction, message)
+
+    report(0.0, "Checking backup files...")
+    try:
+        chain = backup_chain(backup_path)
+    except FileNotFoundError as e:
+        raise RestoreError(str(e))
+    for archive_path in chain:
+        verify_archive(archive_path)
+
+    handle, restored_path = tempfile.mkstemp(
+        prefix=".restore_", suffix=".db", dir=os.path.dirname(os.path.abspath(db_path))
+    )
+    os.close(handle)
+    try:
+        report(0.2, "Extracting database...")
+        try:
+            materialise_backup(backup_path, restored_path)
+        except (zipfile.BadZipFile, KeyError, ValueError) as e:
+            raise RestoreError(f"The backup could not be read: {e}")
+        except sqlite3.Error as e:
+            raise RestoreError(f"The backup's changes could not be replayed: {e}")
+
+        report(0.5, "Verifying database...")
+        verify_database(restored_path)
+        prepare_restored_database(restored_path, db_path)
+
+        if safety_dir and os.path.exists(db_path):
+            report(0.7, "Backing up current database...")
+            create_backup(db_path, safety_dir, "auto")
+
+        report(0.9, "Replacing database...")
+        swap_database(restored_path, db_path)
+    finally:
+        if os.path.exists(restored_path):
+            os.remove(restored_path)
+
+    report(1.0, "Restore complete")
+    return db_path
+
+def retention_keep(entries, keep_counts):
+    """
+    Files to keep under grandfather-father-son retention: the newest backup of
+    each of the last keep_counts['hourly'] hours, ['daily'] days, ['weekly']
+    weeks and ['monthly'] months, and always the newest backup of all.
+    entries: catalog rows, newest first
+    """
+    keep = {entries[0]['file']} if entries else set()
+    for period, pattern in RETENTION_PERIODS.items():
+        buckets = set()
+        for entry in entries:
+            bucket = datetime.strptime(entry['created_at'], "%Y-%m-%d %H:%M:%S").strftime(pattern)
+            if bucket in buckets:
+                continue
+            if len(buckets) >= keep_counts.get(period, 0):
+                break
+            buckets.add(bucket)
+            keep.add(entry['file'])
+    return keep
+
+def prune_backups(backup_dir=BACKUP_DIR, keep_counts=None, backup_types=("scheduled",)):
+    """
+    Delete backups of backup_types that grandfather-father-son retention no
+    longer keeps. Other backups (e.g. manual ones) are never deleted, nor is
+    any archive that a kept incremental backup is restored from.
+    Returns the deleted file names.
+    """
+    if keep_counts is None:
+        keep_counts = {period: SCHEDULE_DEFAULTS[f'backup_keep_{period}'] for period in RETENTION_PERIODS}
+
+    entries = list_backups(backup_dir)
+    parents = {entry['file']: entry['parent'] for entry in entries}
+    keep = retention_keep([entry for entry in entries if entry['backup_type'] in backup_types], keep_counts)
+    keep.update(entry['file'] for entry in entries if entry['backup_type'] not in backup_types)
+
+    # Keep whole chains: every kept backup keeps its parents
+    pending = list(keep)
+    while pending:
+        parent = parents.get(pending.pop())
+        if parent and parent not in keep:
+            keep.add(parent)
+            pending.append(parent)
+
+    removed = [entry['file'] for entry in entries if entry['file'] not in keep]
+    if not removed:
+        return removed
+
+    catalog = open_catalog(backup_dir)
+    try:
+        for file in removed:
+            try:
+                os.remove(os.path.join(backup_dir, file))
+            except FileNotFoundError:
+                pass
+            catalog.execute("DELETE FROM backups WHERE file = ?", (file,))
+        catalog.commit()
+    finally:
+        catalog.close()
+    return removed
+
+def lower_thread_priority():
+    """Run the calling thread below normal priority, where the platform allows it"""
+    try:
+        if os.name == "nt":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            # THREAD_PRIORITY_BELOW_NORMAL
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), -1)
+        elif sys.platform.startswith("linux"):
+            # Linux gives every thread its own nice value
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (OSError, AttributeError):
+        pass
+
+def configured_replicas(db):
+    """Extra backup folders from the Settings page (one per line in app_settings)"""
+    return [line.strip() for line in db.get_setting('backup_replica_dirs', "").splitlines() if line.strip()]
+
+def copy_verified(source_path, target_dir, entry):
+    """
+    Copy one archive into target_dir under a temporary name, flush it to the
+    device and read it back; it only takes its real name when its SHA-256
+    matches the catalog entry, so a bad copy is caught now rather than at
+    restore time.
+    """
+    target_path = os.path.join(target_dir, entry['file'])
+    temp_path = f"{target_path}.tmp"
+    try:
+        with open(source_path, 'rb') as source, open(temp_path, 'wb') as target:
+            while True:
+                chunk = source.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+            target.flush()
+            os.fsync(target.fileno())
+
+        if file_sha256(temp_path) != entry['sha256']:
+            raise ReplicationError(f"Copy of {entry['file']} in {target_dir} does not match its checksum")
+        os.replace(temp_path, target_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def replicate_to(target_dir, archive_path):
+    """
+    Bring target_dir up to date with archive_path: copy it and every archive
+    of its chain the target does not have yet (e.g. while a drive was
+    unplugged), oldest first, and catalogue them there.
+    Returns the file names copied.
+    """
+    backup_dir = os.path.dirname(archive_path) or "."
+    os.makedirs(target_dir, exist_ok=True)
+    copied = []
+
+    for path in backup_chain(archive_path):
+        file = os.path.basename(path)
+        entry = catalog_entry(backup_dir, file)
+        if entry is None:
+            raise ReplicationError(f"{file} is not in the backup catalog")
+
+        existing = catalog_entry(target_dir, file)
+        if existing and existing['sha256'] == entry['sha256'] and os.path.exists(os.path.join(target_dir, file)):
+            continue
+
+        copy_verified(path, target_dir, entry)
+        copy_catalog_entry(target_dir, entry)
+        copied.append(file)
+
+    return copied
+
+def replicate_backup(archive_path, targets, progress=None):
+    """
+    Copy a catalogued archive to several backup folders at once, one thread
+    per folder, so a slow or missing drive does not hold up the others.
+    Returns a dict of folder -> error message, or None when the copy is verified.
+    """
+    backup_dir = os.path.abspath(os.path.dirname(archive_path) or ".")
+    targets = [
+        target for target in dict.fromkeys(targets)
+        if os.path.abspath(target) != backup_dir
+    ]
+    results = {}
+    if not targets:
+        return results
+
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="hisaabsetu-replica") as pool:
+        futures = {pool.submit(replicate_to, target, archive_path): target for target in targets}
+        for done, future in enumerate(as_completed(futures), 1):
+            target = futures[future]
+            try:
+                future.result()
+                results[target] = None
+            except Exception as e:
+                results[target] = str(e)
+                print(f"Error copying backup to {target}: {e}")
+            if progress:
+                progress(done / len(targets), f"Copied to {done} of {len(targets)} backup folders")
+
+    return results
+
+class BackupJob(threading.Thread):
+    """
+    Runs create_backup (or create_incremental_backup) on a background thread,
+    then copies the archive to any replica folders, and keeps its progress,
+    result and timing for the Settings page to poll
+    """
+
+    def __init__(self, incremental=False, low_priority=False, replicas=(), **backup_args):
+        super().__init__(name="hisaabsetu-backup", daemon=True)
+        self.incremental = incremental
+        self.low_priority = low_priority
+        self.replicas = list(replicas)
+        self.backup_args = backup_args
+        self.replica_errors = {}
+        self.progress = 0.0
+        self.message = "Starting backup..."
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def update(self, fraction, message):
+        """Progress callback passed to create_backup"""
+        self.progress = min(1.0, fraction)
+        self.message = message
+
+    def run(self):
+        if self.low_priority:
+            lower_thread_priority()
+        self.started_at = time.time()
+        try:
+            backup = create_incremental_backup if self.incremental else create_backup
+            self.result = backup(progress=self.update, **self.backup_args)
+            if self.result and self.replicas:
+                results = replicate_backup(self.result, self.replicas, self.update)
+                self.replica_errors = {target: error for target, error in results.items() if error}
+        except Exception as e:
+            self.error = str(e)
+            print(f"Error creating backup: {e}")
+        finally:
+            self.finished_at = time.time()
+
+    @property
+    def duration(self):
+        """Seconds the backup took (so far)"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+_job_lock = threading.Lock()
+_current_job = None
+
+def start_backup(**backup_args):
+    """
+    Start a background backup unless one is already running.
+    Returns the running BackupJob (the existing one if there was one).
+    """
+    global _current_job
+    with _job_lock:
+        if _current_job is None or not _current_job.is_alive():
+            _current_job = BackupJob(**backup_args)
+            _current_job.start()
+        return _current_job
+
+def current_backup():
+    """The most recent BackupJob started in this process, or None"""
+    return _current_job
+
+def changes_since_backup(db, backup_dir=BACKUP_DIR):
+    """
+    Rows changed since the newest backup in backup_dir, from the change log.
+    Without a backup of this database to compare with, at least 1.
+    """
+    latest = latest_backup(backup_dir)
+    change_seq = change_log_seq(db.connection)
+    if latest is None or latest['database_id'] != db.get_database_id():
+        return max(change_seq, 1)
+    return change_seq - latest['change_seq']
+
+class BackupScheduler(threading.Thread):
+    """
+    Takes automatic backups while the app runs: every backup_interval_minutes,
+    or sooner once backup_after_changes rows have changed, but only when
+    something changed at all. Backups are incremental where possible, run
+    at low priority as a BackupJob (so they never overlap a manual one) and
+    are pruned with grandfather-father-son retention afterwards. Settings
+    and the last run's status are kept in app_settings.
+    """
+
+    def __init__(self, db_path=DB_PATH, backup_dir=BACKUP_DIR):
+        super().__init__(name="hisaabsetu-backup-scheduler", daemon=True)
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.wake = threading.Event()
+
+    def run(self):
+        from database import Database
+
+        self.wake.wait(SCHEDULER_START_DELAY)
+        db = Database(self.db_path)
+        while True:
+            try:
+                self.run_once(db)
+            except Exception as e:
+                print(f"Error in backup scheduler: {e}")
+            self.wake.wait(SCHEDULER_POLL_SECONDS)
+            self.wake.clear()
+
+    def run_once(self, db):
+        """Take a scheduled backup if one is due. Returns the finished BackupJob, or None."""
+        # A restore may have swapped in a new database file
+        db.reconnect_if_replaced()
+        settings = {key: db.get_setting(key, default) for key, default in SCHEDULE_DEFAULTS.items()}
+        if not settings['backup_schedule_enabled']:
+            return None
+
+        changes = changes_since_backup(db, self.backup_dir)
+        if changes <= 0:
+            return None
+
+        interval = settings['backup_interval_minutes'] * 60
+        last_run = db.get_setting('backup_last_run_at', "")
+        elapsed = (datetime.now() - datetime.strptime(last_run, "%Y-%m-%d %H:%M:%S")).total_seconds() if last_run else None
+        interval_due = interval > 0 and (elapsed is None or elapsed >= interval)
+        changes_due = 0 < settings['backup_after_changes'] <= changes
+        if not (interval_due or changes_due):
+            return None
+
+        job = start_backup(
+            incremental=True, low_priority=True,
+            db_path=self.db_path, backup_dir=self.backup_dir, backup_type="scheduled",
+            codec=configured_codec(db), replicas=configured_replicas(db)
+        )
+        if job.backup_args.get('backup_type') != "scheduled":
+            # A manual backup is running; it resets the change count anyway
+            return None
+        job.join()
+
+        if job.error:
+            status = f"Failed: {job.error}"
+        elif job.result is None:
+            status = "No changes"
+        else:
+            status = "Backup created"
+            keep_counts = {period: settings[f'backup_keep_{period}'] for period in RETENTION_PERIODS}
+            removed = prune_backups(self.backup_dir, keep_counts)
+            for target in job.replicas:
+                if target not in job.replica_errors:
+                    prune_backups(target, keep_counts)
+            if removed:
+                status += f", {len(removed)} old backups removed"
+            if job.replica_errors:
+                status += f"; copy failed for {', '.join(job.replica_errors)}"
+
+        db.set_setting('backup_last_run_at', datetime.fromtimestamp(job.started_at).strftime("%Y-%m-%d %H:%M:%S"))
+        db.set_setting('backup_last_status', status)
+        db.set_setting('backup_last_duration', round(job.duration, 1))
+        db.set_setting('backup_last_file', os.path.basename(job.result) if job.result else "")
+        return job
+
+_scheduler = None
+
+def start_scheduler(db_path=DB_PATH, backup_dir=BACKUP_DIR):
+    """Start the backup scheduler for this process unless it is already running"""
+    global _scheduler
+    with _job_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = BackupScheduler(db_path, backup_dir)
+            _scheduler.start()
+        return _scheduler
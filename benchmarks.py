@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+HISAABSETU Benchmarks
+This script measures the performance of HISAABSETU against synthetic ledgers.
+
+Usage:
+    python benchmarks.py <benchmark> [options]
+    python benchmarks.py --help
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+from database import Database
+from calculations import calculate_all
+
+# Import budget for app.py's startup imports, in milliseconds (see bench_import_time)
+IMPORT_BUDGET_MS = 1500
+
+def print_header(message):
+    """Print a formatted header message"""
+    print("\n" + "=" * 60)
+    print(f" {message}")
+    print("=" * 60)
+
+def make_synthetic_ledger(db_path, n_rows, seed=42):
+    """
+    Create a HISAABSETU database at db_path filled with n_rows random transactions.
+    Returns an open Database for the new file.
+    """
+    rng = random.Random(seed)
+    db = Database(db_path)
+
+    n_apnaar = max(5, min(200, n_rows // 500))
+    n_lenaar = max(10, min(1000, n_rows // 100))
+    n_kapine = max(3, min(50, n_rows // 2000))
+
+    db.cursor.executemany(
+        "INSERT INTO apnaar_parties (name) VALUES (?)",
+        [(f"Apnaar {i:04d}",) for i in range(1, n_apnaar + 1)]
+    )
+    db.cursor.executemany(
+        "INSERT INTO lenaar_parties (name) VALUES (?)",
+        [(f"Lenaar {i:04d}",) for i in range(1, n_lenaar + 1)]
+    )
+    db.cursor.executemany(
+        "INSERT INTO kapine_lenaar_parties (name) VALUES (?)",
+        [(f"Kapine {i:04d}",) for i in range(1, n_kapine + 1)]
+    )
+
+    first_day = date(2020, 1, 1)
+
+    def rows():
+        for _ in range(n_rows):
+            total_amount = float(rng.randrange(10_000, 5_000_000, 1000))
+            interest_rate = rng.choice([0.5, 0.75, 1.0, 1.25, 1.5, 2.0])
+            dalali_rate = rng.choice([0.0, 0.05, 0.1, 0.15, 0.25])
+            start_date = first_day + timedelta(days=rng.randrange(0, 365 * 6))
+            end_date = start_date + timedelta(days=rng.randrange(15, 365))
+            calculations = calculate_all(total_amount, interest_rate, dalali_rate, start_date, end_date)
+            received = 1 if rng.random() < 0.6 else 0
+            yield (
+                rng.randrange(1, n_apnaar + 1),
+                rng.randrange(1, n_lenaar + 1),
+                rng.randrange(1, n_kapine + 1) if rng.random() < 0.4 else None,
+                total_amount,
+                "",
+                start_date.strftime("%Y-%m-%d"),
+                end_date.strftime("%Y-%m-%d"),
+                calculations['number_of_days'],
+                calculations['number_of_months'],
+                interest_rate / 100,
+                dalali_rate / 100,
+                calculations['interest_amount'],
+                calculations['dalali_amount'],
+                calculations['lenaar_return_amount'],
+                calculations['apnaar_received_amount'],
+                calculations['interest_received_by_apnar'],
+                0.0 if received else total_amount,
+                received
+            )
+
+    db.cursor.executemany('''
+    INSERT INTO transactions (
+        apnaar_party_id, lenaar_party_id, kapine_lenaar_party_id,
+        total_amount, condition, start_date, end_date, number_of_days,
+        number_of_months, interest_rate, dalali_rate, interest_amount,
+        dalali_amount, lenaar_return_amount, apnaar_received_amount,
+        interest_received_by_apnar, remaining_amount, received
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows())
+    db.connection.commit()
+
+    return db
+
+def dataframe_payload_bytes(df):
+    """Serialise a DataFrame the way st.dataframe sends it over the websocket"""
+    try:
+        from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+    except ImportError:
+        from streamlit.type_util import data_frame_to_bytes as convert_pandas_df_to_arrow_bytes
+    return len(convert_pandas_df_to_arrow_bytes(df))
+
+def grid_display_frame(transactions):
+    """Build the All Entries display frame the way the app does for one rerun"""
+    from display import prepare_display_frame, TRANSACTION_GRID_COLUMNS
+
+    df, _ = prepare_display_frame(transactions, TRANSACTION_GRID_COLUMNS)
+    return df
+
+def bench_grid_payload(args):
+    """Payload bytes and server time per rerun for the full grid vs the paged grid"""
+    print_header("All Entries grid: payload per rerun")
+    print(f"{'rows':>8} {'mode':>6} {'payload':>14} {'server ms':>10}")
+
+    for n_rows in args.sizes:
+        work_dir = tempfile.mkdtemp(prefix="hisaabsetu_bench_")
+        try:
+            db = make_synthetic_ledger(os.path.join(work_dir, "hisaabsetu.db"), n_rows)
+
+            for mode in ("full", "paged"):
+                started = time.perf_counter()
+                if mode == "full":
+                    transactions = db.get_transactions()
+                else:
+                    totals = db.get_transaction_totals()
+                    transactions = db.get_transactions(limit=args.page_size, offset=0)
+                payload = dataframe_payload_bytes(grid_display_frame(transactions))
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                print(f"{n_rows:>8} {mode:>6} {payload:>12,} B {elapsed_ms:>10.1f}")
+
+            db.close()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def legacy_format_currency(amount):
+    """The original one-value-at-a-time formatter, kept as the benchmark baseline"""
+    if amount is None:
+        return "₹0"
+    return f"₹{int(float(amount)):,}"
+
+def bench_currency_format(args):
+    """Per-value legacy formatter vs the vectorised Indian-grouping formatter"""
+    import numpy as np
+    import pandas as pd
+    from utils import format_currency, format_currency_array
+
+    rng = np.random.default_rng(42)
+    amounts = rng.uniform(-1e9, 1e9, args.count)
+    amounts[rng.random(args.count) < 0.01] = np.nan
+    series = pd.Series(amounts)
+    present = series.dropna()
+
+    print_header(f"Currency formatting: {args.count:,} values")
+
+    def timed(label, func):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        print(f"{label:<44} {elapsed:>8.3f} s {elapsed / args.count * 1e9:>8.0f} ns/value")
+
+    timed("legacy format_currency via Series.apply", lambda: present.apply(legacy_format_currency))
+    timed("format_currency (scalar) via Series.apply", lambda: present.apply(format_currency))
+    timed("format_currency_array on Series", lambda: format_currency_array(series))
+    timed("format_currency_array on ndarray", lambda: format_currency_array(amounts))
+
+def bench_report_backends(args):
+    """DuckDB vs pandas for the Reports queries on one synthetic ledger"""
+    from analytics import Analytics, duckdb
+
+    work_dir = tempfile.mkdtemp(prefix="hisaabsetu_bench_")
+    try:
+        db_path = os.path.join(work_dir, "hisaabsetu.db")
+        started = time.perf_counter()
+        make_synthetic_ledger(db_path, args.rows).close()
+        print(f"Built a {args.rows:,}-row ledger in {time.perf_counter() - started:.1f} s")
+
+        backends = ["pandas"]
+        if duckdb is not None:
+            backends.insert(0, "duckdb")
+        else:
+            print("DuckDB is not installed; only the pandas backend is measured")
+
+        reports = [
+            ("party-wise (apnaar)", lambda analytics: analytics.party_report('apnaar')),
+            ("monthly", lambda analytics: analytics.monthly_report()),
+            ("dalali per kapine x month", lambda analytics: analytics.dalali_report()),
+            ("pivot apnaar x year", lambda analytics: analytics.pivot('apnaar_party', 'year', 'total_amount'))
+        ]
+
+        print_header(f"Reports on {args.rows:,} transactions (best of {args.repeat})")
+        print(f"{'report':<28} " + " ".join(f"{backend:>10}" for backend in backends))
+
+        analytics_by_backend = {backend: Analytics(db_path, backend=backend) for backend in backends}
+        for label, report in reports:
+            timings = []
+            for backend in backends:
+                best = None
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    report(analytics_by_backend[backend])
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                timings.append(f"{best * 1000:>8.0f}ms")
+            print(f"{label:<28} " + " ".join(timings))
+
+        for analytics in analytics_by_backend.values():
+            analytics.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_exports(args):
+    """Peak Python memory of DataFrame vs cursor-streamed exports as the ledger grows"""
+    import tracemalloc
+    import pandas as pd
+
+    def measured(func):
+        tracemalloc.start()
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return f"{elapsed:>7.2f}s {peak / 1e6:>7.1f}MB"
+
+    work_dir = tempfile.mkdtemp(prefix="hisaabsetu_bench_")
+    try:
+        print_header("Transactions export, time and peak traced memory")
+        print(f"{'rows':>10}  {'DataFrame CSV':>17}  {'streamed CSV':>17}  {'streamed CSV.gz':>17}")
+        for size in args.sizes:
+            db = make_synthetic_ledger(os.path.join(work_dir, f"ledger_{size}.db"), size)
+            target = os.path.join(work_dir, "export")
+            print(f"{size:>10,}  " + "  ".join([
+                measured(lambda: pd.DataFrame(db.get_transactions()).to_csv(f"{target}.csv", index=False)),
+                measured(lambda: db.export_transactions_to_csv(f"{target}.csv")),
+                measured(lambda: db.export_transactions_to_csv(f"{target}.csv.gz"))
+            ]))
+            db.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_backup_codecs(args):
+    """Archive size, compression ratio and time of each backup codec on a synthetic ledger"""
+    from backup import BACKUP_CODECS, available_codecs, compress_snapshot, extract_database
+
+    work_dir = tempfile.mkdtemp(prefix="hisaabsetu_bench_")
+    try:
+        db_path = os.path.join(work_dir, "hisaabsetu.db")
+        make_synthetic_ledger(db_path, args.rows).close()
+        db_size = os.path.getsize(db_path)
+
+        print_header(f"Backup codecs on {args.rows:,} transactions ({db_size / 1e6:.1f} MB database)")
+        print(f"{'codec':<12} {'archive':>10} {'ratio':>7} {'compress':>10} {'MB/s':>7} {'restore':>9}")
+        for codec in available_codecs():
+            archive_path = os.path.join(work_dir, f"backup_{codec}.zip")
+            started = time.perf_counter()
+            compress_snapshot(db_path, archive_path, "hisaabsetu.db", {"codec": codec}, codec=codec)
+            compress_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            extract_database(archive_path, os.path.join(work_dir, "restored.db"))
+            restore_time = time.perf_counter() - started
+
+            archive_size = os.path.getsize(archive_path)
+            print(
+                f"{codec:<12} {archive_size / 1e6:>8.2f}MB {db_size / archive_size:>6.1f}x "
+                f"{compress_time:>9.2f}s {db_size / 1e6 / compress_time:>7.1f} {restore_time:>8.2f}s"
+            )
+
+        missing = [codec for codec in BACKUP_CODECS if codec not in available_codecs()]
+        if missing:
+            print(f"Not available on this install: {', '.join(missing)}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_pendrive_writes(args):
+    """Per-write latency with the database on the pendrive vs on a local working copy"""
+    from pendrive import WorkingCopy
+
+    def latencies(db, writes):
+        timings = []
+        for i in range(writes):
+            started = time.perf_counter()
+            db.update_transaction_received_status(i % args.rows + 1, i % 2 == 0)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings
+
+    def summary(timings):
+        return (
+            f"p50 {timings[len(timings) // 2] * 1000:>7.2f}ms  "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:>7.2f}ms  "
+            f"max {timings[-1] * 1000:>7.2f}ms"
+        )
+
+    pendrive_dir = tempfile.mkdtemp(prefix="hisaabsetu_bench_", dir=args.dir)
+    working_dir = tempfile.mkdtemp(prefix="hisaabsetu_bench_")
+    try:
+        db_path = os.path.join(pendrive_dir, "hisaabsetu.db")
+        make_synthetic_ledger(db_path, args.rows).close()
+
+        print_header(f"{args.writes:,} single-row writes, database in {os.path.abspath(pendrive_dir)}")
+
+        db = Database(db_path)
+        print(f"{'direct':<16} {summary(latencies(db, args.writes))}")
+        db.close()
+
+        working_copy = WorkingCopy(db_path, os.path.join(working_dir, "hisaabsetu.db"))
+        started = time.perf_counter()
+        working_copy.open()
+        open_time = time.perf_counter() - started
+
+        db = Database(working_copy.db_path)
+        print(f"{'working copy':<16} {summary(latencies(db, args.writes))}")
+        db.close()
+
+        started = time.perf_counter()
+        working_copy.close()
+        print(f"Copy in at start {open_time:.2f}s, write back at the end {time.perf_counter() - started:.2f}s")
+    finally:
+        shutil.rmtree(pendrive_dir, ignore_errors=True)
+        shutil.rmtree(working_dir, ignore_errors=True)
+
+def bench_launcher_startup(args):
+    """Cold start to first rendered page: `streamlit run` in a second interpreter vs in-process bootstrap"""
+    import json
+    import asyncio
+    import subprocess
+    from tornado.websocket import websocket_connect
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from hisaabsetu_launcher import wait_for_server, choose_port
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    app_path = os.path.join(base_dir, "app.py")
+
+    async def render_first_page(port, timing_file, timeout=120):
+        # What a browser tab does: open the session and ask for the first run
+        socket = await websocket_connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"])
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        await socket.write_message(message.SerializeToString(), binary=True)
+        deadline = time.time() + timeout
+        while not os.path.exists(timing_file) and time.time() < deadline:
+            await asyncio.sleep(0.02)
+        socket.close()
+
+    def commands(port):
+        return {
+            "streamlit run": [
+                sys.executable, "-m", "streamlit", "run", app_path, "--server.headless=true",
+                f"--server.port={port}", "--server.address=127.0.0.1"
+            ],
+            "in-process": [
+                sys.executable, "-c",
+                f"import sys; sys.path.insert(0, {base_dir!r}); "
+                f"from hisaabsetu_launcher import run_server; run_server({app_path!r}, {port})"
+            ]
+        }
+
+    # The old launcher started its own interpreter before spawning `streamlit run`
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter_time = (time.perf_counter() - started) / args.repeat
+
+    work_dir = tempfile.mkdtemp(prefix="hisaabsetu_bench_")
+    try:
+        os.makedirs(os.path.join(work_dir, "data"))
+        make_synthetic_ledger(os.path.join(work_dir, "data", "hisaabsetu.db"), args.rows).close()
+
+        print_header(f"Launcher cold start on {args.rows:,} transactions, best of {args.repeat}")
+        print(f"{'mode':<16} {'server ready':>13} {'first page':>11}")
+        results = {}
+        for mode in commands(0):
+            best_ready = best_render = None
+            for run in range(args.repeat):
+                port = choose_port()
+                timing_file = os.path.join(work_dir, f"timing_{run}_{port}.json")
+                env = dict(os.environ, HISAABSETU_TIMING_FILE=timing_file)
+                extra = interpreter_time if mode == "streamlit run" else 0.0
+
+                started = time.time()
+                process = subprocess.Popen(
+                    commands(port)[mode], cwd=work_dir, env=env,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+                try:
+                    if not wait_for_server(port, process):
+                        raise RuntimeError(f"{mode} server did not start")
+                    ready = time.time() - started + extra
+                    asyncio.run(render_first_page(port, timing_file))
+                    with open(timing_file, "r", encoding="utf-8") as file:
+                        rendered = json.load(file)["app_rendered"] - started + extra
+                finally:
+                    process.terminate()
+                    process.wait()
+
+                best_ready = ready if best_ready is None else min(best_ready, ready)
+                best_render = rendered if best_render is None else min(best_render, rendered)
+
+            results[mode] = best_render
+            print(f"{mode:<16} {best_ready:>12.2f}s {best_render:>10.2f}s")
+
+        print(f"`streamlit run` times include {interpreter_time:.2f}s for the launcher's own interpreter")
+        print(f"Saved by starting in-process: {results['streamlit run'] - results['in-process']:.2f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def startup_imports(script_path):
+    """Source of the import statements a script runs at module level, in order"""
+    import ast
+
+    with open(script_path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    return "\n".join(
+        ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+def parse_importtime(output):
+    """
+    Read `python -X importtime` output into a list of (module, self ms,
+    cumulative ms) for top-level imports, and the total in milliseconds
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue
+        # Nested imports are indented under the module that imported them
+        if not name[1:].startswith(" "):
+            modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules, sum(cumulative for _, _, cumulative in modules)
+
+def bench_import_time(args):
+    """Cold import time of app.py's startup imports; fails when over the budget"""
+    import subprocess
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    code = startup_imports(os.path.join(base_dir, "app.py"))
+
+    best_modules, best_total = None, None
+    for _ in range(args.repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=base_dir, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(result.stderr.strip().splitlines()[-1])
+            return 2
+        modules, total = parse_importtime(result.stderr)
+        if best_total is None or total < best_total:
+            best_modules, best_total = modules, total
+
+    print_header(f"app.py startup imports, best of {args.repeat}")
+    print(f"{'module':<40} {'cumulative':>11}")
+    for name, _, cumulative in sorted(best_modules, key=lambda module: -module[2])[:args.top]:
+        print(f"{name:<40} {cumulative:>9.1f}ms")
+    print(f"{'total':<40} {best_total:>9.1f}ms (budget {args.budget_ms:,.0f}ms)")
+
+    if best_total > args.budget_ms:
+        print(f"Over budget by {best_total - args.budget_ms:.1f}ms")
+        return 1
+    return 0
+
+BENCHMARKS = {
+    "grid-payload": (bench_grid_payload, "All Entries payload bytes per rerun, full vs paged"),
+    "currency-format": (bench_currency_format, "Legacy vs vectorised rupee formatting"),
+    "report-backends": (bench_report_backends, "DuckDB vs pandas for the Reports queries"),
+    "exports": (bench_exports, "Peak memory of DataFrame vs streamed transaction exports"),
+    "backup-codecs": (bench_backup_codecs, "Size, ratio and speed of each backup compression codec"),
+    "pendrive-writes": (bench_pendrive_writes, "Write latency on the pendrive vs a local working copy"),
+    "launcher-startup": (bench_launcher_startup, "Cold start of `streamlit run` vs the in-process launcher"),
+    "import-time": (bench_import_time, "Cold import time of app.py's startup imports against a budget"),
+}
+
+def main():
+    """Main entry point for the benchmarks"""
+    parser = argparse.ArgumentParser(description="HISAABSETU benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    grid_parser = subparsers.add_parser("grid-payload", help=BENCHMARKS["grid-payload"][1])
+    grid_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    grid_parser.add_argument("--page-size", type=int, default=50)
+
+    currency_parser = subparsers.add_parser("currency-format", help=BENCHMARKS["currency-format"][1])
+    currency_parser.add_argument("--count", type=int, default=1_000_000)
+
+    report_parser = subparsers.add_parser("report-backends", help=BENCHMARKS["report-backends"][1])
+    report_parser.add_argument("--rows", type=int, default=1_000_000)
+    report_parser.add_argument("--repeat", type=int, default=3)
+
+    export_parser = subparsers.add_parser("exports", help=BENCHMARKS["exports"][1])
+    export_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+
+    codec_parser = subparsers.add_parser("backup-codecs", help=BENCHMARKS["backup-codecs"][1])
+    codec_parser.add_argument("--rows", type=int, default=100_000)
+
+    pendrive_parser = subparsers.add_parser("pendrive-writes", help=BENCHMARKS["pendrive-writes"][1])
+    pendrive_parser.add_argument("--dir", default=None, help="Folder on the pendrive (default: system temp folder)")
+    pendrive_parser.add_argument("--rows", type=int, default=20_000)
+    pendrive_parser.add_argument("--writes", type=int, default=500)
+
+    launcher_parser = subparsers.add_parser("launcher-startup", help=BENCHMARKS["launcher-startup"][1])
+    launcher_parser.add_argument("--rows", type=int, default=10_000)
+    launcher_parser.add_argument("--repeat", type=int, default=3)
+
+    import_parser = subparsers.add_parser("import-time", help=BENCHMARKS["import-time"][1])
+    import_parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    import_parser.add_argument("--repeat", type=int, default=5)
+    import_parser.add_argument("--top", type=int, default=15)
+
+    args = parser.parse_args()
+    return BENCHMARKS[args.benchmark][0](args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,6 +30,13 @@ def copy_to_output(output_dir):
         "database.py",
         "calculations.py",
         "utils.py",
+        "display.py",
+        "analytics.py",
+        "importer.py",
+        "exporter.py",
+        "snapshot.py",
+        "backup.py",
+        "pendrive.py",
         "check_db.py",
         "generated-icon.png",
         "README.md"
@@ -89,15 +96,22 @@ def main():
             "--add-data=calculations.py;.",
             "--add-data=database.py;.",
             "--add-data=utils.py;.",
+            "--add-data=display.py;.",
+            "--add-data=analytics.py;.",
+            "--add-data=importer.py;.",
+            "--add-data=exporter.py;.",
+            "--add-data=snapshot.py;.",
+            "--add-data=backup.py;.",
+            "--add-data=pendrive.py;.",
             "--add-data=check_db.py;.",
             "--add-data=data;data",
             "--add-data=.streamlit;.streamlit",
             "--hidden-import=streamlit",
             "--hidden-import=pandas",
             "--hidden-import=openpyxl",
+            "--hidden-import=pyarrow.parquet",
+            "--hidden-import=pyarrow.dataset",
             "--hidden-import=sqlite3",
-            "--hidden-import=trafilatura",
-            "--hidden-import=twilio",
             "exe_builder/hisaabsetu_launcher.py"
         ]
         
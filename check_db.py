@@ -1,16 +1,165 @@
+import sys
 import sqlite3
 
-# Connect to the database
-conn = sqlite3.connect('data/hisaabsetu.db')
-cursor = conn.cursor()
+DB_PATH = 'data/hisaabsetu.db'
 
-# Get the table structure
-cursor.execute("PRAGMA table_info(transactions);")
-columns = cursor.fetchall()
+def show_structure():
+    """Print the structure of the transactions table"""
+    # Connect to the database
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
 
-print("Transactions Table Structure:")
-for column in columns:
-    print(f"Column {column[0]}: {column[1]} ({column[2]})")
+    # Get the table structure
+    cursor.execute("PRAGMA table_info(transactions);")
+    columns = cursor.fetchall()
 
-# Close the connection
-conn.close()
\ No newline at end of file
+    print("Transactions Table Structure:")
+    for column in columns:
+        print(f"Column {column[0]}: {column[1]} ({column[2]})")
+
+    # Close the connection
+    conn.close()
+
+def describe_mismatch(table, mismatch):
+    """Describe one summary table mismatch in words"""
+    if table == 'party_summary':
+        role, party_id, column, stored, expected = mismatch
+        where = f"{role} party {party_id}"
+    else:
+        year, month, apnaar_id, lenaar_id, kapine_id, column, stored, expected = mismatch
+        where = f"{year}-{month:02d} apnaar {apnaar_id} lenaar {lenaar_id} kapine {kapine_id}"
+    return f"{where}: {column} is {stored}, expected {expected}"
+
+def check_summaries():
+    """Compare the materialised summary tables with the transactions table"""
+    from database import Database
+
+    db = Database(DB_PATH)
+    results = db.check_summary_tables()
+    db.close()
+
+    status = 0
+    for table, mismatches in results.items():
+        if mismatches is None:
+            print(f"Could not check {table}")
+            status = 1
+        elif not mismatches:
+            print(f"{table} is consistent with transactions")
+        else:
+            print(f"{table} has {len(mismatches)} mismatches:")
+            for mismatch in mismatches:
+                print(f"  {describe_mismatch(table, mismatch)}")
+            status = 1
+
+    if status:
+        print("Run 'python check_db.py rebuild' to recompute the summary tables")
+    return status
+
+def rebuild_summaries():
+    """Recompute the materialised summary tables from the transactions table"""
+    from database import Database
+
+    db = Database(DB_PATH)
+    success = db.rebuild_summary_tables()
+    db.close()
+
+    print("Summary tables rebuilt" if success else "Failed to rebuild summary tables")
+    return 0 if success else 1
+
+def audit_transactions():
+    """Validate every stored transaction with the same rules as the transaction form"""
+    import pandas as pd
+    from database import Database
+    from utils import validate_transactions_frame
+
+    db = Database(DB_PATH)
+    df = pd.read_sql_query(
+        """SELECT id, apnaar_party_id, lenaar_party_id, total_amount, interest_rate,
+                  dalali_rate, start_date, end_date
+           FROM transactions""",
+        db.connection
+    )
+    db.close()
+
+    error_mask, messages = validate_transactions_frame(df)
+    if not error_mask.any():
+        print(f"All {len(df)} transactions pass validation")
+        return 0
+
+    print(f"{int(error_mask.sum())} of {len(df)} transactions fail validation:")
+    for transaction_id, row_messages in zip(df.loc[error_mask, 'id'], messages[error_mask]):
+        print(f"  Transaction {transaction_id}: {'; '.join(row_messages)}")
+    return 1
+
+def table_contents(db_path, tables):
+    """Every row of each table, ordered by id"""
+    connection = sqlite3.connect(db_path)
+    try:
+        return {table: connection.execute(f"SELECT * FROM {table} ORDER BY id").fetchall() for table in tables}
+    finally:
+        connection.close()
+
+def backup_roundtrip():
+    """
+    Take a full and an incremental backup of a scratch ledger in which a party
+    is deleted and re-created and two parties swap names, then check that the
+    chain rebuilds the ledger exactly
+    """
+    import os
+    import shutil
+    import tempfile
+    from database import Database
+    from backup import create_backup, create_incremental_backup, materialise_backup, restore_backup
+
+    work_dir = tempfile.mkdtemp(prefix="hisaabsetu_check_")
+    try:
+        db_path = os.path.join(work_dir, "hisaabsetu.db")
+        backup_dir = os.path.join(work_dir, "backups")
+        db = Database(db_path)
+        for name in ("Foo", "Bar", "Baz"):
+            db.add_apnaar_party(name)
+        create_backup(db_path, backup_dir)
+
+        db.cursor.execute("SELECT id FROM apnaar_parties WHERE name = 'Foo'")
+        db.delete_apnaar_party(db.cursor.fetchone()[0])
+        db.add_apnaar_party("Foo")
+        db.cursor.execute("UPDATE apnaar_parties SET name = 'Swap' WHERE name = 'Bar'")
+        db.cursor.execute("UPDATE apnaar_parties SET name = 'Bar' WHERE name = 'Baz'")
+        db.cursor.execute("UPDATE apnaar_parties SET name = 'Baz' WHERE name = 'Swap'")
+        db.connection.commit()
+        db.close()
+
+        archive_path = create_incremental_backup(db_path, backup_dir)
+        expected = table_contents(db_path, Database.CHANGE_LOG_TABLES)
+
+        materialise_backup(archive_path, os.path.join(work_dir, "materialised.db"))
+        restored_path = os.path.join(work_dir, "restored.db")
+        restore_backup(archive_path, restored_path, safety_dir=None)
+
+        status = 0
+        for label, path in (("Materialised", "materialised.db"), ("Restored", "restored.db")):
+            if table_contents(os.path.join(work_dir, path), Database.CHANGE_LOG_TABLES) == expected:
+                print(f"{label} backup chain matches the ledger")
+            else:
+                print(f"{label} backup chain does not match the ledger")
+                status = 1
+        return status
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    # Usage: python check_db.py [structure|check|rebuild|audit|backup-roundtrip]
+    commands = {
+        "structure": show_structure,
+        "check": check_summaries,
+        "rebuild": rebuild_summaries,
+        "audit": audit_transactions,
+        "backup-roundtrip": backup_roundtrip
+    }
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "structure"
+    if command not in commands:
+        print(f"Unknown command '{command}'. Use one of: {', '.join(commands)}")
+        sys.exit(2)
+
+    sys.exit(commands[command]() or 0)
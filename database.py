@@ -1,9 +1,58 @@
 import os
+import uuid
 import sqlite3
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from exporter import EXPORT_CHUNK_SIZE, write_csv, write_xlsx
+
 class Database:
+    # Columns the transaction grids may sort on, mapped to their SQL expressions
+    TRANSACTION_SORT_COLUMNS = {
+        'id': 't.id',
+        'apnaar_party_name': 'ap.name',
+        'lenaar_party_name': 'lp.name',
+        'kapine_lenaar_party_name': 'klp.name',
+        'total_amount': 't.total_amount',
+        'remaining_amount': 't.remaining_amount',
+        'start_date': 't.start_date',
+        'end_date': 't.end_date',
+        'interest_amount': 't.interest_amount',
+        'dalali_amount': 't.dalali_amount',
+        'lenaar_return_amount': 't.lenaar_return_amount',
+        'received': 't.received',
+        'created_at': 't.created_at'
+    }
+    
+    # Party roles in party_summary, mapped to their transactions column
+    PARTY_SUMMARY_ROLES = {
+        'apnaar': 'apnaar_party_id',
+        'lenaar': 'lenaar_party_id',
+        'kapine': 'kapine_lenaar_party_id'
+    }
+    
+    PARTY_TABLES = {
+        'apnaar': 'apnaar_parties',
+        'lenaar': 'lenaar_parties',
+        'kapine': 'kapine_lenaar_parties'
+    }
+    
+    # Tables whose changes bump data_version so cached reports are recomputed
+    VERSIONED_TABLES = [
+        'apnaar_parties', 'lenaar_parties', 'kapine_lenaar_parties',
+        'transactions', 'partial_payments'
+    ]
+    
+    # Tables whose changed rows are logged in change_log for incremental backups
+    CHANGE_LOG_TABLES = [
+        'apnaar_parties', 'lenaar_parties', 'kapine_lenaar_parties',
+        'transactions', 'partial_payments', 'remaining_balances'
+    ]
+    
+    # Stored in PRAGMA user_version; backups record it and restores refuse newer files
+    SCHEMA_VERSION = 1
+    
     def __init__(self, db_path="data/hisaabsetu.db"):
         # Ensure data directory exists
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
@@ -11,6 +60,7 @@ class Database:
         self.db_path = db_path
         self.connection = None
         self.cursor = None
+        self.file_id = None
         self.connect()
         self.create_tables()
         
@@ -19,8 +69,17 @@ class Database:
         try:
             self.connection = sqlite3.connect(self.db_path)
             self.cursor = self.connection.cursor()
+            self.file_id = self._file_id()
         except sqlite3.Error as e:
             print(f"Database connection error: {e}")
+    
+    def _file_id(self):
+        """Identity of the database file on disk, which changes when a restore replaces it"""
+        try:
+            stat = os.stat(self.db_path)
+            return (stat.st_dev, stat.st_ino)
+        except OSError:
+            return None
             
     def create_tables(self):
         """Create the necessary tables if they don't exist"""
@@ -93,6 +152,7 @@ class Database:
                 remaining_amount REAL,
                 received BOOLEAN DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (apnaar_party_id) REFERENCES apnaar_parties (id),
                 FOREIGN KEY (lenaar_party_id) REFERENCES lenaar_parties (id),
                 FOREIGN KEY (kapine_lenaar_party_id) REFERENCES kapine_lenaar_parties (id)
@@ -127,6 +187,25 @@ class Database:
             )
             ''')
             
+            # Indexes for the paged grids' filters and default sort order
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions (created_at)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_start_date ON transactions (start_date)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_end_date ON transactions (end_date)")
+            
+            # Covering index for the settled-dalali grouping in get_dalali_report
+            self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_dalali ON transactions (
+                received, kapine_lenaar_party_id, end_date, dalali_amount
+            )
+            ''')
+            
+            # Covering index for the dashboard KPIs so get_kpis never reads table rows
+            self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_kpis ON transactions (
+                end_date, received, total_amount, dalali_amount, interest_amount, remaining_amount
+            )
+            ''')
+            
             # Check if remaining_amount column exists in transactions table, add it if not
             self.cursor.execute("PRAGMA table_info(transactions)")
             columns = [column[1] for column in self.cursor.fetchall()]
@@ -147,9 +226,718 @@ class Database:
                 except Exception as e:
                     print(f"Error adding remaining_amount column: {e}")
             
+            # Older databases get updated_at without a backfill; until a row changes,
+            # COALESCE(updated_at, created_at) is its last change time
+            if 'updated_at' not in columns:
+                try:
+                    print("Adding updated_at column to transactions table")
+                    self.cursor.execute("ALTER TABLE transactions ADD COLUMN updated_at TIMESTAMP")
+                    self.connection.commit()
+                except Exception as e:
+                    print(f"Error adding updated_at column: {e}")
+            
+            # Incremental snapshots scan transactions changed since the last run
+            self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_updated_at
+            ON transactions (COALESCE(updated_at, created_at))
+            ''')
+            
+            # Materialised per-party totals and per-month cube kept up to date by triggers
+            self.create_party_summary()
+            self.create_monthly_rollup()
+            
+            # Write counter for caching reports until the next change
+            self.create_data_version()
+            
+            # Row-level change log read by incremental backups
+            self.create_change_log()
+            
+            # Key/value preferences set on the Settings page
+            self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            
+            # Only written when it changes: every write moves the file's change counter
+            self.cursor.execute("PRAGMA user_version")
+            if self.cursor.fetchone()[0] != self.SCHEMA_VERSION:
+                self.cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            
             self.connection.commit()
         except sqlite3.Error as e:
             print(f"Table creation error: {e}")
+    
+    def _party_summary_delta_sql(self, row, sign):
+        """
+        Build the trigger statements that add (sign '+') or remove (sign '-')
+        one transaction row (NEW or OLD) from the party_summary totals
+        """
+        statements = []
+        for role, column in self.PARTY_SUMMARY_ROLES.items():
+            statements.append(f'''
+                INSERT INTO party_summary (
+                    role, party_id, transaction_count, total_amount, interest_amount,
+                    dalali_amount, net_interest_amount, lenaar_return_amount, outstanding_amount
+                )
+                SELECT 
+                    '{role}', {row}.{column}, {sign}1, {sign}{row}.total_amount, {sign}{row}.interest_amount,
+                    {sign}{row}.dalali_amount, {sign}{row}.interest_received_by_apnar, {sign}{row}.lenaar_return_amount,
+                    {sign}(CASE WHEN {row}.received = 0 THEN COALESCE({row}.remaining_amount, {row}.total_amount) ELSE 0 END)
+                WHERE {row}.{column} IS NOT NULL
+                ON CONFLICT (role, party_id) DO UPDATE SET
+                    transaction_count = transaction_count + excluded.transaction_count,
+                    total_amount = total_amount + excluded.total_amount,
+                    interest_amount = interest_amount + excluded.interest_amount,
+                    dalali_amount = dalali_amount + excluded.dalali_amount,
+                    net_interest_amount = net_interest_amount + excluded.net_interest_amount,
+                    lenaar_return_amount = lenaar_return_amount + excluded.lenaar_return_amount,
+                    outstanding_amount = outstanding_amount + excluded.outstanding_amount;
+            ''')
+        return "".join(statements)
+    
+    def _summary_needs_rebuild(self, table):
+        """
+        True when a summary table does not exist yet or any of its triggers is missing,
+        i.e. when it can no longer be trusted to match the transactions table
+        """
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if self.cursor.fetchone() is None:
+            return True
+        
+        triggers = [f"{table}_after_{event}" for event in ("insert", "update", "delete")]
+        self.cursor.execute(
+            f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' * len(triggers))})",
+            triggers
+        )
+        return self.cursor.fetchone()[0] < len(triggers)
+    
+    def _drop_full_scan_cleanup_triggers(self, table):
+        """
+        Drop update/delete triggers of a summary table that still clean up
+        emptied rows with a full-table DELETE, so they are recreated with the
+        cleanup keyed on the affected rows. The table contents stay correct.
+        """
+        for event in ("update", "delete"):
+            name = f"{table}_after_{event}"
+            self.cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+            row = self.cursor.fetchone()
+            if row and f"DELETE FROM {table} WHERE transaction_count <= 0" in row[0]:
+                self.cursor.execute(f"DROP TRIGGER {name}")
+    
+    def _party_summary_cleanup_sql(self, row):
+        """Trigger statements dropping the party_summary rows of one transaction row left with no transactions"""
+        return "".join(
+            f"DELETE FROM party_summary WHERE role = '{role}' AND party_id = {row}.{column} AND transaction_count <= 0;"
+            for role, column in self.PARTY_SUMMARY_ROLES.items()
+        )
+    
+    def create_party_summary(self):
+        """Create the party_summary table and the triggers that maintain it"""
+        needs_rebuild = self._summary_needs_rebuild('party_summary')
+        self._drop_full_scan_cleanup_triggers('party_summary')
+        
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS party_summary (
+            role TEXT NOT NULL,
+            party_id INTEGER NOT NULL,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            interest_amount REAL NOT NULL DEFAULT 0,
+            dalali_amount REAL NOT NULL DEFAULT 0,
+            net_interest_amount REAL NOT NULL DEFAULT 0,
+            lenaar_return_amount REAL NOT NULL DEFAULT 0,
+            outstanding_amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (role, party_id)
+        )
+        ''')
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS party_summary_after_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            {self._party_summary_delta_sql("NEW", "+")}
+        END
+        ''')
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS party_summary_after_update
+        AFTER UPDATE ON transactions
+        BEGIN
+            {self._party_summary_delta_sql("OLD", "-")}
+            {self._party_summary_delta_sql("NEW", "+")}
+            {self._party_summary_cleanup_sql("OLD")}
+        END
+        ''')
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS party_summary_after_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            {self._party_summary_delta_sql("OLD", "-")}
+            {self._party_summary_cleanup_sql("OLD")}
+        END
+        ''')
+        
+        # Existing ledgers, and ledgers left mid bulk load, get their summary filled in
+        if needs_rebuild:
+            self.rebuild_party_summary()
+    
+    def _party_summary_source_sql(self):
+        """SELECT computing party_summary rows from scratch out of the transactions table"""
+        selects = []
+        for role, column in self.PARTY_SUMMARY_ROLES.items():
+            selects.append(f'''
+            SELECT 
+                '{role}' as role, {column} as party_id,
+                COUNT(*) as transaction_count,
+                SUM(total_amount) as total_amount,
+                SUM(interest_amount) as interest_amount,
+                SUM(dalali_amount) as dalali_amount,
+                SUM(interest_received_by_apnar) as net_interest_amount,
+                SUM(lenaar_return_amount) as lenaar_return_amount,
+                SUM(CASE WHEN received = 0 THEN COALESCE(remaining_amount, total_amount) ELSE 0 END) as outstanding_amount
+            FROM transactions
+            WHERE {column} IS NOT NULL
+            GROUP BY {column}
+            ''')
+        return " UNION ALL ".join(selects)
+    
+    def rebuild_party_summary(self):
+        """Recompute the whole party_summary table from the transactions table"""
+        try:
+            self.cursor.execute("DELETE FROM party_summary")
+            self.cursor.execute(f'''
+            INSERT INTO party_summary (
+                role, party_id, transaction_count, total_amount, interest_amount,
+                dalali_amount, net_interest_amount, lenaar_return_amount, outstanding_amount
+            )
+            {self._party_summary_source_sql()}
+            ''')
+            self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error rebuilding party summary: {e}")
+            return False
+    
+    def _compare_with_source(self, table, key_columns, value_columns, source_sql, tolerance):
+        """
+        Compare a materialised table with the rows its source SELECT produces.
+        Returns a list of (*key, column, stored, expected) mismatches.
+        """
+        key_size = len(key_columns)
+        
+        self.cursor.execute(f"SELECT {', '.join(key_columns + value_columns)} FROM {table}")
+        stored = {row[:key_size]: row[key_size:] for row in self.cursor.fetchall()}
+        
+        self.cursor.execute(source_sql)
+        expected = {row[:key_size]: row[key_size:] for row in self.cursor.fetchall()}
+        
+        mismatches = []
+        for key in sorted(set(stored) | set(expected)):
+            stored_values = stored.get(key, (0,) * len(value_columns))
+            expected_values = expected.get(key, (0,) * len(value_columns))
+            for column, stored_value, expected_value in zip(value_columns, stored_values, expected_values):
+                if abs((stored_value or 0) - (expected_value or 0)) > tolerance:
+                    mismatches.append(key + (column, stored_value, expected_value))
+        
+        return mismatches
+    
+    def check_party_summary(self, tolerance=0.01):
+        """
+        Compare party_summary with a fresh computation from the transactions table.
+        Returns a list of (role, party_id, column, stored, expected) mismatches.
+        """
+        try:
+            return self._compare_with_source(
+                'party_summary',
+                ['role', 'party_id'],
+                [
+                    'transaction_count', 'total_amount', 'interest_amount', 'dalali_amount',
+                    'net_interest_amount', 'lenaar_return_amount', 'outstanding_amount'
+                ],
+                self._party_summary_source_sql(),
+                tolerance
+            )
+        except sqlite3.Error as e:
+            print(f"Error checking party summary: {e}")
+            return None
+    
+    def get_party_summary(self, role):
+        """
+        Get the materialised totals for every party of a role
+        role: 'apnaar', 'lenaar' or 'kapine'
+        """
+        try:
+            party_table = self.PARTY_TABLES[role]
+            self.cursor.execute(f'''
+            SELECT 
+                p.id as party_id, p.name as party_name, s.transaction_count, s.total_amount,
+                s.interest_amount, s.dalali_amount, s.net_interest_amount,
+                s.lenaar_return_amount, s.outstanding_amount
+            FROM party_summary s
+            JOIN {party_table} p ON s.party_id = p.id
+            WHERE s.role = ?
+            ORDER BY p.name
+            ''', (role,))
+            
+            columns = [column[0] for column in self.cursor.description]
+            result = []
+            for row in self.cursor.fetchall():
+                result.append(dict(zip(columns, row)))
+            
+            return result
+        except sqlite3.Error as e:
+            print(f"Error getting party summary: {e}")
+            return []
+            
+    def _monthly_rollup_delta_sql(self, row, sign):
+        """
+        Build the trigger statement that adds (sign '+') or removes (sign '-')
+        one transaction row (NEW or OLD) from its monthly_rollup cell
+        """
+        return f'''
+            INSERT INTO monthly_rollup (
+                year, month, apnaar_party_id, lenaar_party_id, kapine_lenaar_party_id,
+                transaction_count, received_count, total_amount, interest_amount,
+                dalali_amount, net_interest_amount
+            )
+            VALUES (
+                CAST(strftime('%Y', {row}.start_date) AS INTEGER),
+                CAST(strftime('%m', {row}.start_date) AS INTEGER),
+                {row}.apnaar_party_id, {row}.lenaar_party_id, COALESCE({row}.kapine_lenaar_party_id, 0),
+                {sign}1, {sign}(CASE WHEN {row}.received = 1 THEN 1 ELSE 0 END),
+                {sign}{row}.total_amount, {sign}{row}.interest_amount,
+                {sign}{row}.dalali_amount, {sign}{row}.interest_received_by_apnar
+            )
+            ON CONFLICT (year, month, apnaar_party_id, lenaar_party_id, kapine_lenaar_party_id) DO UPDATE SET
+                transaction_count = transaction_count + excluded.transaction_count,
+                received_count = received_count + excluded.received_count,
+                total_amount = total_amount + excluded.total_amount,
+                interest_amount = interest_amount + excluded.interest_amount,
+                dalali_amount = dalali_amount + excluded.dalali_amount,
+                net_interest_amount = net_interest_amount + excluded.net_interest_amount;
+        '''
+    
+    def _monthly_rollup_cleanup_sql(self, row):
+        """Trigger statement dropping the monthly_rollup cell of one transaction row if it has no transactions left"""
+        return f'''
+            DELETE FROM monthly_rollup
+            WHERE year = CAST(strftime('%Y', {row}.start_date) AS INTEGER)
+                AND month = CAST(strftime('%m', {row}.start_date) AS INTEGER)
+                AND apnaar_party_id = {row}.apnaar_party_id
+                AND lenaar_party_id = {row}.lenaar_party_id
+                AND kapine_lenaar_party_id = COALESCE({row}.kapine_lenaar_party_id, 0)
+                AND transaction_count <= 0;
+        '''
+    
+    def create_monthly_rollup(self):
+        """
+        Create the monthly_rollup cube and the triggers that maintain it.
+        Cells are keyed by start_date month and party; kapine_lenaar_party_id
+        is 0 for transactions without a Kapine Lenaar Party.
+        """
+        needs_rebuild = self._summary_needs_rebuild('monthly_rollup')
+        self._drop_full_scan_cleanup_triggers('monthly_rollup')
+        
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_rollup (
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            apnaar_party_id INTEGER NOT NULL,
+            lenaar_party_id INTEGER NOT NULL,
+            kapine_lenaar_party_id INTEGER NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            received_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            interest_amount REAL NOT NULL DEFAULT 0,
+            dalali_amount REAL NOT NULL DEFAULT 0,
+            net_interest_amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (year, month, apnaar_party_id, lenaar_party_id, kapine_lenaar_party_id)
+        )
+        ''')
+        
+        # Party x month slices
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_monthly_rollup_apnaar ON monthly_rollup (apnaar_party_id, year, month)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_monthly_rollup_lenaar ON monthly_rollup (lenaar_party_id, year, month)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_monthly_rollup_kapine ON monthly_rollup (kapine_lenaar_party_id, year, month)")
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS monthly_rollup_after_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            {self._monthly_rollup_delta_sql("NEW", "+")}
+        END
+        ''')
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS monthly_rollup_after_update
+        AFTER UPDATE ON transactions
+        BEGIN
+            {self._monthly_rollup_delta_sql("OLD", "-")}
+            {self._monthly_rollup_delta_sql("NEW", "+")}
+            {self._monthly_rollup_cleanup_sql("OLD")}
+        END
+        ''')
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS monthly_rollup_after_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            {self._monthly_rollup_delta_sql("OLD", "-")}
+            {self._monthly_rollup_cleanup_sql("OLD")}
+        END
+        ''')
+        
+        # Existing ledgers, and ledgers left mid bulk load, get their cube filled in
+        if needs_rebuild:
+            self.rebuild_monthly_rollup()
+    
+    def _monthly_rollup_source_sql(self):
+        """SELECT computing monthly_rollup rows from scratch out of the transactions table"""
+        return '''
+        SELECT 
+            CAST(strftime('%Y', start_date) AS INTEGER) as year,
+            CAST(strftime('%m', start_date) AS INTEGER) as month,
+            apnaar_party_id, lenaar_party_id,
+            COALESCE(kapine_lenaar_party_id, 0) as kapine_lenaar_party_id,
+            COUNT(*) as transaction_count,
+            SUM(CASE WHEN received = 1 THEN 1 ELSE 0 END) as received_count,
+            SUM(total_amount) as total_amount,
+            SUM(interest_amount) as interest_amount,
+            SUM(dalali_amount) as dalali_amount,
+            SUM(interest_received_by_apnar) as net_interest_amount
+        FROM transactions
+        GROUP BY 1, 2, 3, 4, 5
+        '''
+    
+    def rebuild_monthly_rollup(self):
+        """Recompute the whole monthly_rollup cube from the transactions table"""
+        try:
+            self.cursor.execute("DELETE FROM monthly_rollup")
+            self.cursor.execute(f'''
+            INSERT INTO monthly_rollup (
+                year, month, apnaar_party_id, lenaar_party_id, kapine_lenaar_party_id,
+                transaction_count, received_count, total_amount, interest_amount,
+                dalali_amount, net_interest_amount
+            )
+            {self._monthly_rollup_source_sql()}
+            ''')
+            self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error rebuilding monthly rollup: {e}")
+            return False
+    
+    def check_monthly_rollup(self, tolerance=0.01):
+        """
+        Compare monthly_rollup with a fresh computation from the transactions table.
+        Returns a list of (year, month, apnaar_party_id, lenaar_party_id,
+        kapine_lenaar_party_id, column, stored, expected) mismatches.
+        """
+        try:
+            return self._compare_with_source(
+                'monthly_rollup',
+                ['year', 'month', 'apnaar_party_id', 'lenaar_party_id', 'kapine_lenaar_party_id'],
+                [
+                    'transaction_count', 'received_count', 'total_amount', 'interest_amount',
+                    'dalali_amount', 'net_interest_amount'
+                ],
+                self._monthly_rollup_source_sql(),
+                tolerance
+            )
+        except sqlite3.Error as e:
+            print(f"Error checking monthly rollup: {e}")
+            return None
+    
+    def get_monthly_rollup(self, apnaar_party_id=None, lenaar_party_id=None, kapine_lenaar_party_id=None, year=None):
+        """
+        Get month-by-month totals from the monthly_rollup cube, oldest month first.
+        Any combination of party ids and year narrows the slice; pass
+        kapine_lenaar_party_id=0 for transactions without a Kapine Lenaar Party.
+        """
+        try:
+            conditions = []
+            params = []
+            for column, value in (
+                ('apnaar_party_id', apnaar_party_id),
+                ('lenaar_party_id', lenaar_party_id),
+                ('kapine_lenaar_party_id', kapine_lenaar_party_id),
+                ('year', year)
+            ):
+                if value is not None:
+                    conditions.append(f"{column} = ?")
+                    params.append(value)
+            
+            where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            
+            self.cursor.execute(f'''
+            SELECT 
+                year, month,
+                printf('%04d-%02d', year, month) as month_key,
+                SUM(transaction_count) as transaction_count,
+                SUM(received_count) as received_count,
+                SUM(total_amount) as total_amount,
+                SUM(interest_amount) as interest_amount,
+                SUM(dalali_amount) as dalali_amount,
+                SUM(net_interest_amount) as net_interest_amount
+            FROM monthly_rollup
+            {where_sql}
+            GROUP BY year, month
+            ORDER BY year, month
+            ''', params)
+            
+            columns = [column[0] for column in self.cursor.description]
+            result = []
+            for row in self.cursor.fetchall():
+                result.append(dict(zip(columns, row)))
+            
+            return result
+        except sqlite3.Error as e:
+            print(f"Error getting monthly rollup: {e}")
+            return []
+    
+    def rebuild_summary_tables(self):
+        """Recompute every materialised summary table from the transactions table"""
+        return self.rebuild_party_summary() and self.rebuild_monthly_rollup()
+    
+    def check_summary_tables(self, tolerance=0.01):
+        """
+        Check every materialised summary table against the transactions table.
+        Returns a dict of table name -> list of mismatches (None if the check failed).
+        """
+        return {
+            'party_summary': self.check_party_summary(tolerance),
+            'monthly_rollup': self.check_monthly_rollup(tolerance)
+        }
+            
+    def create_data_version(self):
+        """Create the data_version counter and the triggers that bump it on every write"""
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        self.cursor.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+        
+        for table in self.VERSIONED_TABLES:
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS data_version_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_version SET version = version + 1 WHERE id = 1;
+                END
+                ''')
+    
+    def create_change_log(self):
+        """
+        Create the change_log table and the triggers that record which rows of
+        CHANGE_LOG_TABLES were inserted, updated or deleted. If any trigger was
+        missing (a new database, or a bulk load dropped them), a '*' entry is
+        logged so the next incremental backup takes a full copy instead.
+        """
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL
+        )
+        ''')
+        
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'change_log_%'")
+        existing = {row[0] for row in self.cursor.fetchall()}
+        
+        missing = False
+        for table in self.CHANGE_LOG_TABLES:
+            for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                name = f"change_log_{table}_{event.lower()}"
+                if name in existing:
+                    continue
+                missing = True
+                self.cursor.execute(f'''
+                CREATE TRIGGER {name}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id) VALUES ('{table}', {row}.id);
+                END
+                ''')
+        
+        if missing:
+            self.cursor.execute("INSERT INTO change_log (table_name, row_id) VALUES ('*', 0)")
+    
+    def get_database_id(self):
+        """
+        Random id of this database, kept in app_settings. Backup chains only
+        continue on the database they started from; a restore assigns a new id.
+        """
+        database_id = self.get_setting("database_id")
+        if database_id is None:
+            database_id = uuid.uuid4().hex
+            self.set_setting("database_id", database_id)
+        return database_id
+    
+    def begin_bulk_load(self):
+        """
+        Drop the per-row summary, data_version and change_log triggers on transactions
+        before a large import. end_bulk_load puts them back and rebuilds the summaries
+        once; if it never runs, create_tables does the same on the next start.
+        """
+        try:
+            for prefix in ("party_summary_after", "monthly_rollup_after", "data_version_transactions", "change_log_transactions"):
+                for event in ("insert", "update", "delete"):
+                    self.cursor.execute(f"DROP TRIGGER IF EXISTS {prefix}_{event}")
+            self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error starting bulk load: {e}")
+            return False
+    
+    def end_bulk_load(self):
+        """Recreate the triggers dropped by begin_bulk_load and rebuild the summary tables"""
+        try:
+            self.create_party_summary()
+            self.create_monthly_rollup()
+            self.create_data_version()
+            self.create_change_log()
+            self.cursor.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+            self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error finishing bulk load: {e}")
+            return False
+    
+    def get_data_version(self):
+        """Get a number that changes whenever parties, transactions or payments change"""
+        try:
+            self.cursor.execute("SELECT version FROM data_version WHERE id = 1")
+            row = self.cursor.fetchone()
+            return row[0] if row else 0
+        except sqlite3.Error as e:
+            print(f"Error getting data version: {e}")
+            return 0
+    
+    def get_setting(self, key, default=None):
+        """
+        Get a Settings page preference, converted to the type of default
+        (bool, int, float or str); default when it has never been set
+        """
+        try:
+            self.cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
+            row = self.cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"Error getting setting {key}: {e}")
+            return default
+        
+        if row is None or default is None:
+            return row[0] if row else default
+        try:
+            if isinstance(default, bool):
+                return row[0] == "1"
+            return type(default)(row[0])
+        except ValueError:
+            return default
+    
+    def set_setting(self, key, value):
+        """Store a Settings page preference"""
+        if isinstance(value, bool):
+            value = "1" if value else "0"
+        try:
+            self.cursor.execute('''
+            INSERT INTO app_settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            ''', (key, str(value)))
+            self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving setting {key}: {e}")
+            return False
+    
+    def get_dalali_report(self, as_of=None):
+        """
+        Dalali per Kapine Lenaar Party and maturity month (end_date).
+        Earned dalali is on received transactions. Pending dalali is on the rest,
+        split into what has accrued up to as_of (default today) on the
+        outstanding amount (after partial payments) and the full amount
+        expected at maturity. Transactions without a Kapine Lenaar Party
+        are reported under party id 0.
+        """
+        try:
+            from calculations import calculate_dalali_amount
+            
+            if as_of is None:
+                as_of = datetime.now().date()
+            elif isinstance(as_of, str):
+                as_of = datetime.strptime(as_of, '%Y-%m-%d').date()
+            
+            # Settled dalali is a plain grouped sum over idx_transactions_dalali
+            self.cursor.execute('''
+            SELECT 
+                COALESCE(kapine_lenaar_party_id, 0) as kapine_party_id,
+                strftime('%Y-%m', end_date) as month_key,
+                COUNT(*) as earned_count,
+                SUM(dalali_amount) as earned_amount
+            FROM transactions
+            WHERE received = 1
+            GROUP BY 1, 2
+            ''')
+            earned = pd.DataFrame(
+                self.cursor.fetchall(),
+                columns=['kapine_party_id', 'month_key', 'earned_count', 'earned_amount']
+            ).astype({'kapine_party_id': 'int64', 'earned_count': 'int64', 'earned_amount': 'float64'})
+            
+            # Pending dalali accrues per transaction, so fetch the columns and do the maths with numpy
+            self.cursor.execute('''
+            SELECT 
+                COALESCE(kapine_lenaar_party_id, 0) as kapine_party_id,
+                strftime('%Y-%m', end_date) as month_key,
+                CAST(julianday(?) - julianday(start_date) AS INTEGER) + 1 as elapsed_days,
+                number_of_days, COALESCE(remaining_amount, total_amount) as outstanding_amount,
+                dalali_rate, dalali_amount
+            FROM transactions
+            WHERE received = 0
+            ''', (as_of.strftime('%Y-%m-%d'),))
+            pending = pd.DataFrame(
+                self.cursor.fetchall(),
+                columns=[
+                    'kapine_party_id', 'month_key', 'elapsed_days', 'number_of_days',
+                    'outstanding_amount', 'dalali_rate', 'dalali_amount'
+                ]
+            ).astype({
+                'kapine_party_id': 'int64', 'elapsed_days': 'float64', 'number_of_days': 'float64',
+                'outstanding_amount': 'float64', 'dalali_rate': 'float64', 'dalali_amount': 'float64'
+            })
+            
+            elapsed_days = np.clip(pending['elapsed_days'].to_numpy(), 0, pending['number_of_days'].to_numpy())
+            accrued = calculate_dalali_amount(
+                pending['outstanding_amount'].to_numpy(), pending['dalali_rate'].to_numpy(), elapsed_days
+            )
+            pending['accrued_amount'] = np.minimum(np.round(accrued, 2), pending['dalali_amount'].to_numpy())
+            
+            pending = pending.groupby(['kapine_party_id', 'month_key'], as_index=False).agg(
+                pending_count=('dalali_amount', 'size'),
+                pending_amount=('dalali_amount', 'sum'),
+                accrued_amount=('accrued_amount', 'sum')
+            )
+            
+            report = earned.merge(pending, on=['kapine_party_id', 'month_key'], how='outer')
+            count_columns = ['earned_count', 'pending_count']
+            amount_columns = ['earned_amount', 'pending_amount', 'accrued_amount']
+            report[count_columns] = report[count_columns].fillna(0).astype(int)
+            report[amount_columns] = report[amount_columns].fillna(0.0)
+            report['expected_amount'] = report['earned_amount'] + report['pending_amount']
+            
+            party_names = dict(self.get_all_kapine_lenaar_parties())
+            report['kapine_party_name'] = report['kapine_party_id'].map(party_names).fillna("No Kapine Lenaar Party")
+            
+            report = report.sort_values(['month_key', 'kapine_party_name'])
+            return report.to_dict('records')
+        except sqlite3.Error as e:
+            print(f"Error getting dalali report: {e}")
+            return []
             
     def add_apnaar_party(self, name, contact="", address="", boss_name="", boss_phone="", accountant_name="", accountant_phone=""):
         """Add a new Apnaar Party to the database with extended contact information"""
@@ -262,6 +1050,50 @@ class Database:
             print(f"Error adding transaction: {e}")
             return None
     
+    def add_parties(self, role, names):
+        """
+        Add parties of a role ('apnaar', 'lenaar' or 'kapine') by name, skipping existing names.
+        Returns a dict of name -> id for every party of that role.
+        """
+        party_table = self.PARTY_TABLES[role]
+        try:
+            self.cursor.executemany(
+                f"INSERT OR IGNORE INTO {party_table} (name) VALUES (?)",
+                [(name,) for name in names]
+            )
+            self.connection.commit()
+            
+            self.cursor.execute(f"SELECT name, id FROM {party_table}")
+            return dict(self.cursor.fetchall())
+        except sqlite3.Error as e:
+            print(f"Error adding parties to {party_table}: {e}")
+            self.connection.rollback()
+            return None
+    
+    def add_transactions(self, rows):
+        """
+        Add many transactions in one database transaction.
+        rows: iterable of tuples in the column order of add_transaction, followed by
+        remaining_amount and received. Returns the number of rows added, or None on error.
+        """
+        try:
+            self.cursor.executemany('''
+            INSERT INTO transactions (
+                apnaar_party_id, lenaar_party_id, kapine_lenaar_party_id, 
+                total_amount, condition, start_date, end_date, number_of_days, 
+                number_of_months, interest_rate, dalali_rate, interest_amount, 
+                dalali_amount, lenaar_return_amount, apnaar_received_amount, 
+                interest_received_by_apnar, remaining_amount, received
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            count = self.cursor.rowcount
+            self.connection.commit()
+            return count
+        except sqlite3.Error as e:
+            print(f"Error adding transactions: {e}")
+            self.connection.rollback()
+            return None
+    
     def update_transaction(self, transaction_id, transaction_data):
         """Update an existing transaction"""
         try:
@@ -285,7 +1117,8 @@ class Database:
                 number_of_days = ?, number_of_months = ?, interest_rate = ?, 
                 dalali_rate = ?, interest_amount = ?, dalali_amount = ?,
                 lenaar_return_amount = ?, apnaar_received_amount = ?, 
-                interest_received_by_apnar = ?, remaining_amount = ?
+                interest_received_by_apnar = ?, remaining_amount = ?,
+                updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
             ''', (
                 transaction_data['apnaar_party_id'],
@@ -317,7 +1150,7 @@ class Database:
         """Update the received status of a transaction"""
         try:
             self.cursor.execute(
-                "UPDATE transactions SET received = ? WHERE id = ?",
+                "UPDATE transactions SET received = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                 (1 if received else 0, transaction_id)
             )
             self.connection.commit()
@@ -418,83 +1251,212 @@ class Database:
             print(f"Error getting transactions ending today: {e}")
             return []
             
-    def get_transactions(self, filters=None):
+    def _build_transaction_filters(self, filters):
+        """
+        Translate a filters dictionary into a WHERE clause and its parameters.
+        The clause expects the transactions query aliases (t, ap, lp, klp).
+        The *_party_id keys match one party exactly; the *_party_name keys are
+        substring searches.
+        """
+        params = []
+        where_clauses = []
+        for key, value in (filters or {}).items():
+            if key in ('apnaar_party_id', 'lenaar_party_id', 'kapine_lenaar_party_id'):
+                where_clauses.append(f"t.{key} = ?")
+                params.append(value)
+            elif key == 'apnaar_party_name':
+                where_clauses.append("ap.name LIKE ?")
+                params.append(f"%{value}%")
+            elif key == 'lenaar_party_name':
+                where_clauses.append("lp.name LIKE ?")
+                params.append(f"%{value}%")
+            elif key == 'kapine_lenaar_party_name':
+                where_clauses.append("klp.name LIKE ?")
+                params.append(f"%{value}%")
+            elif key == 'received':
+                where_clauses.append("t.received = ?")
+                params.append(1 if value else 0)
+            elif key == 'date_range':
+                start, end = value
+                where_clauses.append("(t.start_date BETWEEN ? AND ? OR t.end_date BETWEEN ? AND ?)")
+                params.extend([start, end, start, end])
+            elif key == 'start_date_between':
+                start, end = value
+                where_clauses.append("t.start_date BETWEEN ? AND ?")
+                params.extend([start, end])
+            elif key == 'end_date_between':
+                start, end = value
+                where_clauses.append("t.end_date BETWEEN ? AND ?")
+                params.extend([start, end])
+            elif key == 'end_date_month_year':
+                month_num, year_num = value
+                
+                if month_num is not None and year_num is not None:
+                    # Filter by both month and year
+                    where_clauses.append("(strftime('%m', t.end_date) = ? AND strftime('%Y', t.end_date) = ?)")
+                    params.extend([f"{month_num:02d}", str(year_num)])
+                elif month_num is not None:
+                    # Filter by month only
+                    where_clauses.append("strftime('%m', t.end_date) = ?")
+                    params.append(f"{month_num:02d}")
+                elif year_num is not None:
+                    # Filter by year only
+                    where_clauses.append("strftime('%Y', t.end_date) = ?")
+                    params.append(str(year_num))
+            elif key == 'min_amount':
+                where_clauses.append("t.total_amount >= ?")
+                params.append(value)
+            elif key == 'max_amount':
+                where_clauses.append("t.total_amount <= ?")
+                params.append(value)
+        
+        if where_clauses:
+            return " WHERE " + " AND ".join(where_clauses), params
+        return "", params
+    
+    def _transactions_query(self, filters=None, sort_by=None, descending=True):
+        """SELECT and parameters shared by get_transactions and stream_transactions"""
+        query = '''
+        SELECT 
+            t.id, ap.name as apnaar_party_name, lp.name as lenaar_party_name, 
+            klp.name as kapine_lenaar_party_name, t.total_amount, t.condition,
+            t.start_date, t.end_date, t.number_of_days, t.number_of_months,
+            t.interest_rate, t.dalali_rate, t.interest_amount, t.dalali_amount,
+            t.lenaar_return_amount, t.apnaar_received_amount, t.interest_received_by_apnar,
+            t.remaining_amount, t.received, t.created_at
+        FROM transactions t
+        JOIN apnaar_parties ap ON t.apnaar_party_id = ap.id
+        JOIN lenaar_parties lp ON t.lenaar_party_id = lp.id
+        LEFT JOIN kapine_lenaar_parties klp ON t.kapine_lenaar_party_id = klp.id
+        '''
+        
+        where_sql, params = self._build_transaction_filters(filters)
+        query += where_sql
+        
+        # Sorting is pushed down to SQL; the id tie-breaker keeps pages stable
+        sort_column = self.TRANSACTION_SORT_COLUMNS.get(sort_by, 't.created_at')
+        direction = "DESC" if descending else "ASC"
+        query += f" ORDER BY {sort_column} {direction}, t.id {direction}"
+        return query, params
+    
+    def get_transactions(self, filters=None, sort_by=None, descending=True, limit=None, offset=0):
         """
         Get all transactions with optional filtering
         filters: dictionary with column names as keys and filter values as values
+        sort_by: key of TRANSACTION_SORT_COLUMNS to order by (defaults to created_at)
+        limit/offset: return a single page of rows instead of the whole ledger
+        """
+        try:
+            query, params = self._transactions_query(filters, sort_by, descending)
+            
+            if limit is not None:
+                query += " LIMIT ? OFFSET ?"
+                params.extend([int(limit), int(offset)])
+            
+            self.cursor.execute(query, params)
+            columns = [column[0] for column in self.cursor.description]
+            result = []
+            for row in self.cursor.fetchall():
+                result.append(dict(zip(columns, row)))
+            
+            return result
+        except sqlite3.Error as e:
+            print(f"Error getting transactions: {e}")
+            return []
+    
+    def get_transaction_totals(self, filters=None):
+        """
+        Get the row count and amount totals for the transactions matching the filters.
+        Uses the same filters as get_transactions so paged grids can show the full count.
         """
         try:
             query = '''
             SELECT 
-                t.id, ap.name as apnaar_party_name, lp.name as lenaar_party_name, 
-                klp.name as kapine_lenaar_party_name, t.total_amount, t.condition,
-                t.start_date, t.end_date, t.number_of_days, t.number_of_months,
-                t.interest_rate, t.dalali_rate, t.interest_amount, t.dalali_amount,
-                t.lenaar_return_amount, t.apnaar_received_amount, t.interest_received_by_apnar,
-                t.remaining_amount, t.received, t.created_at
+                COUNT(*) as count,
+                COALESCE(SUM(t.total_amount), 0) as total_amount,
+                COALESCE(SUM(t.interest_amount), 0) as interest_amount,
+                COALESCE(SUM(t.dalali_amount), 0) as dalali_amount,
+                COALESCE(SUM(t.lenaar_return_amount), 0) as lenaar_return_amount
             FROM transactions t
             JOIN apnaar_parties ap ON t.apnaar_party_id = ap.id
             JOIN lenaar_parties lp ON t.lenaar_party_id = lp.id
             LEFT JOIN kapine_lenaar_parties klp ON t.kapine_lenaar_party_id = klp.id
             '''
             
-            params = []
-            if filters:
-                where_clauses = []
-                for key, value in filters.items():
-                    if key == 'apnaar_party_name':
-                        where_clauses.append("ap.name LIKE ?")
-                        params.append(f"%{value}%")
-                    elif key == 'lenaar_party_name':
-                        where_clauses.append("lp.name LIKE ?")
-                        params.append(f"%{value}%")
-                    elif key == 'kapine_lenaar_party_name':
-                        where_clauses.append("klp.name LIKE ?")
-                        params.append(f"%{value}%")
-                    elif key == 'received':
-                        where_clauses.append("t.received = ?")
-                        params.append(1 if value else 0)
-                    elif key == 'date_range':
-                        start, end = value
-                        where_clauses.append("(t.start_date BETWEEN ? AND ? OR t.end_date BETWEEN ? AND ?)")
-                        params.extend([start, end, start, end])
-                    elif key == 'end_date_month_year':
-                        month_num, year_num = value
-                        
-                        if month_num is not None and year_num is not None:
-                            # Filter by both month and year
-                            where_clauses.append("(strftime('%m', t.end_date) = ? AND strftime('%Y', t.end_date) = ?)")
-                            params.extend([f"{month_num:02d}", str(year_num)])
-                        elif month_num is not None:
-                            # Filter by month only
-                            where_clauses.append("strftime('%m', t.end_date) = ?")
-                            params.append(f"{month_num:02d}")
-                        elif year_num is not None:
-                            # Filter by year only
-                            where_clauses.append("strftime('%Y', t.end_date) = ?")
-                            params.append(str(year_num))
-                    elif key == 'min_amount':
-                        where_clauses.append("t.total_amount >= ?")
-                        params.append(value)
-                    elif key == 'max_amount':
-                        where_clauses.append("t.total_amount <= ?")
-                        params.append(value)
-                
-                if where_clauses:
-                    query += " WHERE " + " AND ".join(where_clauses)
-            
-            query += " ORDER BY t.created_at DESC"
+            where_sql, params = self._build_transaction_filters(filters)
+            query += where_sql
             
             self.cursor.execute(query, params)
             columns = [column[0] for column in self.cursor.description]
-            result = []
-            for row in self.cursor.fetchall():
-                result.append(dict(zip(columns, row)))
+            return dict(zip(columns, self.cursor.fetchone()))
+        except sqlite3.Error as e:
+            print(f"Error getting transaction totals: {e}")
+            return {
+                'count': 0,
+                'total_amount': 0,
+                'interest_amount': 0,
+                'dalali_amount': 0,
+                'lenaar_return_amount': 0
+            }
+    
+    def get_kpis(self, as_of=None, filters=None):
+        """
+        Get all dashboard numbers from a single aggregate query.
+        as_of: date used for the "ending today" and overdue figures (defaults to today)
+        filters: same dictionary as get_transactions
+        """
+        if as_of is None:
+            as_of = datetime.now().date()
+        as_of_str = as_of if isinstance(as_of, str) else as_of.strftime("%Y-%m-%d")
+        
+        kpis = {
+            'total_transactions': 0,
+            'total_amount': 0,
+            'total_dalali': 0,
+            'total_interest': 0,
+            'completed_transactions': 0,
+            'outstanding_amount': 0,
+            'ending_today_count': 0,
+            'ending_today_dalali': 0,
+            'overdue_count': 0
+        }
+        
+        try:
+            query = '''
+            SELECT 
+                COUNT(*) as total_transactions,
+                COALESCE(SUM(t.total_amount), 0) as total_amount,
+                COALESCE(SUM(t.dalali_amount), 0) as total_dalali,
+                COALESCE(SUM(t.interest_amount), 0) as total_interest,
+                COALESCE(SUM(CASE WHEN t.received = 1 THEN 1 ELSE 0 END), 0) as completed_transactions,
+                COALESCE(SUM(CASE WHEN t.received = 0 THEN COALESCE(t.remaining_amount, t.total_amount) ELSE 0 END), 0) as outstanding_amount,
+                COALESCE(SUM(CASE WHEN date(t.end_date) = date(?) THEN 1 ELSE 0 END), 0) as ending_today_count,
+                COALESCE(SUM(CASE WHEN date(t.end_date) = date(?) THEN t.dalali_amount ELSE 0 END), 0) as ending_today_dalali,
+                COALESCE(SUM(CASE WHEN date(t.end_date) < date(?) AND t.received = 0 THEN 1 ELSE 0 END), 0) as overdue_count
+            FROM transactions t
+            '''
+            params = [as_of_str, as_of_str, as_of_str]
             
-            return result
+            # Party joins are only needed for name filters; without them the
+            # query is answered from idx_transactions_kpis alone
+            if filters and any(key.endswith('_party_name') for key in filters):
+                query += '''
+                JOIN apnaar_parties ap ON t.apnaar_party_id = ap.id
+                JOIN lenaar_parties lp ON t.lenaar_party_id = lp.id
+                LEFT JOIN kapine_lenaar_parties klp ON t.kapine_lenaar_party_id = klp.id
+                '''
+            
+            where_sql, where_params = self._build_transaction_filters(filters)
+            query += where_sql
+            params.extend(where_params)
+            
+            self.cursor.execute(query, params)
+            columns = [column[0] for column in self.cursor.description]
+            kpis.update(zip(columns, self.cursor.fetchone()))
+            return kpis
         except sqlite3.Error as e:
-            print(f"Error getting transactions: {e}")
-            return []
+            print(f"Error getting KPIs: {e}")
+            return kpis
     
     def get_transaction_by_id(self, transaction_id):
         """Get a specific transaction by ID"""
@@ -526,28 +1488,128 @@ class Database:
             print(f"Error getting transaction by ID: {e}")
             return None
     
-    def export_transactions_to_csv(self, filename):
-        """Export all transactions to a CSV file"""
+    def stream_query(self, query, params=(), chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Run a query on its own cursor and return (columns, batches).
+        batches yields lists of up to chunk_size rows, so exports never hold
+        the whole result; the cursor is closed once it is exhausted.
+        """
+        cursor = self.connection.cursor()
         try:
-            transactions = self.get_transactions()
-            if transactions:
-                df = pd.DataFrame(transactions)
-                df.to_csv(filename, index=False)
-                return True
-            return False
+            cursor.execute(query, params)
+        except sqlite3.Error as e:
+            print(f"Error streaming query: {e}")
+            cursor.close()
+            return [], iter(())
+        
+        columns = [column[0] for column in cursor.description]
+        
+        def batches():
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+        
+        return columns, batches()
+    
+    def stream_transactions(self, filters=None, sort_by=None, descending=True, chunk_size=EXPORT_CHUNK_SIZE):
+        """Same rows and filters as get_transactions, as (columns, batches) from stream_query"""
+        query, params = self._transactions_query(filters, sort_by, descending)
+        return self.stream_query(query, params, chunk_size)
+    
+    def stream_partial_payments(self, filters=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Partial payments of the transactions matching filters, as (columns, batches)"""
+        query = '''
+        SELECT 
+            pp.id, pp.transaction_id, ap.name as apnaar_party_name,
+            lp.name as lenaar_party_name, pp.payment_date, pp.payment_amount,
+            pp.notes, pp.created_at
+        FROM partial_payments pp
+        JOIN transactions t ON pp.transaction_id = t.id
+        JOIN apnaar_parties ap ON t.apnaar_party_id = ap.id
+        JOIN lenaar_parties lp ON t.lenaar_party_id = lp.id
+        LEFT JOIN kapine_lenaar_parties klp ON t.kapine_lenaar_party_id = klp.id
+        '''
+        
+        where_sql, params = self._build_transaction_filters(filters)
+        query += where_sql + " ORDER BY pp.transaction_id, pp.payment_date, pp.id"
+        return self.stream_query(query, params, chunk_size)
+    
+    def stream_party_summary(self, chunk_size=EXPORT_CHUNK_SIZE):
+        """party_summary rows for every role with party names, as (columns, batches)"""
+        query = " UNION ALL ".join(f'''
+        SELECT 
+            s.role, p.name as party_name, s.transaction_count, s.total_amount,
+            s.interest_amount, s.dalali_amount, s.net_interest_amount,
+            s.lenaar_return_amount, s.outstanding_amount
+        FROM party_summary s
+        JOIN {party_table} p ON s.party_id = p.id
+        WHERE s.role = '{role}'
+        ''' for role, party_table in self.PARTY_TABLES.items())
+        return self.stream_query(query + " ORDER BY 1, 2", (), chunk_size)
+    
+    def stream_monthly_rollup(self, chunk_size=EXPORT_CHUNK_SIZE):
+        """monthly_rollup cube with party names, oldest month first, as (columns, batches)"""
+        query = '''
+        SELECT 
+            printf('%04d-%02d', m.year, m.month) as month_key,
+            ap.name as apnaar_party_name, lp.name as lenaar_party_name,
+            COALESCE(klp.name, '') as kapine_lenaar_party_name,
+            m.transaction_count, m.received_count, m.total_amount,
+            m.interest_amount, m.dalali_amount, m.net_interest_amount
+        FROM monthly_rollup m
+        JOIN apnaar_parties ap ON m.apnaar_party_id = ap.id
+        JOIN lenaar_parties lp ON m.lenaar_party_id = lp.id
+        LEFT JOIN kapine_lenaar_parties klp ON m.kapine_lenaar_party_id = klp.id
+        ORDER BY m.year, m.month, ap.name, lp.name
+        '''
+        return self.stream_query(query, (), chunk_size)
+    
+    def export_sheets(self, filters=None, include_summaries=True):
+        """
+        Yield the sheets for a full export as (title, columns, batches). Each
+        sheet's query runs only when the writer reaches it, so a CSV export,
+        which writes just the first sheet, never queries the others. The
+        summary sheets cover the whole ledger, so they are left out when
+        filters narrow the transactions.
+        """
+        yield ("Transactions", *self.stream_transactions(filters))
+        yield ("Payments", *self.stream_partial_payments(filters))
+        if include_summaries and not filters:
+            yield ("Party Summary", *self.stream_party_summary())
+            yield ("Monthly Summary", *self.stream_monthly_rollup())
+    
+    def export_transactions_to_csv(self, filename, filters=None, compress=None):
+        """
+        Export transactions to a CSV file, streamed from the cursor.
+        compress: gzip the file; by default when filename ends in .gz
+        """
+        try:
+            if not self.get_transaction_totals(filters)['count']:
+                return False
+            if compress is None:
+                compress = str(filename).endswith(".gz")
+            columns, batches = self.stream_transactions(filters)
+            write_csv(filename, columns, batches, compress=compress)
+            return True
         except Exception as e:
             print(f"Error exporting transactions to CSV: {e}")
             return False
     
-    def export_transactions_to_excel(self, filename):
-        """Export all transactions to an Excel file"""
+    def export_transactions_to_excel(self, filename, filters=None):
+        """
+        Export transactions, their payments and the summary tables to one
+        Excel workbook, streamed sheet by sheet from the cursor
+        """
         try:
-            transactions = self.get_transactions()
-            if transactions:
-                df = pd.DataFrame(transactions)
-                df.to_excel(filename, index=False)
-                return True
-            return False
+            if not self.get_transaction_totals(filters)['count']:
+                return False
+            write_xlsx(filename, self.export_sheets(filters))
+            return True
         except Exception as e:
             print(f"Error exporting transactions to Excel: {e}")
             return False
@@ -574,7 +1636,7 @@ class Database:
             
             # Update the transaction's remaining amount
             self.cursor.execute(
-                "UPDATE transactions SET remaining_amount = ? WHERE id = ?",
+                "UPDATE transactions SET remaining_amount = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                 (new_remaining, transaction_id)
             )
                 
@@ -587,7 +1649,7 @@ class Database:
             # If remaining amount is 0, mark transaction as received
             if new_remaining == 0:
                 self.cursor.execute(
-                    "UPDATE transactions SET received = 1 WHERE id = ?",
+                    "UPDATE transactions SET received = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                     (transaction_id,)
                 )
                 
@@ -646,7 +1708,7 @@ class Database:
             
             # Update the transaction
             self.cursor.execute(
-                "UPDATE transactions SET remaining_amount = ?, received = 0 WHERE id = ?",
+                "UPDATE transactions SET remaining_amount = ?, received = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                 (new_remaining, transaction_id)
             )
             
@@ -750,3 +1812,23 @@ class Database:
         """Close the database connection"""
         if self.connection:
             self.connection.close()
+    
+    def reconnect(self):
+        """
+        Open a fresh connection, e.g. after a restore replaced the database file,
+        and bring the new file's schema up to date
+        """
+        self.close()
+        self.connect()
+        self.create_tables()
+    
+    def reconnect_if_replaced(self):
+        """
+        Reconnect when the database file was replaced (e.g. by a restore) since
+        this connection was opened, for connections kept open a long time.
+        Returns True when it reconnected.
+        """
+        if self._file_id() == self.file_id:
+            return False
+        self.reconnect()
+        return True
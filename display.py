@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils import format_currency_array
+
+# Formats applied by st.column_config in the browser; the frames keep numeric dtypes.
+# printf formats cannot group digits, so rupees use the browser's locale grouping
+# (lakh/crore on an en-IN browser) on whole-rupee values.
+CURRENCY_FORMAT = "localized"
+RATE_FORMAT = "%.2f%%"
+DATE_FORMAT = "DD/MM/YYYY"
+
+# Columns shown by the Transactions and All Entries grids: source column -> (label, kind)
+TRANSACTION_GRID_COLUMNS = {
+    'id': ('ID', 'number'),
+    'apnaar_party_name': ('Apnaar Party', 'text'),
+    'lenaar_party_name': ('Lenaar Party', 'text'),
+    'kapine_lenaar_party_name': ('Kapine Lenaar Party', 'text'),
+    'total_amount': ('Total Amount (₹)', 'currency'),
+    'remaining_amount': ('Remaining (₹)', 'currency'),
+    'condition': ('Condition', 'text'),
+    'start_date': ('Start Date', 'date'),
+    'end_date': ('End Date', 'date'),
+    'number_of_days': ('Days', 'number'),
+    'number_of_months': ('Months', 'number'),
+    'interest_rate': ('Interest Rate (%)', 'rate'),
+    'dalali_rate': ('Dalali Rate (%)', 'rate'),
+    'interest_amount': ('Interest Amount (₹)', 'currency'),
+    'dalali_amount': ('Dalali Amount (₹)', 'currency'),
+    'lenaar_return_amount': ('Lenaar Return (₹)', 'currency'),
+    'apnaar_received_amount': ('Apnaar Received (₹)', 'currency'),
+    'interest_received_by_apnar': ('Interest Received (₹)', 'currency'),
+    'received': ('Received', 'received')
+}
+
+def whole_rupees(values):
+    """Truncate amounts to whole rupees, like format_currency, keeping them numeric"""
+    return np.trunc(values)
+
+def _select_columns(data, columns):
+    """Build a DataFrame holding only the requested source columns"""
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    return df.reindex(columns=list(columns.keys()))
+
+def _convert_column(series, kind):
+    """Convert a source column to the native dtype used for its kind"""
+    if kind in ("currency", "number"):
+        return pd.to_numeric(series, errors="coerce")
+    if kind == "rate":
+        # Rates are stored as decimals; show them as percentages
+        return pd.to_numeric(series, errors="coerce") * 100
+    if kind == "date":
+        return pd.to_datetime(series, errors="coerce")
+    if kind == "received":
+        return series.fillna(0).astype(bool)
+    return series
+
+def prepare_display_frame(data, columns):
+    """
+    Prepare rows for st.dataframe without turning numbers into strings.
+    columns: dict of source column -> (label, kind), kind being one of
+    'text', 'number', 'currency', 'rate', 'date' or 'received'.
+    Returns the display DataFrame and the matching column_config.
+    """
+    df = _select_columns(data, columns)
+    column_config = {}
+
+    for source, (label, kind) in columns.items():
+        df[source] = _convert_column(df[source], kind)
+
+        if kind == "currency":
+            df[source] = whole_rupees(df[source])
+            column_config[label] = st.column_config.NumberColumn(label, format=CURRENCY_FORMAT)
+        elif kind == "rate":
+            column_config[label] = st.column_config.NumberColumn(label, format=RATE_FORMAT)
+        elif kind == "date":
+            column_config[label] = st.column_config.DateColumn(label, format=DATE_FORMAT)
+        elif kind == "received":
+            column_config[label] = st.column_config.CheckboxColumn(label)
+
+    df.columns = [label for label, _ in columns.values()]
+    return df, column_config
+
+def show_dataframe(data, columns):
+    """Display rows in st.dataframe with rupees, rates and dates formatted by column_config"""
+    df, column_config = prepare_display_frame(data, columns)
+    st.dataframe(df, column_config=column_config, use_container_width=True)
+    return df
+
+def prepare_export_frame(data, columns):
+    """
+    Prepare rows for a file export where formatted strings are wanted.
+    Rupees use the vectorised Indian lakh/crore formatter and dates become DD/MM/YYYY.
+    """
+    df = _select_columns(data, columns)
+
+    for source, (label, kind) in columns.items():
+        series = _convert_column(df[source], kind)
+
+        if kind == "currency":
+            df[source] = format_currency_array(series)
+        elif kind == "rate":
+            df[source] = series.round(2)
+        elif kind == "date":
+            df[source] = series.dt.strftime("%d/%m/%Y").fillna("")
+        elif kind == "received":
+            df[source] = np.where(series, "Received", "Pending")
+        else:
+            df[source] = series
+
+    df.columns = [label for label, _ in columns.values()]
+    return df
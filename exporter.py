@@ -0,0 +1,116 @@
+import io
+import os
+import csv
+import gzip
+import pandas as pd
+
+# Rows fetched from the cursor and written per batch
+EXPORT_CHUNK_SIZE = 5000
+
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Export formats: name -> (file extension, download mime type)
+EXPORT_FORMATS = {
+    'csv': ('csv', "text/csv"),
+    'csv.gz': ('csv.gz', "application/gzip"),
+    'xlsx': ('xlsx', EXCEL_MIME)
+}
+
+def normalise_format(file_format):
+    """Map the app's format labels ('CSV', 'Excel', 'CSV (gzip)') to EXPORT_FORMATS keys"""
+    name = file_format.lower().strip()
+    if name in ("excel", "xls"):
+        return "xlsx"
+    if name in ("gzip", "csv (gzip)", "gz"):
+        return "csv.gz"
+    return name
+
+def frame_batches(df, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of row tuples from a DataFrame, with NaN/NaT as None"""
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size].astype(object)
+        chunk = chunk.where(pd.notna(chunk), None)
+        yield list(chunk.itertuples(index=False, name=None))
+
+def frame_sheets(data, title="Sheet1"):
+    """Wrap a DataFrame (or list of row dicts) as the single sheet of an export"""
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    return [(title, list(df.columns), frame_batches(df))]
+
+def write_csv(target, columns, batches, compress=False):
+    """
+    Write a header and row batches as CSV.
+    target: file path or binary file object (left open)
+    compress: gzip the output
+    Returns the number of data rows written.
+    """
+    handle = open(target, "wb") if isinstance(target, (str, os.PathLike)) else target
+    stream = gzip.GzipFile(fileobj=handle, mode="wb") if compress else handle
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    row_count = 0
+
+    try:
+        writer = csv.writer(text)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(batch)
+            row_count += len(batch)
+    finally:
+        # Detach so closing the wrapper does not close a caller's buffer
+        text.flush()
+        text.detach()
+        if compress:
+            stream.close()
+        if handle is not target:
+            handle.close()
+
+    return row_count
+
+def write_xlsx(target, sheets):
+    """
+    Write several sheets in one pass with a write-only workbook, which spools
+    each sheet to a temporary file instead of building it in memory.
+    target: file path or binary file object
+    sheets: iterable of (title, columns, batches)
+    Returns a dict of sheet title -> data rows written.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    row_counts = {}
+
+    for title, columns, batches in sheets:
+        sheet = workbook.create_sheet(title=title)
+        sheet.append(list(columns))
+        row_count = 0
+        for batch in batches:
+            for row in batch:
+                sheet.append(row)
+            row_count += len(batch)
+        row_counts[title] = row_count
+
+    workbook.save(target)
+    return row_counts
+
+def write_export(target, file_format, sheets):
+    """
+    Write sheets in an EXPORT_FORMATS format. CSV formats hold one table,
+    so only the first sheet is written.
+    Returns the number of data rows in the first sheet.
+    """
+    file_format = normalise_format(file_format)
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+    if file_format == "xlsx":
+        row_counts = write_xlsx(target, sheets)
+        return next(iter(row_counts.values()), 0)
+
+    _, columns, batches = next(iter(sheets))
+    return write_csv(target, columns, batches, compress=file_format == "csv.gz")
+
+def export_bytes(file_format, sheets):
+    """Render an export in memory and return its bytes, e.g. for st.download_button"""
+    buffer = io.BytesIO()
+    write_export(buffer, file_format, sheets)
+    return buffer.getvalue()
@@ -10,6 +10,13 @@ a = Analysis(
         ('calculations.py', '.'),
         ('database.py', '.'),
         ('utils.py', '.'),
+        ('display.py', '.'),
+        ('analytics.py', '.'),
+        ('importer.py', '.'),
+        ('exporter.py', '.'),
+        ('snapshot.py', '.'),
+        ('backup.py', '.'),
+        ('pendrive.py', '.'),
         ('check_db.py', '.'),
         ('data', 'data'),
         ('.streamlit', '.streamlit'),
@@ -19,9 +26,9 @@ a = Analysis(
         'streamlit',
         'pandas',
         'openpyxl',
+        'pyarrow.parquet',
+        'pyarrow.dataset',
         'sqlite3',
-        'trafilatura',
-        'twilio',
     ],
     hookspath=[],
     hooksconfig={},
@@ -2,17 +2,47 @@
 """
 HISAABSETU Application Launcher
 This script serves as the entry point for the HISAABSETU application executable.
-It launches the Streamlit application with the appropriate settings.
+It runs the Streamlit server for the application inside this process, so no
+separate streamlit executable or second Python interpreter is needed.
 """
 
+import time
+
+# Taken before anything else is imported, for the startup timing breakdown
+LAUNCHER_STARTED = time.time()
+
 import os
 import sys
-import time
+import json
+import atexit
+import socket
+import tempfile
 import webbrowser
-import subprocess
 import threading
+import urllib.error
+import urllib.request
 from pathlib import Path
 
+# Streamlit answers "ok" here once the server accepts connections
+HEALTH_ENDPOINT = "_stcore/health"
+
+# Readiness polling: first delay, maximum delay and overall limit, in seconds
+READY_FIRST_DELAY = 0.05
+READY_MAX_DELAY = 0.5
+READY_TIMEOUT = 120
+
+# How long to wait for the first page render before printing the timing without it
+FIRST_RENDER_TIMEOUT = 120
+
+# Preferred port; another free one is used when something else holds it
+DEFAULT_PORT = 8501
+
+# Records the pid and port of the running instance so a second launch reuses it
+LOCK_FILE = os.path.join("data", "hisaabsetu.lock")
+
+# app.py writes its import and first render times to this file (see report_startup_timing)
+TIMING_FILE_ENV = "HISAABSETU_TIMING_FILE"
+
 def ensure_data_dir():
     """Ensure data directory exists"""
     # When running as executable, look for data directory next to the executable
@@ -49,17 +79,237 @@ font = "sans serif"
     
     return base_dir
 
+def running_from_removable_drive(base_dir):
+    """True on Windows when base_dir is on a removable drive such as a pendrive"""
+    if os.name != "nt":
+        return False
+    try:
+        import ctypes
+        drive = os.path.splitdrive(os.path.abspath(base_dir))[0] + "\\"
+        # DRIVE_REMOVABLE
+        return ctypes.windll.kernel32.GetDriveTypeW(drive) == 2
+    except Exception:
+        return False
+
+def process_alive(pid):
+    """True when a process with this pid is running"""
+    if os.name == "nt":
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))) and exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+def port_available(port):
+    """True when nothing is listening on port on the loopback address"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+def choose_port(preferred=DEFAULT_PORT):
+    """preferred if it is free, otherwise a free port picked by the OS"""
+    if port_available(preferred):
+        return preferred
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def read_lock(lock_path):
+    """The running instance recorded in the lock file, or None"""
+    try:
+        with open(lock_path, "r", encoding="utf-8") as file:
+            lock = json.load(file)
+        return lock if isinstance(lock.get("pid"), int) and isinstance(lock.get("port"), int) else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def acquire_lock(lock_path, port):
+    """
+    Create the lock file for this process, recording its pid and port.
+    Returns (True, None) when this launch owns it, or (False, lock) when
+    another running instance does. A lock left by a process that is no
+    longer running is replaced.
+    """
+    for _ in range(2):
+        try:
+            descriptor = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            lock = read_lock(lock_path)
+            if lock is None:
+                # Another launch may be between creating the file and writing it
+                time.sleep(0.2)
+                lock = read_lock(lock_path)
+            if lock is not None and lock["pid"] != os.getpid() and process_alive(lock["pid"]):
+                return False, lock
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            json.dump({
+                "pid": os.getpid(),
+                "port": port,
+                "host": socket.gethostname(),
+                "started_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }, file)
+        atexit.register(release_lock, lock_path)
+        return True, None
+
+    return False, read_lock(lock_path)
+
+def release_lock(lock_path):
+    """Remove the lock file if this process still owns it"""
+    lock = read_lock(lock_path)
+    if lock is not None and lock["pid"] == os.getpid():
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+def process_start_time():
+    """Wall-clock time this process was created, or None where it cannot be found"""
+    try:
+        if os.name == "nt":
+            import ctypes
+            from ctypes import wintypes
+            creation, exited, kernel, user = (wintypes.FILETIME() for _ in range(4))
+            kernel32 = ctypes.windll.kernel32
+            if not kernel32.GetProcessTimes(
+                kernel32.GetCurrentProcess(), ctypes.byref(creation), ctypes.byref(exited),
+                ctypes.byref(kernel), ctypes.byref(user)
+            ):
+                return None
+            # FILETIME counts 100 ns intervals since 1601-01-01
+            ticks = (creation.dwHighDateTime << 32) | creation.dwLowDateTime
+            return ticks / 1e7 - 11644473600
+        if os.path.exists("/proc/self/stat"):
+            with open("/proc/self/stat") as file:
+                start_ticks = int(file.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/uptime") as file:
+                uptime = float(file.read().split()[0])
+            return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    return None
+
+def wait_for_server(port, process=None, timeout=READY_TIMEOUT):
+    """
+    Poll Streamlit's health endpoint with exponential backoff until the server
+    is ready. Returns True when it is, False when process exits or the
+    timeout passes first.
+    """
+    url = f"http://127.0.0.1:{port}/{HEALTH_ENDPOINT}"
+    delay = READY_FIRST_DELAY
+    deadline = time.time() + timeout
+
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, READY_MAX_DELAY)
+
+    return False
+
 def open_browser(port):
-    """Open browser after a short delay to ensure server is running"""
-    time.sleep(2)  # Wait for Streamlit to start
+    """Open the app in the default browser"""
     url = f"http://127.0.0.1:{port}"
     webbrowser.open(url)
 
+def run_server(app_path, port):
+    """
+    Run the Streamlit server for app_path in this process through Streamlit's
+    bootstrap API, the same way `streamlit run` does. Blocks until the server
+    stops, so it must run on the main thread (it installs signal handlers).
+    """
+    from streamlit.web import bootstrap
+
+    flag_options = {
+        "server.headless": True,
+        "server.port": port,
+        "server.address": "127.0.0.1",
+        # Inside a PyInstaller bundle Streamlit would otherwise think it is
+        # running from a source checkout and not serve its own frontend
+        "global.developmentMode": False
+    }
+    bootstrap.load_config_options(flag_options=flag_options)
+    bootstrap.run(app_path, False, [], flag_options)
+
+def open_when_ready(port, marks, timing_file):
+    """Open the browser once the server answers, then print the startup timing"""
+    if not wait_for_server(port):
+        print(f"Streamlit did not become ready within {READY_TIMEOUT} seconds")
+        return
+    marks["server_ready"] = time.time()
+    open_browser(port)
+    report_startup_timing(marks, timing_file)
+
+def report_startup_timing(marks, timing_file, timeout=FIRST_RENDER_TIMEOUT):
+    """
+    Print how long each startup phase took. marks holds launcher times;
+    app.py adds its own to timing_file on its first run.
+    """
+    deadline = time.time() + timeout
+    while not os.path.exists(timing_file) and time.time() < deadline:
+        time.sleep(0.1)
+    try:
+        with open(timing_file, "r", encoding="utf-8") as file:
+            marks.update(json.load(file))
+    except (OSError, ValueError):
+        pass
+
+    phases = [
+        ("Interpreter start", "process_started", "launcher_started"),
+        ("Launcher setup", "launcher_started", "server_starting"),
+        ("Server ready", "server_starting", "server_ready"),
+        ("Browser connects", "server_ready", "app_started"),
+        ("App imports", "app_started", "app_imported"),
+        ("First page render", "app_imported", "app_rendered")
+    ]
+    print("Startup timing:")
+    for label, start, end in phases:
+        if marks.get(start) is not None and marks.get(end) is not None:
+            print(f"  {label:<18} {marks[end] - marks[start]:>6.2f} s")
+    first = marks.get("process_started") or marks.get("launcher_started")
+    last = marks.get("app_rendered") or marks.get("server_ready")
+    if first is not None and last is not None:
+        print(f"  {'Total':<18} {last - first:>6.2f} s")
+
 def main():
     """Main entry point for the application"""
     # Ensure data directory exists
     base_dir = ensure_data_dir()
     
+    # On a pendrive, run on a local working copy of the database (see pendrive.py)
+    if "--no-pendrive" not in sys.argv and ("--pendrive" in sys.argv or running_from_removable_drive(base_dir)):
+        os.environ["HISAABSETU_PENDRIVE"] = "1"
+    
     # Determine the app.py location
     if hasattr(sys, '_MEIPASS'):
         # We're running as a PyInstaller bundle
@@ -68,25 +318,36 @@ def main():
         # We're running as a script
         app_path = os.path.join(base_dir, "app.py")
     
-    # Set up the port
-    port = 8501
+    # Only one instance runs per data folder; a second launch opens a browser
+    # tab on the running one instead of starting another server
+    lock_path = os.path.join(base_dir, LOCK_FILE)
+    port = choose_port(DEFAULT_PORT)
+    owner, lock = acquire_lock(lock_path, port)
+    if not owner:
+        if lock is not None and wait_for_server(lock["port"]):
+            print(f"HISAABSETU is already running on port {lock['port']}, opening it")
+            open_browser(lock["port"])
+            return
+        print("HISAABSETU is already running but is not responding; close it and try again")
+        input("Press Enter to exit...")
+        return
+    
+    # app.py reports its import and first render times through this file
+    marks = {"process_started": process_start_time(), "launcher_started": LAUNCHER_STARTED}
+    timing_file = os.path.join(tempfile.gettempdir(), f"hisaabsetu_timing_{os.getpid()}.json")
+    if os.path.exists(timing_file):
+        os.remove(timing_file)
+    os.environ[TIMING_FILE_ENV] = timing_file
     
-    # Start browser opening thread
-    browser_thread = threading.Thread(target=open_browser, args=(port,))
+    # Open the browser as soon as the server answers, not after a fixed delay
+    browser_thread = threading.Thread(target=open_when_ready, args=(port, marks, timing_file))
     browser_thread.daemon = True
     browser_thread.start()
     
-    # Start Streamlit with the app.py
-    cmd = [
-        "streamlit", "run",
-        app_path,
-        "--server.headless=true",
-        f"--server.port={port}",
-        "--server.address=127.0.0.1"
-    ]
-    
+    # Run Streamlit with the app.py in this process
     try:
-        subprocess.run(cmd)
+        marks["server_starting"] = time.time()
+        run_server(app_path, port)
     except KeyboardInterrupt:
         print("Application terminated by user")
     except Exception as e:
@@ -0,0 +1,382 @@
+import io
+import re
+import csv
+import numpy as np
+import pandas as pd
+
+from utils import validate_transactions_frame
+from calculations import (
+    calculate_interest_amount, calculate_dalali_amount,
+    calculate_lenaar_return_amount, calculate_apnaar_received_amount,
+    calculate_interest_received_by_apnar
+)
+
+# Columns an import file may have; headers are matched after normalise_header
+IMPORT_COLUMNS = [
+    'apnaar_party', 'lenaar_party', 'kapine_lenaar_party', 'total_amount',
+    'interest_rate', 'dalali_rate', 'start_date', 'end_date', 'condition', 'received'
+]
+
+REQUIRED_COLUMNS = ['apnaar_party', 'lenaar_party', 'total_amount', 'interest_rate', 'start_date', 'end_date']
+
+# Other header spellings, including the labels used by the app's own exports
+HEADER_ALIASES = {
+    'apnaar': 'apnaar_party',
+    'apnaar_party_name': 'apnaar_party',
+    'lenaar': 'lenaar_party',
+    'lenaar_party_name': 'lenaar_party',
+    'kapine': 'kapine_lenaar_party',
+    'kapine_party': 'kapine_lenaar_party',
+    'kapine_lenaar_party_name': 'kapine_lenaar_party',
+    'amount': 'total_amount',
+    'principal': 'total_amount',
+    'status': 'received'
+}
+
+# Same formats as utils.parse_date
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"]
+
+# Set by read_csv_chunks on rows it could not split into the header's columns
+PARSE_ERROR_COLUMN = '_parse_error'
+
+# Files at least this long are loaded with the summary triggers suspended and the
+# summary tables rebuilt once at the end, which beats per-row trigger upkeep
+BULK_LOAD_MIN_ROWS = 10000
+
+RECEIVED_VALUES = {'1', 'yes', 'y', 'true', 'received'}
+
+# Party columns -> (role in Database.PARTY_TABLES, transactions column)
+PARTY_COLUMNS = {
+    'apnaar_party': ('apnaar', 'apnaar_party_id'),
+    'lenaar_party': ('lenaar', 'lenaar_party_id'),
+    'kapine_lenaar_party': ('kapine', 'kapine_lenaar_party_id')
+}
+
+def normalise_header(header):
+    """Turn a column header such as 'Total Amount (₹)' into 'total_amount'"""
+    name = re.sub(r"\(.*?\)", "", str(header or "")).strip().lower()
+    name = re.sub(r"[^a-z0-9]+", "_", name).strip("_")
+    return HEADER_ALIASES.get(name, name)
+
+def read_csv_chunks(file, chunk_size):
+    """
+    Yield DataFrames of up to chunk_size CSV rows, all values as strings, indexed by file line.
+    A row with more values than the header (such as an unquoted 1,00,000) is kept
+    with a message in PARSE_ERROR_COLUMN, so it is reported instead of imported.
+    Raises ValueError when the file cannot be read as CSV.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    try:
+        header = next(reader, None)
+        if header is None:
+            return
+        width = len(header)
+        columns = header + [PARSE_ERROR_COLUMN]
+
+        chunk = []
+        row_numbers = []
+        for row in reader:
+            if not row:
+                continue
+            message = ""
+            if len(row) > width:
+                message = (
+                    f"Row has {len(row)} values but the header has {width}; "
+                    "put values that contain commas (such as 1,00,000) in quotes"
+                )
+            chunk.append((row + [""] * width)[:width] + [message])
+            row_numbers.append(reader.line_num)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, index=row_numbers)
+                chunk = []
+                row_numbers = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, index=row_numbers)
+    except csv.Error as e:
+        raise ValueError(f"Line {reader.line_num}: {e}")
+    finally:
+        # Leave the uploaded file open for the caller
+        text.detach()
+
+def read_xlsx_chunks(file, chunk_size):
+    """
+    Yield DataFrames of up to chunk_size rows from the first sheet, indexed by sheet row.
+    The sheet is read in openpyxl read-only mode so only one chunk is held in memory.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        chunk = []
+        row_numbers = []
+        for row_number, row in enumerate(rows, start=2):
+            if not any(value is not None and value != "" for value in row):
+                continue
+            chunk.append(row)
+            row_numbers.append(row_number)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header, index=row_numbers)
+                chunk = []
+                row_numbers = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, index=row_numbers)
+    finally:
+        workbook.close()
+
+def count_rows(file, file_format):
+    """Rough number of data rows, used only for the progress bar"""
+    if file_format == "xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True)
+        try:
+            max_row = workbook.active.max_row or 1
+        finally:
+            workbook.close()
+        file.seek(0)
+        return max(0, max_row - 1)
+
+    lines = 0
+    for block in iter(lambda: file.read(1 << 20), b""):
+        lines += block.count(b"\n")
+    file.seek(0)
+    return max(0, lines - 1)
+
+def parse_dates(series):
+    """Parse a column of dates in any of DATE_FORMATS; unparseable values become NaT"""
+    parsed = pd.to_datetime(series, format=DATE_FORMATS[0], errors="coerce")
+
+    missing = parsed.isna()
+    if missing.any():
+        # Only the rows ISO parsing missed are tried against the other formats,
+        # without any time part a spreadsheet may have added
+        text = series[missing].astype(str).str.strip().str.split(" ").str[0]
+        for fmt in DATE_FORMATS:
+            retry = parsed[missing].isna()
+            if not retry.any():
+                break
+            parsed.loc[retry[retry].index] = pd.to_datetime(text[retry], format=fmt, errors="coerce")
+    return parsed
+
+def date_strings(series):
+    """Format parsed dates as the YYYY-MM-DD strings stored in the database"""
+    return series.to_numpy(dtype="datetime64[D]").astype(str).tolist()
+
+def prepare_chunk(chunk):
+    """Normalise headers, trim text and convert numbers and dates for one chunk"""
+    chunk = chunk.rename(columns=normalise_header)
+    chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+    chunk = chunk.reindex(columns=IMPORT_COLUMNS)
+
+    frame = pd.DataFrame(index=chunk.index)
+    for column in ['apnaar_party', 'lenaar_party', 'kapine_lenaar_party', 'condition']:
+        frame[column] = chunk[column].fillna("").astype(str).str.strip()
+
+    for column in ['total_amount', 'interest_rate', 'dalali_rate']:
+        text = chunk[column].fillna("").astype(str).str.replace(r"[,₹\s]", "", regex=True)
+        frame[f"{column}_text"] = text
+        frame[column] = pd.to_numeric(text, errors="coerce")
+
+    for column in ['start_date', 'end_date']:
+        frame[f"{column}_text"] = chunk[column].fillna("").astype(str).str.strip()
+        frame[column] = parse_dates(chunk[column])
+
+    frame['received'] = chunk['received'].fillna("").astype(str).str.strip().str.lower().isin(RECEIVED_VALUES)
+    return frame
+
+def validate_chunk(frame):
+    """
+    Check a prepared chunk with utils.validate_transactions_frame, plus the date
+    format check only a file import needs.
+    Returns a Series of error messages per row ('' for valid rows).
+    """
+    def as_entered(column):
+        # Parsed values, with the text kept where it could not be parsed so it is reported as such.
+        # Empty cells are NaN, i.e. missing; an empty dalali rate therefore means no dalali.
+        unparsed = frame[column].isna() & (frame[f"{column}_text"] != "")
+        if not unparsed.any():
+            return frame[column]
+        return frame[column].astype(object).where(~unparsed, frame[f"{column}_text"])
+
+    values = pd.DataFrame({
+        'apnaar_party_id': frame['apnaar_party'],
+        'lenaar_party_id': frame['lenaar_party'],
+        'total_amount': as_entered('total_amount'),
+        'interest_rate': as_entered('interest_rate'),
+        'dalali_rate': as_entered('dalali_rate'),
+        'start_date': as_entered('start_date'),
+        'end_date': as_entered('end_date')
+    }, index=frame.index)
+
+    _, messages = validate_transactions_frame(values)
+    errors = messages.map("; ".join)
+
+    for column, label in (('start_date', "Start Date"), ('end_date', "End Date")):
+        unparsed = (frame[f"{column}_text"] != "") & frame[column].isna()
+        message = f"{label} must be a valid date"
+        errors[unparsed] = np.where(errors[unparsed] == "", message, errors[unparsed] + "; " + message)
+
+    return errors
+
+class PartyLookup:
+    """Name -> id cache for the three party tables, creating missing parties on request"""
+
+    def __init__(self, db, create_missing=True):
+        self.db = db
+        self.create_missing = create_missing
+        self.ids = {
+            'apnaar': {name: party_id for party_id, name in db.get_all_apnaar_parties()},
+            'lenaar': {name: party_id for party_id, name in db.get_all_lenaar_parties()},
+            'kapine': {name: party_id for party_id, name in db.get_all_kapine_lenaar_parties()}
+        }
+        self.created = {'apnaar': 0, 'lenaar': 0, 'kapine': 0}
+
+    def resolve(self, role, names):
+        """Map a Series of party names to ids; unknown names map to NaN unless they can be created"""
+        known = self.ids[role]
+        missing = set(names[(names != "") & ~names.isin(known.keys())].unique())
+
+        if missing and self.create_missing:
+            ids = self.db.add_parties(role, sorted(missing))
+            if ids is not None:
+                self.created[role] += len(missing & set(ids))
+                known.update(ids)
+
+        return names.map(known)
+
+def compute_derived(frame, year_type=365):
+    """Vectorised calculate_all for a validated chunk; rates in the frame are percentages"""
+    interest_rate = frame['interest_rate'].to_numpy() / 100
+    dalali_rate = frame['dalali_rate'].fillna(0).to_numpy() / 100
+    total_amount = frame['total_amount'].to_numpy()
+
+    number_of_days = np.maximum(1, (frame['end_date'] - frame['start_date']).dt.days.to_numpy() + 1)
+    interest_amount = calculate_interest_amount(total_amount, interest_rate, number_of_days, year_type)
+    dalali_amount = calculate_dalali_amount(total_amount, dalali_rate, number_of_days, year_type)
+
+    return pd.DataFrame({
+        'number_of_days': number_of_days,
+        'number_of_months': number_of_days / 30.0,
+        'interest_rate': interest_rate,
+        'dalali_rate': dalali_rate,
+        'interest_amount': np.round(interest_amount, 2),
+        'dalali_amount': np.round(dalali_amount, 2),
+        'lenaar_return_amount': np.round(calculate_lenaar_return_amount(total_amount, interest_amount), 2),
+        'apnaar_received_amount': np.round(calculate_apnaar_received_amount(total_amount, interest_amount, dalali_amount), 2),
+        'interest_received_by_apnar': np.round(calculate_interest_received_by_apnar(interest_amount, dalali_amount), 2)
+    }, index=frame.index)
+
+def import_transactions(db, file, file_format, chunk_size=5000, create_parties=True, progress=None):
+    """
+    Stream transactions from a CSV or XLSX file into the database chunk by chunk.
+    Rates in the file are percentages, as on the transaction form.
+    progress: optional callback(rows_done, rows_total) called after every chunk.
+    Returns a dict with total_rows, imported, failed, parties_created and errors,
+    errors being a DataFrame of the rejected rows with their file row number and messages.
+    """
+    file_format = file_format.lower()
+    if file_format not in ("csv", "xlsx"):
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+    rows_total = count_rows(file, file_format)
+    chunks = read_csv_chunks(file, chunk_size) if file_format == "csv" else read_xlsx_chunks(file, chunk_size)
+
+    parties = PartyLookup(db, create_parties)
+    result = {'total_rows': 0, 'imported': 0, 'failed': 0, 'parties_created': 0}
+    error_frames = []
+
+    bulk_load = rows_total >= BULK_LOAD_MIN_ROWS and db.begin_bulk_load()
+    try:
+        for chunk in chunks:
+            added, rejected = import_chunk(db, chunk, parties)
+            result['imported'] += added
+            if len(rejected):
+                error_frames.append(rejected)
+                result['failed'] += len(rejected)
+
+            result['total_rows'] += len(chunk)
+            if progress:
+                progress(result['total_rows'], max(rows_total, result['total_rows']))
+    finally:
+        if bulk_load:
+            db.end_bulk_load()
+
+    result['parties_created'] = sum(parties.created.values())
+    result['errors'] = pd.concat(error_frames, ignore_index=True) if error_frames else pd.DataFrame(columns=['row', 'errors'])
+    return result
+
+def import_chunk(db, chunk, parties):
+    """
+    Validate, resolve parties for and insert one chunk of file rows in a single database transaction.
+    Returns the number of rows added and a DataFrame of rejected rows with their errors.
+    """
+    parse_errors = chunk.pop(PARSE_ERROR_COLUMN) if PARSE_ERROR_COLUMN in chunk.columns else None
+
+    missing_columns = [
+        column for column in REQUIRED_COLUMNS
+        if column not in {normalise_header(header) for header in chunk.columns}
+    ]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    frame = prepare_chunk(chunk)
+    errors = validate_chunk(frame)
+    if parse_errors is not None:
+        errors = errors.where(parse_errors == "", parse_errors)
+
+    valid = errors == ""
+    for column, (role, id_column) in PARTY_COLUMNS.items():
+        names = frame.loc[valid, column]
+        frame.loc[valid, id_column] = parties.resolve(role, names)
+
+        unresolved = valid & (frame[column] != "") & frame[id_column].isna()
+        errors[unresolved] = f"{column.replace('_', ' ').title()} not found"
+        valid &= ~unresolved
+
+    added = 0
+    good = frame[valid]
+    if len(good):
+        derived = compute_derived(good)
+        rows = zip(
+            good['apnaar_party_id'].astype(int).tolist(),
+            good['lenaar_party_id'].astype(int).tolist(),
+            [None if pd.isna(party_id) else int(party_id) for party_id in good['kapine_lenaar_party_id']],
+            good['total_amount'].tolist(),
+            good['condition'].tolist(),
+            date_strings(good['start_date']),
+            date_strings(good['end_date']),
+            derived['number_of_days'].tolist(),
+            derived['number_of_months'].tolist(),
+            derived['interest_rate'].tolist(),
+            derived['dalali_rate'].tolist(),
+            derived['interest_amount'].tolist(),
+            derived['dalali_amount'].tolist(),
+            derived['lenaar_return_amount'].tolist(),
+            derived['apnaar_received_amount'].tolist(),
+            derived['interest_received_by_apnar'].tolist(),
+            good['total_amount'].tolist(),
+            good['received'].astype(int).tolist()
+        )
+        saved = db.add_transactions(rows)
+        if saved is None:
+            errors[valid] = "Could not save this row to the database"
+            valid[:] = False
+        else:
+            added = saved
+
+    rejected = chunk[~valid].copy()
+    rejected.insert(0, 'errors', errors[~valid])
+    rejected.insert(0, 'row', rejected.index)
+    return added, rejected
+
+def error_report_csv(errors):
+    """CSV bytes of rejected rows for a download button"""
+    buffer = io.StringIO()
+    errors.to_csv(buffer, index=False)
+    return buffer.getvalue().encode("utf-8-sig")
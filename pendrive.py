@@ -0,0 +1,288 @@
+"""
+HISAABSETU Pendrive Mode
+Runs the app on a working copy of the database on the computer's own disk and
+writes it back to the pendrive in batches, instead of sending every commit
+to slow flash as a random write.
+
+The working copy is written back when the app has been idle for a few seconds,
+at least every PENDRIVE_SYNC_SECONDS while it is busy, and when the app shuts
+down. A journal next to the database on the pendrive records where the working
+copy lives and what was last written back, so a crash or a pulled-out pendrive
+can be recovered from on the next start.
+
+Turned on by setting HISAABSETU_PENDRIVE=1 (the launcher does this when it
+runs from a removable drive).
+"""
+
+import os
+import json
+import time
+import atexit
+import socket
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+DB_PATH = "data/hisaabsetu.db"
+
+PENDRIVE_ENV = "HISAABSETU_PENDRIVE"
+WORKING_DIR_ENV = "HISAABSETU_WORKING_DIR"
+
+# Write back after this many seconds without a change, and at least this
+# often while changes keep coming
+PENDRIVE_IDLE_SECONDS = 5
+PENDRIVE_SYNC_SECONDS = 60
+PENDRIVE_POLL_SECONDS = 1
+
+JOURNAL_SUFFIX = ".pendrive.json"
+
+def pendrive_mode_enabled():
+    """True when the app should run on a local working copy"""
+    return os.environ.get(PENDRIVE_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+def change_counter(db_path):
+    """
+    SQLite's file change counter (header bytes 24-27), which every committed
+    write transaction increments; None when the file is missing
+    """
+    try:
+        with open(db_path, 'rb') as file:
+            file.seek(24)
+            return int.from_bytes(file.read(4), "big")
+    except OSError:
+        return None
+
+def fsync_path(path):
+    """Flush a file (or, where supported, a directory entry) to the device"""
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+def copy_database(source_path, target_path):
+    """
+    Consistent copy of a SQLite database with the online backup API, written
+    under a temporary name, flushed and renamed over target_path, so the
+    target is always either the old or the new file
+    """
+    temp_path = f"{target_path}.sync"
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(temp_path)
+    try:
+        # A fresh file needs no rollback journal, which saves a file on the pendrive
+        target.execute("PRAGMA journal_mode = OFF")
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    try:
+        fsync_path(temp_path)
+        os.replace(temp_path, target_path)
+        fsync_path(os.path.dirname(os.path.abspath(target_path)))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def working_path_for(db_path):
+    """Working copy location for a pendrive database, unique per database path"""
+    base_dir = os.environ.get(WORKING_DIR_ENV) or os.path.join(tempfile.gettempdir(), "hisaabsetu_working")
+    key = hashlib.sha1(os.path.abspath(db_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(base_dir, key, os.path.basename(db_path))
+
+class WorkingCopy:
+    """
+    A local working copy of the pendrive database plus the thread that writes
+    it back. Use db_path for everything the app opens; call sync() to write
+    back now and close() on shutdown.
+    """
+
+    def __init__(self, pendrive_path=DB_PATH, working_path=None):
+        self.pendrive_path = pendrive_path
+        self.db_path = working_path or working_path_for(pendrive_path)
+        self.journal_path = f"{pendrive_path}{JOURNAL_SUFFIX}"
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+        self.synced_counter = None
+        self.last_change_at = None
+        self.last_sync_at = None
+        self.last_sync_duration = 0.0
+        self.last_sync_reason = None
+        self.sync_count = 0
+        self.error = None
+        self.recovered = None
+
+    def load_journal(self):
+        """The journal left by the last session, or None"""
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def write_journal(self, state):
+        """Record the session state next to the pendrive database, crash-safely"""
+        journal = {
+            "state": state,
+            "host": socket.gethostname(),
+            "working_copy": os.path.abspath(self.db_path),
+            "synced_counter": self.synced_counter,
+            "pendrive_counter": change_counter(self.pendrive_path),
+            "last_sync_at": self.last_sync_at.strftime("%Y-%m-%d %H:%M:%S") if self.last_sync_at else None
+        }
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(journal, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.journal_path)
+
+    def recover(self, journal):
+        """
+        Handle a session that did not shut down cleanly. If its working copy is
+        on this computer, has changes that never reached the pendrive, and
+        the pendrive file has not been changed elsewhere since, those changes
+        are written back first. Returns a message for the sidebar, or None.
+        """
+        if journal is None or journal.get("state") != "open":
+            return None
+
+        working_copy = journal.get("working_copy")
+        if (
+            journal.get("host") == socket.gethostname()
+            and working_copy and os.path.exists(working_copy)
+            and change_counter(working_copy) != journal.get("synced_counter")
+            and change_counter(self.pendrive_path) == journal.get("pendrive_counter")
+        ):
+            copy_database(working_copy, self.pendrive_path)
+            return "Recovered changes that were not saved to the pendrive last time"
+
+        if journal.get("last_sync_at"):
+            return (
+                f"The last session on {journal.get('host')} did not close properly; "
+                f"the pendrive has its data as saved at {journal['last_sync_at']}"
+            )
+        return None
+
+    def open(self):
+        """Recover from an unclean last session, copy the database in and start syncing"""
+        self.recovered = self.recover(self.load_journal())
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.pendrive_path)), exist_ok=True)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        if os.path.exists(self.pendrive_path):
+            copy_database(self.pendrive_path, self.db_path)
+        elif os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+        self.synced_counter = change_counter(self.db_path)
+        self.last_sync_at = datetime.now()
+        self.write_journal("open")
+
+        self.thread = threading.Thread(target=self.run, name="hisaabsetu-pendrive-sync", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+        return self
+
+    @property
+    def pending(self):
+        """True when the working copy has changes the pendrive does not have yet"""
+        return change_counter(self.db_path) != self.synced_counter
+
+    def sync(self, reason="manual"):
+        """
+        Write the working copy back to the pendrive if it changed.
+        reason: 'manual', 'idle', 'interval' or 'shutdown', kept for the status
+        Returns True when it wrote.
+        """
+        with self.lock:
+            counter = change_counter(self.db_path)
+            if counter is None or counter == self.synced_counter:
+                return False
+
+            started = time.perf_counter()
+            try:
+                copy_database(self.db_path, self.pendrive_path)
+            except (OSError, sqlite3.Error) as e:
+                self.error = f"Could not save to the pendrive: {e}"
+                print(self.error)
+                return False
+
+            # Writes during the copy move the counter on, so they are synced next time
+            self.synced_counter = counter
+            self.last_sync_at = datetime.now()
+            self.last_sync_duration = time.perf_counter() - started
+            self.last_sync_reason = reason
+            self.sync_count += 1
+            self.error = None
+            self.write_journal("open")
+            return True
+
+    def run(self):
+        """Sync loop: write back on idle, and at least every PENDRIVE_SYNC_SECONDS"""
+        last_seen = self.synced_counter
+        while not self.stopping.wait(PENDRIVE_POLL_SECONDS):
+            counter = change_counter(self.db_path)
+            now = time.monotonic()
+            if counter != last_seen:
+                last_seen = counter
+                self.last_change_at = now
+            if counter == self.synced_counter or self.last_change_at is None:
+                continue
+
+            idle = now - self.last_change_at >= PENDRIVE_IDLE_SECONDS
+            overdue = (datetime.now() - self.last_sync_at).total_seconds() >= PENDRIVE_SYNC_SECONDS
+            if idle or overdue:
+                self.sync("idle" if idle else "interval")
+
+    def close(self):
+        """Stop the sync thread, write back the last changes and close the journal"""
+        if self.stopping.is_set():
+            return
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout=PENDRIVE_POLL_SECONDS * 2)
+        self.sync("shutdown")
+        if self.error is None:
+            self.write_journal("closed")
+
+    def status(self):
+        """Short sync status for the sidebar"""
+        if self.error:
+            return self.error
+        if self.pending:
+            return "Changes waiting to be saved to the pendrive"
+        seconds = int((datetime.now() - self.last_sync_at).total_seconds())
+        if seconds < 120:
+            return f"Saved to pendrive {seconds} s ago"
+        return f"Saved to pendrive at {self.last_sync_at.strftime('%H:%M:%S')}"
+
+_working_copy = None
+_working_copy_lock = threading.Lock()
+
+def runtime_db_path(db_path=DB_PATH):
+    """
+    Path the app should open: db_path itself, or in pendrive mode the local
+    working copy of it (started on first use)
+    """
+    global _working_copy
+    if not pendrive_mode_enabled():
+        return db_path
+    with _working_copy_lock:
+        if _working_copy is None:
+            _working_copy = WorkingCopy(db_path).open()
+        return _working_copy.db_path
+
+def current_working_copy():
+    """The WorkingCopy of this process, or None outside pendrive mode"""
+    return _working_copy
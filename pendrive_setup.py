@@ -86,6 +86,9 @@ set "PYTHONPATH=%APP_PATH%"
 set "STREAMLIT_HOME=%APP_PATH%\\.streamlit"
 set "PATH=%PYTHON_PATH%;%PATH%"
 
+rem Run on a local working copy of the database and save it back to the pendrive in batches
+set "HISAABSETU_PENDRIVE=1"
+
 rem Navigate to the app directory
 cd /d "%APP_PATH%"
 
@@ -184,6 +187,13 @@ def copy_application_files(base_dir):
         "calculations.py",
         "database.py",
         "utils.py",
+        "display.py",
+        "analytics.py",
+        "importer.py",
+        "exporter.py",
+        "snapshot.py",
+        "backup.py",
+        "pendrive.py",
         "setup.py",
         "PENDRIVE_INSTALLATION.md",
         "README.md" # if exists
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+HISAABSETU Snapshots
+Columnar Parquet or Arrow IPC extracts of the ledger for analysis in other tools.
+
+Each run writes one new part file per dataset under the snapshot directory.
+Incremental runs only write rows changed since the previous run, tracked in
+manifest.json; a full run replaces a dataset's parts with a fresh copy.
+
+Usage:
+    python snapshot.py [--full] [--format parquet|arrow] [--dir data/snapshots]
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+SNAPSHOT_DIR = "data/snapshots"
+MANIFEST_NAME = "manifest.json"
+
+# Rows per Parquet row group / Arrow record batch
+SNAPSHOT_BATCH_SIZE = 65536
+
+SNAPSHOT_FORMATS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow'
+}
+
+# Datasets: name -> query, key column, change column (with their SQL) and typed columns.
+# Transactions are re-written whenever updated_at moves, so readers keep the
+# newest row per key (see load_snapshot). Payments and balance calculations are
+# append-only and are tracked by id. Deleted rows only leave a snapshot on a full run.
+SNAPSHOT_DATASETS = {
+    'transactions': {
+        'query': '''
+        SELECT
+            t.id, t.apnaar_party_id, ap.name as apnaar_party_name,
+            t.lenaar_party_id, lp.name as lenaar_party_name,
+            t.kapine_lenaar_party_id, klp.name as kapine_lenaar_party_name,
+            t.total_amount, t.condition, t.start_date, t.end_date,
+            t.number_of_days, t.number_of_months, t.interest_rate, t.dalali_rate,
+            t.interest_amount, t.dalali_amount, t.lenaar_return_amount,
+            t.apnaar_received_amount, t.interest_received_by_apnar,
+            COALESCE(t.remaining_amount, t.total_amount) as remaining_amount,
+            t.received, t.created_at,
+            COALESCE(t.updated_at, t.created_at) as updated_at
+        FROM transactions t
+        JOIN apnaar_parties ap ON t.apnaar_party_id = ap.id
+        JOIN lenaar_parties lp ON t.lenaar_party_id = lp.id
+        LEFT JOIN kapine_lenaar_parties klp ON t.kapine_lenaar_party_id = klp.id
+        ''',
+        'key': 'id',
+        'key_sql': 't.id',
+        'change_column': 'updated_at',
+        'change_sql': 'COALESCE(t.updated_at, t.created_at)',
+        'columns': {
+            'id': 'int64',
+            'apnaar_party_id': 'int64',
+            'apnaar_party_name': 'string',
+            'lenaar_party_id': 'int64',
+            'lenaar_party_name': 'string',
+            'kapine_lenaar_party_id': 'int64',
+            'kapine_lenaar_party_name': 'string',
+            'total_amount': 'float64',
+            'condition': 'string',
+            'start_date': 'date',
+            'end_date': 'date',
+            'number_of_days': 'int64',
+            'number_of_months': 'float64',
+            'interest_rate': 'float64',
+            'dalali_rate': 'float64',
+            'interest_amount': 'float64',
+            'dalali_amount': 'float64',
+            'lenaar_return_amount': 'float64',
+            'apnaar_received_amount': 'float64',
+            'interest_received_by_apnar': 'float64',
+            'remaining_amount': 'float64',
+            'received': 'bool',
+            'created_at': 'timestamp',
+            'updated_at': 'timestamp'
+        }
+    },
+    'partial_payments': {
+        'query': '''
+        SELECT id, transaction_id, payment_date, payment_amount, notes, created_at
+        FROM partial_payments pp
+        ''',
+        'key': 'id',
+        'key_sql': 'pp.id',
+        'change_column': 'id',
+        'change_sql': 'pp.id',
+        'columns': {
+            'id': 'int64',
+            'transaction_id': 'int64',
+            'payment_date': 'date',
+            'payment_amount': 'float64',
+            'notes': 'string',
+            'created_at': 'timestamp'
+        }
+    },
+    'remaining_balances': {
+        'query': '''
+        SELECT
+            id, transaction_id, calculation_date, remaining_amount, interest_amount,
+            dalali_amount, days_since_last_payment, created_at
+        FROM remaining_balances rb
+        ''',
+        'key': 'id',
+        'key_sql': 'rb.id',
+        'change_column': 'id',
+        'change_sql': 'rb.id',
+        'columns': {
+            'id': 'int64',
+            'transaction_id': 'int64',
+            'calculation_date': 'date',
+            'remaining_amount': 'float64',
+            'interest_amount': 'float64',
+            'dalali_amount': 'float64',
+            'days_since_last_payment': 'int64',
+            'created_at': 'timestamp'
+        }
+    }
+}
+
+def arrow_schema(dataset):
+    """pyarrow schema for a SNAPSHOT_DATASETS entry"""
+    import pyarrow as pa
+
+    types = {
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'bool': pa.bool_(),
+        'date': pa.date32(),
+        'timestamp': pa.timestamp('s')
+    }
+    return pa.schema([
+        (name, types[kind]) for name, kind in SNAPSHOT_DATASETS[dataset]['columns'].items()
+    ])
+
+def rows_to_batch(rows, schema):
+    """
+    Convert SQLite rows to a typed RecordBatch. SQLite keeps dates and
+    timestamps as ISO text and booleans as 0/1, so those are cast by pyarrow.
+    """
+    import pyarrow as pa
+
+    arrays = []
+    for values, field in zip(zip(*rows), schema):
+        if pa.types.is_date(field.type) or pa.types.is_timestamp(field.type):
+            arrays.append(pa.array(values, pa.string()).cast(field.type))
+        elif pa.types.is_boolean(field.type):
+            arrays.append(pa.array(values, pa.int64()).cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def load_manifest(directory=SNAPSHOT_DIR):
+    """Read the snapshot manifest, or an empty one"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'datasets': {}}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def save_manifest(manifest, directory=SNAPSHOT_DIR):
+    """Write the manifest through a temporary file so a crash never leaves half of it"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+def write_part(path, file_format, schema, batches):
+    """
+    Write row batches to one Parquet (zstd, with row-group statistics) or Arrow
+    IPC file. Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression="zstd", write_statistics=True)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    row_count = 0
+    try:
+        for rows in batches:
+            writer.write_batch(rows_to_batch(rows, schema))
+            row_count += len(rows)
+    finally:
+        writer.close()
+
+    return row_count
+
+def export_snapshot(db, directory=SNAPSHOT_DIR, file_format="parquet", incremental=True, datasets=None):
+    """
+    Write one part file per dataset and record it in the manifest.
+    incremental: only rows changed since the dataset's last watermark; otherwise a
+    full copy that replaces the dataset's existing parts.
+    Returns a dict of dataset -> rows written (0 when nothing changed).
+    """
+    if file_format not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unsupported snapshot format: {file_format}")
+
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results = {}
+
+    for dataset in datasets or SNAPSHOT_DATASETS:
+        spec = SNAPSHOT_DATASETS[dataset]
+        state = manifest['datasets'].get(dataset, {})
+        # A dataset keeps one format; switching starts it again from scratch
+        append = incremental and state.get('format', file_format) == file_format
+
+        # The watermark is the largest change value already written. Timestamps
+        # only have whole seconds, so rows from that second are written again;
+        # ids are exact.
+        watermark = state.get('watermark') if append else None
+        query = spec['query']
+        params = []
+        if watermark is not None:
+            operator = ">=" if spec['change_column'] == 'updated_at' else ">"
+            query += f" WHERE {spec['change_sql']} {operator} ?"
+            params.append(watermark)
+        order_columns = dict.fromkeys([spec['change_sql'], spec['key_sql']])
+        query += f" ORDER BY {', '.join(order_columns)}"
+
+        columns, batches = db.stream_query(query, params, SNAPSHOT_BATCH_SIZE)
+        if not columns:
+            raise RuntimeError(f"Could not read {dataset} for the snapshot")
+
+        # Remember the newest change value while the batches stream past
+        change_index = columns.index(spec['change_column'])
+        newest = [watermark]
+
+        def tracked(batches=batches, change_index=change_index, newest=newest):
+            for rows in batches:
+                newest[0] = rows[-1][change_index]
+                yield rows
+
+        dataset_dir = os.path.join(directory, dataset)
+        os.makedirs(dataset_dir, exist_ok=True)
+        part_name = f"part_{timestamp}.{SNAPSHOT_FORMATS[file_format]}"
+        part_path = os.path.join(dataset_dir, part_name)
+
+        row_count = write_part(f"{part_path}.tmp", file_format, arrow_schema(dataset), tracked())
+        if row_count == 0 and append and state.get('parts'):
+            os.remove(f"{part_path}.tmp")
+            results[dataset] = 0
+            continue
+
+        os.replace(f"{part_path}.tmp", part_path)
+        parts = state.get('parts', []) if append else []
+        if not append:
+            for old_part in state.get('parts', []):
+                old_path = os.path.join(dataset_dir, old_part['file'])
+                if os.path.exists(old_path) and old_part['file'] != part_name:
+                    os.remove(old_path)
+
+        parts.append({
+            'file': part_name,
+            'rows': row_count,
+            'written_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'since': watermark
+        })
+        manifest['datasets'][dataset] = {
+            'format': file_format,
+            'key': spec['key'],
+            'watermark': newest[0],
+            'parts': parts
+        }
+        save_manifest(manifest, directory)
+        results[dataset] = row_count
+
+    return results
+
+def load_snapshot(dataset, directory=SNAPSHOT_DIR):
+    """
+    Read every part of a dataset into a DataFrame, keeping only the newest
+    version of rows that were written more than once
+    """
+    import pyarrow.dataset as ds
+
+    state = load_manifest(directory)['datasets'].get(dataset)
+    if not state or not state['parts']:
+        return arrow_schema(dataset).empty_table().to_pandas()
+
+    paths = [os.path.join(directory, dataset, part['file']) for part in state['parts']]
+    file_format = "ipc" if state['format'] == "arrow" else "parquet"
+    table = ds.dataset(paths, format=file_format, schema=arrow_schema(dataset)).to_table()
+
+    df = table.to_pandas()
+    # Parts are in write order, so the last copy of a key is the newest
+    return df.drop_duplicates(subset=state['key'], keep="last").reset_index(drop=True)
+
+def main():
+    """Command-line entry point, e.g. for a nightly scheduled task"""
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="HISAABSETU Parquet/Arrow snapshots")
+    parser.add_argument("--full", action="store_true", help="Write a full copy instead of changes only")
+    parser.add_argument("--format", choices=list(SNAPSHOT_FORMATS), default="parquet")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--db", default="data/hisaabsetu.db")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    try:
+        results = export_snapshot(db, args.dir, args.format, incremental=not args.full)
+    finally:
+        db.close()
+
+    for dataset, row_count in results.items():
+        print(f"{dataset}: {row_count:,} rows written")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,109 @@
 import os
+import math
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import streamlit as st
-import shutil
-import zipfile
-import json
+
+from backup import (
+    create_backup, restore_backup, replicate_backup, list_backups, RestoreError,
+    BACKUP_DIR, AUTO_BACKUP_DIR
+)
+from exporter import EXPORT_FORMATS, normalise_format, frame_sheets, export_bytes
 
 def format_currency(amount):
-    """Format a number as Indian Rupees currency without decimal places"""
+    """Format a number as Indian Rupees currency (lakh/crore grouping) without decimal places"""
     if amount is None:
         return "₹0"
     
-    # Convert to string with no decimal places
-    amount_str = f"₹{int(float(amount)):,}"
+    value = float(amount)
+    if value != value or value in (math.inf, -math.inf):
+        return "₹0"
+    
+    # Truncate to whole rupees
+    whole = int(value)
+    sign = "₹"
+    if whole < 0:
+        sign = "-₹"
+        whole = -whole
+    
+    if whole < 1000:
+        return f"{sign}{whole}"
+    
+    # Last three digits, then groups of two: 12,34,567
+    head, tail = divmod(whole, 1000)
+    grouped = f"{tail:03d}"
+    while head >= 100:
+        head, pair = divmod(head, 100)
+        grouped = f"{pair:02d},{grouped}"
+    
+    amount_str = f"{sign}{head},{grouped}"
     
     return amount_str
 
+def format_currency_array(values, na_rep=""):
+    """
+    Format many amounts as Indian Rupees with lakh/crore grouping (e.g. ₹12,34,567)
+    without a Python call per value. Accepts a pandas Series, NumPy array or list
+    and returns the same shape of strings; a single number takes a scalar fast path.
+    Negative amounts get a leading minus sign; missing and infinite values become na_rep.
+    """
+    if np.ndim(values) == 0:
+        if values is None or pd.isna(values) or values in (math.inf, -math.inf):
+            return na_rep
+        return format_currency(values)
+    
+    index = values.index if isinstance(values, pd.Series) else None
+    amounts = np.asarray(pd.to_numeric(np.ravel(values), errors="coerce"), dtype=np.float64)
+    missing = ~np.isfinite(amounts)
+    
+    # Truncate to whole rupees the same way int(float(amount)) does
+    whole = np.trunc(np.where(missing, 0, amounts)).astype(np.int64)
+    negative = whole < 0
+    magnitude = np.abs(whole)
+    
+    # Count the digits of every value
+    digits = np.ones(magnitude.size, dtype=np.int64)
+    power = 10
+    largest = magnitude.max(initial=0)
+    while power <= largest:
+        digits += magnitude >= power
+        power *= 10
+    
+    # Values with the same digit count and sign share one layout, so each group
+    # is written column by column into a fixed-width buffer of code points
+    text = np.empty(magnitude.size, dtype=object)
+    layout = digits * 2 + negative
+    for key in np.unique(layout):
+        rows = np.flatnonzero(layout == key)
+        n_digits, is_negative = divmod(int(key), 2)
+        prefix = "-₹" if is_negative else "₹"
+        
+        # Last three digits, then groups of two: 12,34,567
+        n_commas = max(n_digits - 2, 0) // 2
+        width = len(prefix) + n_digits + n_commas
+        
+        codes = np.zeros((rows.size, width), dtype=np.uint32)
+        for position, char in enumerate(prefix):
+            codes[:, position] = ord(char)
+        
+        remaining = magnitude[rows]
+        for k in range(n_digits):
+            offset = k if k < 3 else k + 1 + (k - 3) // 2
+            codes[:, width - 1 - offset] = ord("0") + remaining % 10
+            remaining = remaining // 10
+        for j in range(n_commas):
+            codes[:, width - 4 - 3 * j] = ord(",")
+        
+        text[rows] = codes.view(f"<U{width}").ravel()
+    
+    text[missing] = na_rep
+    text = text.reshape(np.shape(values))
+    
+    if index is not None:
+        return pd.Series(text, index=index)
+    return text
+
 def parse_date(date_str):
     """Parse a date string to datetime object"""
     try:
@@ -40,39 +128,73 @@ def format_date(date_obj):
         return date_obj.strftime("%d/%m/%Y")
     return ""
 
-def export_data(data, file_format, filename_prefix):
-    """Export data to CSV or Excel format"""
-    if not data:
-        st.error("No data to export")
-        return None
+# Saved copies of exports, pruned after each new copy by prune_exports
+EXPORT_DIR = "data/exports"
+EXPORT_RETENTION_DAYS = 30
+EXPORT_RETENTION_COUNT = 50
+
+def prune_exports(export_dir=EXPORT_DIR, keep_days=EXPORT_RETENTION_DAYS, keep_count=EXPORT_RETENTION_COUNT):
+    """
+    Delete saved exports older than keep_days and all but the newest keep_count.
+    A limit of 0 (or None) turns that rule off. Returns the deleted paths.
+    """
+    if not os.path.isdir(export_dir):
+        return []
+    
+    files = []
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        if os.path.isfile(path):
+            files.append((os.path.getmtime(path), path))
+    files.sort(reverse=True)
     
-    # Create exports directory if it doesn't exist
-    export_dir = "data/exports"
-    os.makedirs(export_dir, exist_ok=True)
+    cutoff = datetime.now().timestamp() - keep_days * 86400 if keep_days else None
+    removed = []
+    for position, (modified, path) in enumerate(files):
+        if (keep_count and position >= keep_count) or (cutoff is not None and modified < cutoff):
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError as e:
+                print(f"Error removing old export {path}: {e}")
     
-    # Generate timestamp
+    return removed
+
+def export_buffer(sheets, file_format, filename_prefix, keep_copy=False,
+                  keep_days=EXPORT_RETENTION_DAYS, keep_count=EXPORT_RETENTION_COUNT):
+    """
+    Render an export in memory for st.download_button.
+    sheets: iterable of (title, columns, batches), e.g. from db.export_sheets or frame_sheets
+    keep_copy: also save the file under data/exports and apply the retention limits
+    Returns a dict with data (bytes), file_name, mime and path (None without a copy).
+    """
+    file_format = normalise_format(file_format)
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported file format: {file_format}")
+    
+    extension, mime = EXPORT_FORMATS[file_format]
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_name = f"{filename_prefix}_{timestamp}.{extension}"
+    data = export_bytes(file_format, sheets)
+    
+    path = None
+    if keep_copy:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = os.path.join(EXPORT_DIR, file_name)
+        with open(path, "wb") as file:
+            file.write(data)
+        prune_exports(EXPORT_DIR, keep_days, keep_count)
     
-    # Create full filename
-    filename = f"{export_dir}/{filename_prefix}_{timestamp}.{file_format}"
+    return {'data': data, 'file_name': file_name, 'mime': mime, 'path': path}
+
+def export_data(data, file_format, filename_prefix):
+    """Export data to CSV or Excel format"""
+    if data is None or len(data) == 0:
+        st.error("No data to export")
+        return None
     
     try:
-        # Convert to DataFrame if it's not already
-        if not isinstance(data, pd.DataFrame):
-            df = pd.DataFrame(data)
-        else:
-            df = data
-        
-        # Export based on format
-        if file_format.lower() == "csv":
-            df.to_csv(filename, index=False)
-        elif file_format.lower() == "excel" or file_format.lower() == "xlsx":
-            df.to_excel(filename, index=False)
-        else:
-            st.error(f"Unsupported file format: {file_format}")
-            return None
-        
-        return filename
+        return export_buffer(frame_sheets(data), file_format, filename_prefix, keep_copy=True)['path']
     except Exception as e:
         st.error(f"Error exporting data: {e}")
         return None
@@ -146,96 +268,143 @@ def validate_transaction_input(data):
     
     return errors
 
-def backup_database(db_path="data/hisaabsetu.db", backup_dir="data/backups"):
-    """Create a backup of the database file"""
-    try:
-        # Create backup directory if it doesn't exist
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        # Create backup filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{backup_dir}/hisaabsetu_backup_{timestamp}.zip"
+def _blank_mask(series, numbers=None):
+    """
+    Vectorised `not value` for a column, counting NaN/NaT as missing too.
+    numbers: the column already passed through pd.to_numeric, if available.
+    """
+    blank = series.isna()
+    
+    if series.dtype == object:
+        is_text = series.map(type).eq(str)
+        if numbers is None:
+            numbers = pd.to_numeric(series.where(~is_text), errors="coerce")
+        blank |= is_text & series.eq("")
+        blank |= ~is_text & numbers.eq(0)
+    elif series.dtype == bool:
+        blank |= ~series
+    elif pd.api.types.is_numeric_dtype(series):
+        blank |= series.eq(0)
+    
+    return blank.fillna(True).astype(bool)
+
+def _as_datetimes(series):
+    """Column of dates as datetime64 for comparisons; unparseable values become NaT"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors="coerce", format="ISO8601")
+
+def validate_transactions_frame(df):
+    """
+    Validate many transactions at once with the rules and messages of validate_transaction_input.
+    df has one row per transaction and the same keys as the dict validate_transaction_input takes.
+    Returns (error_mask, messages): a boolean Series that is True for rows with errors
+    and a Series with each row's list of error messages, both indexed like df.
+    Rows with the same errors share one list, so copy a list before changing it.
+    """
+    def column(name):
+        return df[name] if name in df else pd.Series(None, index=df.index, dtype=object)
+    
+    checks = []
+    
+    # Check if required party fields are selected
+    checks.append((_blank_mask(column('apnaar_party_id')), "Apnaar Party must be selected"))
+    checks.append((_blank_mask(column('lenaar_party_id')), "Lenaar Party must be selected"))
+    
+    # Validate total amount, interest rate and dalali rate
+    for name, label, required in (
+        ('total_amount', "Total Amount", True),
+        ('interest_rate', "Interest Rate", True),
+        ('dalali_rate', "Dalali Rate", False)
+    ):
+        values = column(name)
+        numbers = pd.to_numeric(values, errors="coerce")
         
-        # Create a zip file
-        with zipfile.ZipFile(backup_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Add the database file to the zip
-            zipf.write(db_path, os.path.basename(db_path))
-            
-            # Add backup metadata
-            metadata = {
-                "backup_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "original_path": db_path,
-                "backup_type": "manual"
-            }
-            
-            # Write metadata to a file in the zip
-            zipf.writestr("backup_metadata.json", json.dumps(metadata, indent=4))
+        if required:
+            # A blank required value is reported once, without the number checks
+            skipped = _blank_mask(values, numbers)
+            checks.append((skipped, f"{label} is required"))
+        else:
+            # Only None is skipped so zero is allowed
+            skipped = values.isna()
         
-        return backup_filename
+        checks.append((~skipped & numbers.isna(), f"{label} must be a valid number"))
+        checks.append((~skipped & numbers.lt(0), f"{label} must be at least 0"))
+    
+    # Validate dates
+    start_blank = _blank_mask(column('start_date'))
+    end_blank = _blank_mask(column('end_date'))
+    checks.append((start_blank, "Start Date is required"))
+    checks.append((end_blank, "End Date is required"))
+    
+    start_dates = _as_datetimes(column('start_date'))
+    end_dates = _as_datetimes(column('end_date'))
+    checks.append((~start_blank & ~end_blank & start_dates.gt(end_dates), "End Date must be after Start Date"))
+    
+    # One bit per failed check; rows with the same failures share one message list
+    codes = np.zeros(len(df), dtype=np.int64)
+    for bit, (mask, _) in enumerate(checks):
+        codes |= mask.to_numpy(dtype=bool).astype(np.int64) << bit
+    
+    message_lists = {
+        code: [message for bit, (_, message) in enumerate(checks) if code >> bit & 1]
+        for code in np.unique(codes).tolist()
+    }
+    
+    error_mask = pd.Series(codes != 0, index=df.index)
+    messages = pd.Series(codes, index=df.index).map(message_lists).astype(object)
+    return error_mask, messages
+
+def backup_database(db_path="data/hisaabsetu.db", backup_dir="data/backups", backup_type="manual", replicas=()):
+    """
+    Create a backup of the database with the SQLite online backup API.
+    The database can stay open and in use while this runs.
+    replicas: more folders to copy the backup to in parallel, each copy verified
+    """
+    try:
+        backup_file = create_backup(db_path, backup_dir, backup_type)
     except Exception as e:
         st.error(f"Error creating backup: {e}")
         return None
+    
+    for target, error in replicate_backup(backup_file, replicas).items():
+        if error:
+            st.warning(f"Backup could not be copied to {target}: {error}")
+    
+    return backup_file
 
 def restore_database(backup_file, db_path="data/hisaabsetu.db"):
-    """Restore database from a backup file"""
+    """
+    Restore database from a backup file. The current database is backed up to
+    the auto backups folder first; callers must reconnect afterwards.
+    """
     try:
-        # Create a temporary directory for extraction
-        temp_dir = "data/temp_restore"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Extract the backup file
-        with zipfile.ZipFile(backup_file, 'r') as zipf:
-            zipf.extractall(temp_dir)
-        
-        # Get the database file from the backup
-        db_filename = os.path.basename(db_path)
-        extracted_db_path = os.path.join(temp_dir, db_filename)
-        
-        # Check if the extracted database file exists
-        if not os.path.exists(extracted_db_path):
-            st.error("Backup file does not contain a valid database.")
-            return False
-        
-        # Create a backup of the current database before restoring
-        current_backup = backup_database(db_path, "data/auto_backups")
-        
-        # Copy the extracted database to the original location
-        shutil.copy2(extracted_db_path, db_path)
-        
-        # Clean up temporary directory
-        shutil.rmtree(temp_dir)
-        
+        restore_backup(backup_file, db_path, AUTO_BACKUP_DIR)
         return True
+    except RestoreError as e:
+        st.error(f"Cannot restore this backup: {e}")
+        return False
     except Exception as e:
         st.error(f"Error restoring database: {e}")
         return False
 
-def get_available_backups(backup_dir="data/backups"):
-    """Get a list of available backup files"""
-    if not os.path.exists(backup_dir):
-        return []
-    
-    # List all backup files
+def get_available_backups(backup_dirs=(BACKUP_DIR, AUTO_BACKUP_DIR)):
+    """
+    Get the available backups from the catalogs of the backup folders, newest first.
+    Each backup is the catalog row plus the filename, path, folder and formatted date.
+    """
     backups = []
-    for file in os.listdir(backup_dir):
-        if file.startswith("hisaabsetu_backup_") and file.endswith(".zip"):
-            # Extract timestamp from filename
-            try:
-                timestamp = file.replace("hisaabsetu_backup_", "").replace(".zip", "")
-                date_obj = datetime.strptime(timestamp, "%Y%m%d_%H%M%S")
-                formatted_date = date_obj.strftime("%d/%m/%Y %H:%M:%S")
-                
-                backups.append({
-                    "filename": file,
-                    "path": os.path.join(backup_dir, file),
-                    "timestamp": timestamp,
-                    "formatted_date": formatted_date
-                })
-            except ValueError:
-                # Skip files with invalid timestamp format
-                continue
+    for backup_dir in backup_dirs:
+        for entry in list_backups(backup_dir):
+            entry["filename"] = entry["file"]
+            entry["path"] = os.path.join(backup_dir, entry["file"])
+            entry["folder"] = backup_dir
+            entry["timestamp"] = entry["created_at"]
+            created = entry["created_at"]
+            entry["formatted_date"] = f"{created[8:10]}/{created[5:7]}/{created[:4]} {created[11:]}"
+            backups.append(entry)
     
-    # Sort backups by timestamp (newest first)
+    # Catalog dates are ISO text, so they sort as strings
     backups.sort(key=lambda x: x["timestamp"], reverse=True)
     
     return backups